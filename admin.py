@@ -8,6 +8,8 @@ from leaflet_admin_list.admin import LeafletAdminListMixin
 from django.utils.html import format_html
 from django.conf import settings
 from leaflet_admin_list.filters import BoundingBoxFilter
+from .search import content_query
+from . import thumbnails
 
 
 DEFAULT_LONGITUDE =  30.0557
@@ -16,6 +18,20 @@ DEFAULT_ZOOM = 12
 MAX_ZOOM = 20
 MIN_ZOOM = 3
 
+
+def preview_url(image, use):
+    """
+    The URL of the thumbnail of an image, or None while a missing one is made. The original, often a TIFF of many
+    megabytes, is only shown if no thumbnail can be made at all.
+    """
+
+    url = thumbnails.thumbnail_url(image, use)
+    if url is None and thumbnails.PILImage is None:
+        url = f'{settings.ORIGINAL_URL}/{image.file}'
+
+    return url
+
+
 class PlaceOfInterestNameInline(admin.StackedInline):
 
     model = Name
@@ -29,16 +45,17 @@ class PlaceOfInterestNameInline(admin.StackedInline):
 @admin.register(PlaceOfInterest)
 class PlaceOfInterestAdmin(LeafletGeoAdmin, admin.ModelAdmin,):
     display_raw = True
-    fields = get_fields(PlaceOfInterest, exclude=DEFAULT_EXCLUDE) 
+    fields = get_fields(PlaceOfInterest, exclude=DEFAULT_EXCLUDE+['point']) 
     list_display = ['id','__str__', 'type', 'description', 'corrected']
-    readonly_fields = [*DEFAULT_FIELDS]
+    readonly_fields = ['osm_id', 'display_name', 'geometry_type', *DEFAULT_FIELDS]
     autocomplete_fields = ['parent_place']
     inlines = [PlaceOfInterestNameInline]
     list_filter =('type', 'corrected', 'names__languages')
+    list_select_related = ['type']
     # list_max_show_all = 600
     list_per_page = 100
     search_fields = ['names__text']
-    ordering = ['names__text']
+    ordering = ['display_name']
 
     # overrides base setting of Leaflet Geo Widget
     settings_overrides = {
@@ -55,21 +72,40 @@ class ImageModel(admin.ModelAdmin):
     readonly_fields = ['iiif_file', 'uuid', 'image_preview', *DEFAULT_FIELDS]
     autocomplete_fields = ['place_of_interest']
     list_display = ['thumbnail_preview', 'title', 'place_of_interest', 'uuid', 'created_at', 'updated_at']
+    list_select_related = ['place_of_interest']
     search_fields = ['title', 'description', 'place_of_interest__names__text']
     # ['place_of_interest__description', 'place_of_interest__comment', 'place_of_interest__names__languages__name', 'place_of_interest__names__informants__name', 'place_of_interest__names__period__text', 'place_of_interest__names__note', 'place_of_interest__type__name', 'place_of_interest__type__description', 'place_of_interest__type__comment', 'place_of_interest__type__names__text', 'place_of_interest__type__names__languages__name', 'place_of_interest__type__names__informants__name', 'place_of_interest__type__names__period__text']
     list_filter = ['place_of_interest__names__text']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('thumbnails')
+
     def image_preview(self, obj):
-        return format_html(f'<img src="{settings.ORIGINAL_URL}/{obj.file}" height="300" />')
+        url = preview_url(obj, 'preview')
+        return format_html('<img src="{}" height="300" />', url) if url else None
 
     def thumbnail_preview(self, obj):
-        return format_html(f'<img src="{settings.ORIGINAL_URL}/{obj.file}" height="100" />')
+        url = preview_url(obj, 'list')
+        return format_html('<img src="{}" height="100" />', url) if url else None
+
+
+class ContentSearchMixin:
+    """Searches texts, documents and transcriptions in full text, or by the names of their place, instead of scanning them."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+
+        names = Name.objects.filter(referent=models.OuterRef('place_of_interest'), search_text__contains=normalize_search_text(search_term.strip()))
+        queryset = queryset.filter(models.Q(search_vector=content_query(search_term)) | models.Q(models.Exists(names)))
+
+        return queryset, False
 
 
 @admin.register(Text)
-class TextAdmin(admin.ModelAdmin):
+class TextAdmin(ContentSearchMixin, admin.ModelAdmin):
     readonly_fields = ['id', *DEFAULT_FIELDS]
-    fields = get_fields(Text, exclude=DEFAULT_EXCLUDE)
+    fields = get_fields(Text, exclude=DEFAULT_EXCLUDE+['search_vector'])
     autocomplete_fields = ('place_of_interest',)
     search_fields = ['title', 'place_of_interest__names__text']
 
@@ -88,34 +124,35 @@ class AuthorAdmin(admin.ModelAdmin):
 @admin.register(Informant)
 class InformantAdmin(admin.ModelAdmin):
     readonly_fields = ['id', *DEFAULT_FIELDS]
-    fields = get_fields(Informant, exclude=DEFAULT_EXCLUDE)
+    fields = get_fields(Informant, exclude=[*DEFAULT_EXCLUDE, 'search_text'])
     search_fields = ['name']
 
 @admin.register(Period)
 class PeriodAdmin(admin.ModelAdmin):
     readonly_fields = ['id', *DEFAULT_FIELDS]
-    fields = get_fields(Period, exclude=DEFAULT_EXCLUDE)
+    fields = get_fields(Period, exclude=[*DEFAULT_EXCLUDE, 'search_text'])
     search_fields = ['text']
 
 @admin.register(PlaceType)
 class PlaceTypeAdmin(admin.ModelAdmin):
-    fields = get_fields(PlaceType, exclude=DEFAULT_FIELDS)
+    fields = get_fields(PlaceType, exclude=DEFAULT_FIELDS+['search_text'])
 
 
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(ContentSearchMixin, admin.ModelAdmin):
     readonly_fields = ['id', *DEFAULT_FIELDS]
-    fields = get_fields(Document, exclude=DEFAULT_EXCLUDE)
+    fields = get_fields(Document, exclude=DEFAULT_EXCLUDE+['search_vector'])
     autocomplete_fields = ('place_of_interest',)
     search_fields = ['title', 'place_of_interest__names__text']
 
 
 @admin.register(Transcription)
-class TranscriptionAdmin(admin.ModelAdmin):
+class TranscriptionAdmin(ContentSearchMixin, admin.ModelAdmin):
     readonly_fields = ['id', *DEFAULT_FIELDS]
-    fields = get_fields(Transcription, exclude=DEFAULT_EXCLUDE)
+    fields = get_fields(Transcription, exclude=DEFAULT_EXCLUDE+['search_vector'])
     autocomplete_fields = ('place_of_interest',)
     search_fields = ['title', 'place_of_interest__names__text']
     list_filter = ('place_of_interest__names__text',)
-    list_display = ['id', 'title', 'place_of_interest', 'created_at', 'updated_at']
\ No newline at end of file
+    list_display = ['id', 'title', 'place_of_interest', 'created_at', 'updated_at']
+    list_select_related = ['place_of_interest']
\ No newline at end of file
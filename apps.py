@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RwandaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.rwanda'
+
+    def ready(self):
+        from . import signals
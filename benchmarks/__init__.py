@@ -0,0 +1,23 @@
+"""
+Benchmarks of the rwanda app, run with `manage.py rwanda_benchmark <name>`.
+Each benchmark is a module with a `run` function returning a JSON serialisable report.
+"""
+from importlib import import_module
+
+BENCHMARKS = {
+    'loader-memory': 'loader',
+    'search': 'search',
+    'advanced-search': 'advanced_search',
+    'geometry': 'geometry',
+    'geojson': 'geojson',
+    'pagination': 'pagination',
+    'routes': 'routes',
+    'spatial': 'spatial',
+}
+
+
+def run(name, **options):
+
+    module = import_module(f'.{BENCHMARKS[name]}', __name__)
+
+    return module.run(**{key: value for key, value in options.items() if value is not None})
@@ -0,0 +1,60 @@
+from django.db.models import Q
+from .. import models
+from .seed import rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 100000
+
+QUERIES = (
+    {'language': 'rw'},
+    {'place_type': 'street'},
+    {'period': 'colonial'},
+    {'informant': 'INF-001'},
+    {'source': 'image'},
+    {'language': 'fr', 'period': 'colonial', 'source': 'text'},
+    {'language': 'rw', 'place_type': 'market', 'period': 'independence', 'informant': 'INF-00', 'source': 'document'},
+)
+
+
+def legacy_queryset(language=None, place_type=None, period=None, informant=None, source=None):
+    """The advanced search as it was answered before, with a subquery per criterion."""
+
+    queryset = models.PlaceOfInterest.objects.all()
+    if language:
+        name_filter = Q(languages__name__exact=language) | Q(languages__abbreviation__exact=language)
+        queryset = queryset.filter(id__in=models.Name.objects.filter(name_filter).values_list('referent', flat=True))
+    if place_type:
+        queryset = queryset.filter(type__text__icontains=place_type)
+    if period:
+        queryset = queryset.filter(id__in=models.Name.objects.filter(period__text__icontains=period).values_list('referent', flat=True))
+    if informant:
+        queryset = queryset.filter(id__in=models.Text.objects.filter(informants__custom_id__icontains=informant).values_list('place_of_interest', flat=True))
+    if source:
+        sources = {'image': models.Image, 'text': models.Text, 'document': models.Document}[source]
+        queryset = queryset.filter(id__in=list(sources.objects.values_list('place_of_interest', flat=True)))
+
+    return queryset.distinct()
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=20):
+    """Compares the advanced search before and after the facet table, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+
+    report['refresh_seconds'] = measure(models.PlaceFacet.refresh, 1)['max_ms'] / 1000
+
+    report['queries'] = []
+    for query in QUERIES:
+        legacy = list(legacy_queryset(**query).values_list('id', flat=True))
+        faceted = list(models.PlaceOfInterest.objects.faceted(**query).values_list('id', flat=True))
+
+        report['queries'].append({
+            'query': query,
+            'places': len(faceted),
+            'same_places': sorted(legacy) == sorted(faceted),
+            'legacy': measure(lambda: list(legacy_queryset(**query).values_list('id', flat=True)), repeat),
+            'faceted': measure(lambda: list(models.PlaceOfInterest.objects.faceted(**query).values_list('id', flat=True)), repeat),
+        })
+
+    return report
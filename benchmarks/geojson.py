@@ -0,0 +1,36 @@
+from rest_framework.test import APIClient
+from .. import urls
+from .seed import rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 10000
+
+ROUTES = (
+    ('geojson/place', {}),
+    ('search', {}),
+    ('search/period', {'period_name': 'colonial'}),
+    ('search/language', {'q': 'rw'}),
+)
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=5):
+    """Compares the places as GeoJSON from the serializers and from the fast GeoJSON, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+
+    # Past the cached responses
+    client = APIClient(HTTP_CACHE_CONTROL='no-cache')
+    report['routes'] = {}
+    for route, params in ROUTES:
+        url = f'/{urls.endpoint}/{route}/'
+        serialized = client.get(url, {**params, 'fast': 'false'})
+        fast = client.get(url, {**params, 'fast': 'true'})
+
+        report['routes'][route] = {'identical': serialized.content == fast.content, 'bytes': len(fast.content)}
+        for mode in ('false', 'true'):
+            timing = measure(lambda: client.get(url, {**params, 'fast': mode}), repeat)
+            timing['requests_per_second'] = round(1000 / timing['p50_ms'], 2) if timing['p50_ms'] else None
+            report['routes'][route]['fast' if mode == 'true' else 'serializer'] = timing
+
+    return report
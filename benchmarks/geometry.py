@@ -0,0 +1,39 @@
+from rest_framework.test import APIClient
+from .. import models, urls
+from .seed import rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 20000
+
+# No parameter serves the full geometries, as before
+QUERIES = (
+    {},
+    {'zoom': 8},
+    {'zoom': 11},
+    {'zoom': 14},
+    {'zoom': 17},
+    {'tolerance': 0.001},
+)
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=10):
+    """Compares the size and duration of the places as GeoJSON with and without simplified geometries, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+    report['stored_geometries'] = models.SimplifiedGeometry.objects.count()
+
+    # Past the cached responses
+    client = APIClient(HTTP_CACHE_CONTROL='no-cache')
+    url = f'/{urls.endpoint}/geojson/place/'
+
+    report['queries'] = []
+    for query in QUERIES:
+        response = client.get(url, query)
+        report['queries'].append({
+            'query': query,
+            'bytes': len(response.content),
+            'timing': measure(lambda: client.get(url, query), repeat),
+        })
+
+    return report
@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import random
+import tempfile
+import tracemalloc
+from .. import load
+
+DEFAULT_SIZE_MB = 300
+
+
+def write_feature_collection(path, size_mb):
+    """Writes a synthetic FeatureCollection of OSM-like building polygons of about `size_mb` megabytes."""
+
+    random.seed(0)
+    size = size_mb * 1024 * 1024
+    count = 0
+
+    with open(path, 'w') as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        while f.tell() < size:
+            x, y = 30.0 + random.random() * 0.2, -2.0 + random.random() * 0.2
+            ring = [[x + 0.0001 * i, y + 0.0001 * (i % 2)] for i in range(20)] + [[x, y]]
+            feature = {
+                'type': 'Feature',
+                'id': f'way/{count}',
+                'properties': {'name': f'Building {count}', 'name:fr': f'Bâtiment {count}', 'amenity': 'school', 'building': 'yes'},
+                'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+            }
+            f.write((',\n' if count else '') + json.dumps(feature))
+            count += 1
+        f.write('\n]}\n')
+
+    return count
+
+
+def measure(consume):
+    """Returns the time taken by and the peak of Python memory allocated while consuming the features."""
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = consume()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'features': count, 'seconds': round(elapsed, 2), 'peak_mb': round(peak / 1024 / 1024, 1)}
+
+
+def run(scale=DEFAULT_SIZE_MB, repeat=1):
+    """Compares json.load against the streaming reader on a FeatureCollection of `scale` megabytes."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'buildings.geojson')
+        count = write_feature_collection(path, scale)
+
+        def json_load():
+            with open(path, 'r') as f:
+                return len(json.load(f)['features'])
+
+        def streaming():
+            return sum(len(batch) for batch in load.batched(load.iter_features(path), load.DEFAULT_BATCH_SIZE))
+
+        return {
+            'file_mb': round(os.path.getsize(path) / 1024 / 1024, 1),
+            'features': count,
+            'json.load': measure(json_load),
+            'streaming': measure(streaming),
+        }
@@ -0,0 +1,53 @@
+import base64
+from urllib.parse import urlencode
+from rest_framework.test import APIClient
+from .. import models, urls
+from .seed import rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 100000
+PAGE_SIZE = 10
+PAGES = (1, 10, 100, 1000, 10000)
+
+
+def cursor(position):
+    """The cursor of the page after a primary key, as DRF encodes it."""
+
+    return base64.b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=10):
+    """Compares the duration of deep pages with offset and keyset pagination, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+
+    places = models.PlaceOfInterest.objects.order_by('id')
+    ids = list(places.values_list('id', flat=True))
+
+    # Past the cached responses
+    client = APIClient(HTTP_CACHE_CONTROL='no-cache')
+    url = f'/{urls.endpoint}/geojson/place/'
+
+    report['pages'] = []
+    for page in PAGES:
+        offset = (page - 1) * PAGE_SIZE
+        if offset >= len(ids):
+            break
+
+        # The id before the first place of the page
+        position = ids[offset - 1] if offset else 0
+
+        report['pages'].append({
+            'page': page,
+            'offset_query': measure(lambda: list(places[offset:offset + PAGE_SIZE].values_list('id', flat=True)), repeat),
+            'keyset_query': measure(lambda: list(places.filter(id__gt=position)[:PAGE_SIZE].values_list('id', flat=True)), repeat),
+            'keyset_endpoint': measure(lambda: client.get(url, {'pagination': 'cursor', 'page_size': PAGE_SIZE, 'cursor': cursor(position), 'fast': 'true'}), repeat),
+        })
+
+    report['count'] = {
+        'exact': measure(lambda: client.get(url, {'pagination': 'cursor', 'page_size': PAGE_SIZE, 'count': 'exact', 'fast': 'true'}), repeat),
+        'estimate': measure(lambda: client.get(url, {'pagination': 'cursor', 'page_size': PAGE_SIZE, 'count': 'estimate', 'fast': 'true'}), repeat),
+    }
+
+    return report
@@ -0,0 +1,139 @@
+import json
+import math
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.test import APIClient
+from .. import models, urls
+from .search import SEARCH_PARAMS
+from .seed import LATITUDE, LONGITUDE, rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 10000
+
+# The zoom of the tile measured, around Kigali
+TILE_ZOOM = 13
+
+# How much slower than the baseline a route may get before failing, as a ratio of its p95
+DEFAULT_LATENCY_TOLERANCE = 0.5
+
+
+def tile_of(longitude, latitude, zoom):
+
+    n = 2 ** zoom
+    x = int((longitude + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+
+    return zoom, x, y
+
+
+def iter_routes(patterns, prefix=''):
+    """The paths of the URL patterns without parameters, e.g. the lists of the router and the generated views."""
+
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern).lstrip('^').rstrip('$')
+
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and not any(c in route for c in '<(\\[?*+'):
+            yield route
+
+
+def routes():
+    """The paths requested and their query parameters, by a label that does not change with the seeded ids."""
+
+    paths = {f'/{route}': (f'/{route}', {}) for route in iter_routes(urls.urlpatterns)}
+
+    for prefix, viewset, basename in urls.router.registry:
+        route = prefix.split(f'{urls.endpoint}/', 1)[-1]
+        paths[f'/{prefix}/'] = (f'/{prefix}/', SEARCH_PARAMS.get(route, {}))
+
+        # The detail of the first object of the viewsets with a queryset
+        queryset = getattr(viewset, 'queryset', None)
+        if queryset is not None:
+            pk = queryset.order_by('pk').values_list('pk', flat=True).first()
+            if pk is not None:
+                paths[f'/{prefix}/<pk>/'] = (f'/{prefix}/{pk}/', {})
+
+    z, x, y = tile_of(LONGITUDE, LATITUDE, TILE_ZOOM)
+    path = reverse('place tiles', kwargs={'z': z, 'x': x, 'y': y})
+    paths[path] = (path, {})
+
+    pk = models.PlaceOfInterest.objects.filter(corrected=True).order_by('pk').values_list('pk', flat=True).first()
+    if pk is not None:
+        path = reverse('place dossier', kwargs={'pk': pk})
+        paths[path.rsplit('/', 1)[0] + '/<pk>'] = (path, {})
+
+    return paths
+
+
+def admin_changelists():
+
+    return [
+        reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        for model in admin.site._registry
+        if model._meta.app_label == models.PlaceOfInterest._meta.app_label
+    ]
+
+
+def measure_route(client, path, params, repeat):
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(path, params)
+
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+
+    return {
+        'status': response.status_code,
+        'queries': len(context.captured_queries),
+        'bytes': len(content),
+        **measure(lambda: client.get(path, params), repeat),
+    }
+
+
+def regressions(report, baseline, latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+    """The routes that run more queries than in the baseline, are slower beyond the tolerance, or now fail."""
+
+    found = []
+
+    for section in ('routes', 'admin'):
+        for path, result in report[section].items():
+            previous = baseline.get(section, {}).get(path)
+            # Added since the baseline
+            if previous is None:
+                continue
+
+            if result['status'] != previous['status']:
+                found.append({'path': path, 'metric': 'status', 'baseline': previous['status'], 'value': result['status']})
+            if result['queries'] > previous['queries']:
+                found.append({'path': path, 'metric': 'queries', 'baseline': previous['queries'], 'value': result['queries']})
+            if result['p95_ms'] > previous['p95_ms'] * (1 + latency_tolerance):
+                found.append({'path': path, 'metric': 'p95_ms', 'baseline': previous['p95_ms'], 'value': result['p95_ms']})
+
+    return found
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=5, baseline=None, latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+    """
+    Requests every route of the app and every admin changelist on `scale` places, and records their status, number
+    of queries, p50 and p95 durations and response size. With the path of an earlier report as `baseline`, lists
+    the regressions against it.
+    """
+
+    report = {'dataset': seed(places=scale)}
+
+    # Past the cached responses
+    client = APIClient(HTTP_CACHE_CONTROL='no-cache')
+    report['routes'] = {label: measure_route(client, path, params, repeat) for label, (path, params) in sorted(routes().items())}
+
+    client.force_login(get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark'))
+    report['admin'] = {path: measure_route(client, path, {}, repeat) for path in admin_changelists()}
+
+    if baseline:
+        with open(baseline) as f:
+            report['regressions'] = regressions(report, json.load(f), latency_tolerance)
+
+    return report
@@ -0,0 +1,83 @@
+import time
+import importlib
+from django.db.models import Q
+from rest_framework.test import APIClient
+from .. import models, views, urls
+from .seed import rollback, seed
+from .timing import measure
+
+DEFAULT_PLACES = 100000
+
+# Query parameters required by the search endpoints
+SEARCH_PARAMS = {
+    'search/period': {'period_name': 'colonial'},
+    'search/type': {'text': 'street'},
+    'search/informant': {'text': 'INF-00'},
+    'search/language': {'q': 'rw'},
+}
+
+
+def legacy_querysets():
+    """The search querysets as built before, with the ids of the places materialised in Python."""
+
+    Place, Name, Image, Text, Document = models.PlaceOfInterest, models.Name, models.Image, models.Text, models.Document
+
+    return {
+        'search': lambda: Place.objects.filter(Q(id__in=list(Image.objects.values_list('place_of_interest', flat=True))) | Q(id__in=list(Text.objects.values_list('place_of_interest', flat=True)))),
+        'search/text': lambda: Place.objects.filter(id__in=list(Text.objects.values_list('place_of_interest', flat=True))),
+        'search/image': lambda: Place.objects.filter(id__in=list(Image.objects.values_list('place_of_interest', flat=True))),
+        'search/document': lambda: Place.objects.filter(id__in=list(Document.objects.values_list('place_of_interest', flat=True))),
+        'search/period': lambda: Place.objects.filter(id__in=list(Name.objects.filter(period__text__icontains='colonial').values_list('referent', flat=True))),
+        'search/informant': lambda: Place.objects.filter(id__in=list(Text.objects.filter(informants__custom_id__icontains='INF-00').values_list('place_of_interest', flat=True))),
+        'search/language': lambda: Place.objects.filter(id__in=list(Name.objects.filter(Q(languages__name__exact='rw') | Q(languages__abbreviation__exact='rw')).values_list('referent', flat=True))),
+    }
+
+
+def current_querysets():
+
+    Place = models.PlaceOfInterest
+
+    return {
+        'search': lambda: Place.objects.having(models.Image, models.Text),
+        'search/text': lambda: Place.objects.having(models.Text),
+        'search/image': lambda: Place.objects.having(models.Image),
+        'search/document': lambda: Place.objects.having(models.Document),
+        'search/period': lambda: Place.objects.with_names(period__search_text__contains='colonial'),
+        'search/informant': lambda: Place.objects.having(models.Text, informants__search_text__contains='inf-00'),
+        'search/language': lambda: Place.objects.with_language('rw'),
+    }
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=5):
+    """Compares the search querysets and endpoints before and after evaluating them per request, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+
+    # The old class bodies evaluated these four at import
+    start = time.perf_counter()
+    legacy = legacy_querysets()
+    for name in ('search', 'search/text', 'search/image', 'search/document'):
+        legacy[name]()
+    report['legacy_import_queries_seconds'] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    importlib.reload(views)
+    report['views_import_seconds'] = round(time.perf_counter() - start, 3)
+
+    report['querysets'] = {}
+    for name, current in current_querysets().items():
+        report['querysets'][name] = {
+            'legacy': measure(lambda: list(legacy[name]().values_list('id', flat=True)), repeat),
+            'exists': measure(lambda: list(current().values_list('id', flat=True)), repeat),
+        }
+
+    # Past the cached responses
+    client = APIClient(HTTP_CACHE_CONTROL='no-cache')
+    report['endpoints'] = {}
+    for prefix, viewset, basename in urls.router.registry:
+        route = prefix.split(f'{urls.endpoint}/', 1)[-1]
+        if route.startswith('search'):
+            report['endpoints'][route] = measure(lambda: client.get(f'/{prefix}/', SEARCH_PARAMS.get(route, {})), repeat)
+
+    return report
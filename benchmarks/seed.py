@@ -0,0 +1,103 @@
+import random
+from django.contrib.gis.geos import Point, LineString, Polygon
+from django.db import transaction
+from ..models import *
+from ..load import refresh_places
+
+LANGUAGES = (('English', 'en'), ('French', 'fr'), ('Kinyarwanda', 'rw'), ('Kiswahili', 'sw'))
+PERIODS = ('Pre-colonial', 'German colonial', 'Belgian colonial', 'Post-independence', 'Post-1994')
+PLACE_TYPES = ('building', 'street', 'market', 'church', 'school')
+
+# Around Kigali
+LONGITUDE, LATITUDE = 30.0557, -1.9397
+
+
+class Rollback(Exception):
+    pass
+
+
+def rollback(run):
+    """Decorates a benchmark so that the data it seeds is rolled back afterwards."""
+
+    def wrapper(*args, **kwargs):
+        result = {}
+        try:
+            with transaction.atomic():
+                result.update(run(*args, **kwargs))
+                raise Rollback
+        except Rollback:
+            return result
+
+    return wrapper
+
+
+def random_geometry(rng):
+
+    x, y = LONGITUDE + rng.uniform(-0.1, 0.1), LATITUDE + rng.uniform(-0.1, 0.1)
+    kind = rng.random()
+
+    if kind < 0.4:
+        return Point(x, y, srid=4326)
+    if kind < 0.7:
+        return LineString([(x + 0.0005 * i, y + 0.0003 * (i % 3)) for i in range(30)], srid=4326)
+
+    return Polygon(((x, y), (x + 0.0004, y), (x + 0.0004, y + 0.0003), (x, y + 0.0003), (x, y)), srid=4326)
+
+
+def seed(places=10000, names_per_place=2, media_ratio=0.3, batch_size=2000, random_seed=0):
+    """
+    Seeds a synthetic dataset of `places` places around Kigali, each with names in the four languages,
+    periods and informants, and images, texts, documents and transcriptions for a `media_ratio` of the places.
+    """
+
+    rng = random.Random(random_seed)
+
+    languages = [Language.objects.create(name=name, abbreviation=abbreviation) for name, abbreviation in LANGUAGES]
+    periods = [Period.objects.create(text=text) for text in PERIODS]
+    place_types = [PlaceType.objects.create(text=text) for text in PLACE_TYPES]
+    informants = Informant.objects.bulk_create([Informant(custom_id=f"INF-{i:04d}", search_text=f"inf-{i:04d}") for i in range(max(10, places // 100))])
+    authors = Author.objects.bulk_create([Author(name=f"Author {i}") for i in range(20)])
+
+    counts = dict.fromkeys(('places', 'names', 'images', 'texts', 'documents', 'transcriptions'), 0)
+
+    for start in range(0, places, batch_size):
+        batch = PlaceOfInterest.objects.bulk_create([
+            PlaceOfInterest(
+                geometry=random_geometry(rng),
+                type=rng.choice(place_types),
+                corrected=rng.random() < 0.8,
+                is_iconic=rng.random() < 0.05,
+                description=f"Synthetic place {i}",
+            )
+            for i in range(start, min(start + batch_size, places))
+        ])
+
+        names = [
+            Name(text=f"{rng.choice(('Umuhanda', 'Rue', 'Street', 'Soko', 'Église'))} {place.id}-{j}", period=rng.choice(periods), referent=place)
+            for place in batch
+            for j in range(names_per_place)
+        ]
+        for name in names:
+            name.search_text = normalize_search_text(name.text)
+        Name.objects.bulk_create(names)
+        Name.languages.through.objects.bulk_create([Name.languages.through(name=name, language=rng.choice(languages)) for name in names])
+        Name.informants.through.objects.bulk_create([Name.informants.through(name=name, informant=rng.choice(informants)) for name in names])
+
+        with_media = [place for place in batch if rng.random() < media_ratio]
+        Image.objects.bulk_create([Image(title=f"Image of {place.id}", place_of_interest=place) for place in with_media])
+        texts = Text.objects.bulk_create([Text(title=f"Interview about {place.id}", text="Oral history " * 50, place_of_interest=place) for place in with_media])
+        Text.informants.through.objects.bulk_create([Text.informants.through(text=text, informant=rng.choice(informants)) for text in texts])
+        Text.authors.through.objects.bulk_create([Text.authors.through(text=text, author=rng.choice(authors)) for text in texts])
+        Document.objects.bulk_create([Document(title=f"Archive record {place.id}", text="Archival text " * 50, place_of_interest=place) for place in with_media[::2]])
+        Transcription.objects.bulk_create([Transcription(title=f"Transcription {place.id}", text="Transcribed " * 50, place_of_interest=place) for place in with_media[::3]])
+
+        refresh_places([place.id for place in batch])
+
+        counts['places'] += len(batch)
+        counts['names'] += len(names)
+        counts['images'] += len(with_media)
+        counts['texts'] += len(texts)
+        counts['documents'] += len(with_media[::2])
+        counts['transcriptions'] += len(with_media[::3])
+
+    return counts
@@ -0,0 +1,75 @@
+import json
+from django.contrib.gis.geos import Polygon
+from django.core.management import call_command
+from django.db import connection
+from .. import models
+from .seed import LATITUDE, LONGITUDE, rollback, seed
+
+DEFAULT_PLACES = 200000
+
+# The half width in degrees of the boxes queried around Kigali, from a district to a few streets
+BOX_SIZES = (0.02, 0.005)
+
+
+def explain_analyze(queryset):
+    """The durations and the plan nodes of a queryset, run with EXPLAIN ANALYZE."""
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+    nodes = []
+    def collect(node):
+        nodes.append(f"{node['Node Type']} {node.get('Index Name', '')}".strip())
+        for child in node.get('Plans', []):
+            collect(child)
+    collect(plan['Plan'])
+
+    return {
+        'planning_ms': plan['Planning Time'],
+        'execution_ms': plan['Execution Time'],
+        'shared_buffers': plan['Plan'].get('Shared Read Blocks', 0) + plan['Plan'].get('Shared Hit Blocks', 0),
+        'nodes': nodes,
+    }
+
+
+def queries(box):
+
+    places = models.PlaceOfInterest.objects
+
+    return {
+        'legacy_join_distinct': places.filter(corrected=True, names__isnull=False, geometry__bboverlaps=box).distinct('id'),
+        'exists': places.filter(corrected=True, geometry__bboverlaps=box).named().order_by('id'),
+        'exists_points': places.filter(corrected=True, geometry__bboverlaps=box).named().of_geometry_family('point').order_by('id'),
+        'exists_lines': places.filter(corrected=True, geometry__bboverlaps=box).named().of_geometry_family('line').order_by('id'),
+    }
+
+
+@rollback
+def run(scale=DEFAULT_PLACES, repeat=None):
+    """Compares the plans and durations of the bbox queries before and after, and after clustering, on `scale` places."""
+
+    report = {'dataset': seed(places=scale)}
+
+    with connection.cursor() as cursor:
+        for model in (models.PlaceOfInterest, models.Name):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    boxes = {
+        size: Polygon.from_bbox((LONGITUDE - size, LATITUDE - size, LONGITUDE + size, LATITUDE + size))
+        for size in BOX_SIZES
+    }
+
+    report['boxes'] = {}
+    for size, box in boxes.items():
+        report['boxes'][size] = {name: explain_analyze(queryset) for name, queryset in queries(box).items()}
+
+    call_command('rwanda_cluster')
+
+    for size, box in boxes.items():
+        report['boxes'][size].update({f'{name}_clustered': explain_analyze(queryset) for name, queryset in queries(box).items() if name != 'legacy_join_distinct'})
+
+    return report
@@ -0,0 +1,25 @@
+import time
+import statistics
+
+
+def percentiles(timings):
+
+    timings = sorted(timings)
+
+    return {
+        'p50_ms': round(1000 * statistics.median(timings), 2),
+        'p95_ms': round(1000 * timings[min(len(timings) - 1, int(0.95 * len(timings)))], 2),
+        'max_ms': round(1000 * timings[-1], 2),
+    }
+
+
+def measure(func, repeat=5):
+    """Calls `func` `repeat` times and returns the percentiles of its duration."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return percentiles(timings)
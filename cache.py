@@ -0,0 +1,182 @@
+import time
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+KEY_PREFIX = 'rwanda'
+DATA_VERSION_KEY = f'{KEY_PREFIX}:data-version'
+
+# The headers of a response that are not served again with it
+UNCACHED_HEADERS = ('set-cookie', 'x-cache', 'server-timing')
+
+# A response is only found again under the data version it was rendered for, so it can be kept long
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def get_cache():
+    """The cache of the API responses, set with the RWANDA_CACHE_ALIAS setting, e.g. local memory or Redis."""
+
+    return caches[getattr(settings, 'RWANDA_CACHE_ALIAS', 'default')]
+
+
+def new_data_version():
+
+    # Starts from the time, so that a version lost by the cache does not find the responses of older data
+    return int(time.time() * 1000)
+
+
+def data_version():
+    """The version of the data, bumped whenever the data served by the API changes."""
+
+    cache = get_cache()
+    version = cache.get(DATA_VERSION_KEY)
+
+    if version is None:
+        cache.add(DATA_VERSION_KEY, new_data_version(), timeout=None)
+        version = cache.get(DATA_VERSION_KEY, new_data_version())
+
+    return version
+
+
+def bump_data_version():
+    """Invalidates the cached responses."""
+
+    cache = get_cache()
+
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, new_data_version(), timeout=None)
+
+
+def bump_data_version_on_commit(using=None):
+    """
+    Invalidates the cached responses once the current transaction commits, as a request answered in between would
+    cache the data before the change under the new version. Bumped once however many changes the transaction has.
+    """
+
+    connection = transaction.get_connection(using)
+
+    if connection.in_atomic_block and any(callback[1] is bump_data_version for callback in connection.run_on_commit):
+        return
+
+    transaction.on_commit(bump_data_version, using=using)
+
+
+def count(event):
+
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:{event}'
+
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def stats():
+    """The hits and misses of the cached responses since the counters were lost or reset."""
+
+    cache = get_cache()
+    hits = cache.get(f'{KEY_PREFIX}:hits', 0)
+    misses = cache.get(f'{KEY_PREFIX}:misses', 0)
+
+    return {
+        'data_version': data_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+
+def request_key(request):
+    """
+    A digest of what a GET request asks for: its host, as the pagination links are absolute, its path, its query
+    parameters without the empty ones and in order, whatever order they were given in, and the content types it
+    accepts.
+    """
+
+    params = sorted(
+        (name, sorted(value.strip() for value in values if value.strip()))
+        for name, values in request.GET.lists()
+    )
+    params = [(name, values) for name, values in params if values]
+
+    digest = hashlib.sha256(repr((request.scheme, request.get_host(), request.path, params, request.META.get('HTTP_ACCEPT', ''))).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def is_anonymous(request):
+    """Whether a request is made without a session or credentials, so that its response is the same for everyone."""
+
+    user = getattr(request, 'user', None)
+
+    return 'HTTP_AUTHORIZATION' not in request.META and not (user is not None and user.is_authenticated)
+
+
+def is_cacheable(response):
+    """Whether a response can be served to everyone: successful, whole, and not the HTML of the browsable API."""
+
+    return response.status_code == 200 and not response.streaming and 'html' not in response.get('Content-Type', '')
+
+
+class CachedResponseMixin:
+    """
+    Caches the successful GET responses of a view until the data version changes, and answers conditional
+    requests whose If-None-Match has the ETag of the data version with 304 Not Modified. Only the requests of
+    anonymous users are cached, and neither streamed responses nor the HTML of the browsable API. Requests with
+    `Cache-Control: no-cache` are answered afresh, and the `X-Cache` header tells whether a response was cached.
+    """
+
+    cache_timeout = DEFAULT_TIMEOUT
+
+    def dispatch(self, request, *args, **kwargs):
+
+        if request.method != 'GET' or not is_anonymous(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        version = data_version()
+        digest = request_key(request)
+        key = f'{KEY_PREFIX}:response:{version}:{digest}'
+        etag = f'"{version}-{digest[:32]}"'
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        cache = get_cache()
+        cached = None if 'no-cache' in request.META.get('HTTP_CACHE_CONTROL', '') else cache.get(key)
+
+        if cached is not None:
+            count('hits')
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+        else:
+            count('misses')
+            response = super().dispatch(request, *args, **kwargs)
+
+            if hasattr(response, 'render') and not response.streaming:
+                response.render()
+
+            if not is_cacheable(response):
+                return response
+
+            headers = [(header, value) for header, value in response.items() if header.lower() not in UNCACHED_HEADERS]
+            cache.set(key, (response.content, headers), self.cache_timeout)
+            response['X-Cache'] = 'MISS'
+
+        response['ETag'] = etag
+        # The response differs for users logged in or with credentials, which are not cached
+        patch_vary_headers(response, ['Accept', 'Cookie', 'Authorization'])
+
+        return response
@@ -0,0 +1,101 @@
+from django.db import connection
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .models import *
+
+# The models in the change feed, by the name their changes and tombstones are listed under
+CHANGE_MODELS = {model._meta.model_name: model for model in ChangeLog.MODELS}
+
+# Derived for searching, and left out of the changes
+EXCLUDED_FIELDS = ('search_text', 'search_vector')
+
+TOMBSTONES = 'deleted'
+
+_serializers = {}
+
+
+def change_serializer(model):
+    """A serializer of every field of a model but the derived ones, with the ids of its related objects."""
+
+    if model not in _serializers:
+        meta = type('Meta', (), {'model': model, 'exclude': [field.name for field in model._meta.get_fields() if field.name in EXCLUDED_FIELDS]})
+        _serializers[model] = type(f'{model.__name__}ChangeSerializer', (serializers.ModelSerializer,), {'Meta': meta})
+
+    return _serializers[model]
+
+
+def encode_cursor(position):
+
+    return f'{position[0]}-{position[1]}'
+
+
+def decode_cursor(cursor):
+    """The (transaction id, log id) of the last change returned, from a cursor."""
+
+    if not cursor:
+        return None
+
+    try:
+        transaction_id, pk = cursor.split('-')
+        return int(transaction_id), int(pk)
+    except ValueError:
+        raise ValidationError({'since': "Invalid cursor."})
+
+
+def settled_transaction_id():
+    """
+    The oldest transaction still running. The transactions before it have all committed or rolled back, so no change
+    logged by them can appear any more, however long they ran, while the later ones may still be writing.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def changes_since(cursor=None, names=None, limit=100):
+    """
+    The objects created or updated and the tombstones of the objects deleted since a cursor, or since the beginning,
+    from at most `limit` logged changes, with the cursor to ask for the next changes and whether more are already
+    waiting. The changes are listed in the order their transactions committed, and those of transactions still
+    running are held back until every earlier transaction ended, so a cursor never passes a change.
+    """
+
+    position = decode_cursor(cursor)
+    names = names or list(CHANGE_MODELS)
+
+    # The changes after the cursor may have been pruned, see ChangeLog.prune()
+    oldest = ChangeLog.oldest_position()
+    if position is not None and oldest is not None and position < oldest:
+        raise ValidationError({'since': "Expired cursor, the changes since were pruned. Read the data again, then the changes from the beginning."})
+
+    log = ChangeLog.objects.filter(model__in=names, transaction_id__lt=settled_transaction_id())
+    if position is not None:
+        transaction_id, pk = position
+        log = log.filter(Q(transaction_id__gt=transaction_id) | Q(transaction_id=transaction_id, id__gt=pk))
+
+    entries = list(log.order_by('transaction_id', 'id').values_list('transaction_id', 'id', 'model', 'object_id', 'deleted')[:limit + 1])
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    # The last change of each object in the page decides whether it is upserted or deleted
+    last = {}
+    for _, _, model_name, object_id, deleted in entries:
+        last[model_name, object_id] = deleted
+
+    changes = {}
+    for name in names:
+        model = CHANGE_MODELS[name]
+        ids = [object_id for (model_name, object_id), deleted in last.items() if model_name == name and not deleted]
+        objects = model.objects.filter(pk__in=ids).prefetch_related(*[field.name for field in model._meta.many_to_many]).order_by('pk')
+
+        # Deleted since, and listed as a tombstone by a later page
+        changes[name] = change_serializer(model)(objects, many=True).data if ids else []
+
+    return {
+        'cursor': encode_cursor(entries[-1][:2]) if entries else cursor,
+        'more': more,
+        'changes': changes,
+        TOMBSTONES: [{'model': model_name, 'id': object_id} for (model_name, object_id), deleted in last.items() if deleted],
+    }
@@ -0,0 +1,49 @@
+from django.contrib.gis.db.models import Collect
+from django.contrib.gis.db.models.functions import Centroid, SnapToGrid
+from django.db.models import Count, Min
+from .models import SimplifiedGeometry
+
+# Above this zoom level the places are listed one by one instead of clustered
+MAX_CLUSTER_ZOOM = 15
+
+# Above MAX_CLUSTER_ZOOM, the widest box the places are listed in, in tiles of the zoom level
+MAX_BOX_TILES = 8
+
+# The width of the cells of the grid the places are clustered in, in pixels of the 256 pixel tiles
+CELL_PIXELS = 64
+
+
+def cell_size(zoom):
+    """The width in degrees of the cells of the grid at a zoom level."""
+
+    return 360 / 2 ** zoom * CELL_PIXELS / 256
+
+
+def max_box_size(zoom):
+    """The widest and tallest box in degrees the places are listed in one by one at a zoom level."""
+
+    return 360 / 2 ** zoom * MAX_BOX_TILES
+
+
+def cluster_places(queryset, zoom):
+    """
+    Clusters places on a grid by their representative point, and returns the clusters as GeoJSON features at
+    the centroid of their places, with their number of places and, for clusters of a single place, its id.
+    """
+
+    clusters = queryset.filter(point__isnull=False).order_by() \
+                       .annotate(cell=SnapToGrid('point', cell_size(zoom))) \
+                       .values('cell') \
+                       .annotate(count=Count('pk'), place=Min('pk'), center=Centroid(Collect('point'))) \
+                       .values_list('count', 'place', 'center')
+
+    _band, precision = SimplifiedGeometry.band_for(zoom)
+
+    return [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(value, precision) for value in center.coords]},
+            'properties': {'count': count, 'place': place if count == 1 else None},
+        }
+        for count, place, center in clusters
+    ]
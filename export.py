@@ -0,0 +1,300 @@
+"""
+Static exports of the public map dataset, the corrected places with names, their names, types, periods and media
+counts, as compressed GeoJSON and FlatGeobuf files that a web server can serve without Django and PostGIS.
+
+Each export is written to a directory of its own under the export root, named after the time and a fingerprint
+of the data, with a manifest. `latest.json` points at the newest export, and an export is skipped while the
+fingerprint of the data has not changed.
+
+An export is written whole rather than patched: the compressed FeatureCollection and the FlatGeobuf file, with
+its spatial index, cannot be updated in place, and each export is an immutable directory that clients may still
+be downloading from. The data is read in a single snapshot, so the fingerprint, the features and the counts of
+the manifest always describe the same state.
+"""
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from .models import *
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GEOJSON_FILE = 'places.geojson'
+FLATGEOBUF_FILE = 'places.fgb'
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'latest.json'
+
+EXPORT_CHUNK_SIZE = 2000
+DEFAULT_KEEP = 3
+
+# The models the public dataset is made of, whose changes change its fingerprint
+EXPORTED_MODELS = (PlaceOfInterest, Name, PlaceType, Period, Language, Image, Text, Document, Transcription)
+
+# The media counted for each place
+MEDIA = {
+    'images': Image,
+    'texts': Text,
+    'documents': Document,
+    'transcriptions': Transcription,
+}
+
+
+def export_root():
+
+    return getattr(settings, 'RWANDA_EXPORT_ROOT', None)
+
+
+def public_places():
+    """The places of the public map, as served by the places as GeoJSON."""
+
+    return PlaceOfInterest.objects.filter(corrected=True).named()
+
+
+@contextmanager
+def snapshot():
+    """
+    Runs the reads of an export in a read only REPEATABLE READ transaction, which sees the data as it was at its
+    first query. Inside a transaction already, e.g. in the tests, the reads share its isolation.
+    """
+
+    if connection.in_atomic_block:
+        yield
+        return
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        yield
+
+
+def fingerprint():
+    """
+    A digest of the state of the exported data in the database: the number of rows and the last update of each
+    model, and the last change logged, which also follows the deletions and the changes of the related objects.
+    """
+
+    state = [
+        (model._meta.model_name, *model.objects.aggregate(count=Count('pk'), updated_at=Max('updated_at')).values())
+        for model in EXPORTED_MODELS
+    ]
+    state.append(ChangeLog.objects.aggregate(last=Max('pk'))['last'])
+
+    return hashlib.sha256(repr(state).encode('utf-8')).hexdigest()
+
+
+def place_features(chunk_size=EXPORT_CHUNK_SIZE):
+    """The public places as GeoJSON features, each a compact JSON text, read in chunks."""
+
+    media_counts = {
+        name: dict(model.objects.filter(place_of_interest__isnull=False).values_list('place_of_interest').annotate(count=Count('pk')).order_by())
+        for name, model in MEDIA.items()
+    }
+
+    pks = public_places().order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(pks, chunk_size))
+        if not chunk:
+            break
+
+        languages = defaultdict(list)
+        for name_id, abbreviation in Name.languages.through.objects.filter(name__referent_id__in=chunk).order_by('name_id', 'language_id').values_list('name_id', 'language__abbreviation'):
+            languages[name_id].append(abbreviation)
+
+        names = defaultdict(list)
+        for name_id, place_id, text, period in Name.objects.filter(referent_id__in=chunk).order_by('referent_id', 'pk').values_list('pk', 'referent_id', 'text', 'period__text'):
+            names[place_id].append({'text': text, 'period': period, 'languages': languages[name_id]})
+
+        places = PlaceOfInterest.objects.filter(pk__in=chunk).order_by('pk').annotate(
+            geojson=AsGeoJSON('geometry', precision=SimplifiedGeometry.FULL_PRECISION),
+        ).values_list('pk', 'geojson', 'display_name', 'type__text', 'is_iconic', 'parent_place_id')
+
+        for pk, geojson, display_name, place_type, is_iconic, parent_place_id in places:
+            properties = {
+                'name': display_name,
+                'names': names[pk],
+                'type': place_type,
+                'is_iconic': is_iconic,
+                'parent_place': parent_place_id,
+                **{name: counts.get(pk, 0) for name, counts in media_counts.items()},
+            }
+
+            # The geometry is written as PostGIS wrote it
+            yield f'{{"type":"Feature","id":{pk},"geometry":{geojson or "null"},"properties":{json.dumps(properties, ensure_ascii=False, separators=(",", ":"))}}}'
+
+
+class CompressedWriter:
+    """Writes a text to gzip and, if the brotli package is installed, brotli compressed files at once."""
+
+    def __init__(self, path):
+
+        self.paths = [f'{path}.gz']
+        self.gzip = gzip.open(self.paths[0], 'wb')
+        self.brotli = None
+
+        if brotli is not None:
+            self.paths.append(f'{path}.br')
+            self.brotli_file = open(self.paths[1], 'wb')
+            self.brotli = brotli.Compressor(quality=9)
+
+    def write(self, text):
+
+        data = text.encode('utf-8')
+        self.gzip.write(data)
+        if self.brotli is not None:
+            self.brotli_file.write(self.brotli.process(data))
+
+    def close(self):
+
+        self.gzip.close()
+        if self.brotli is not None:
+            self.brotli_file.write(self.brotli.finish())
+            self.brotli_file.close()
+
+
+def write_geojson(path):
+    """Writes the public places as a compressed FeatureCollection, and returns their number and the files written."""
+
+    writer = CompressedWriter(path)
+    count = 0
+
+    try:
+        writer.write('{"type":"FeatureCollection","features":[')
+        for feature in place_features():
+            writer.write(('' if count == 0 else ',') + feature)
+            count += 1
+        writer.write(']}')
+    finally:
+        writer.close()
+
+    return count, writer.paths
+
+
+def write_flatgeobuf(geojson_path, path):
+    """Converts the GeoJSON export to FlatGeobuf with ogr2ogr, if GDAL is installed."""
+
+    ogr2ogr = shutil.which('ogr2ogr')
+    if ogr2ogr is None:
+        return None
+
+    subprocess.run([ogr2ogr, '-f', 'FlatGeobuf', path, f'/vsigzip/{geojson_path}.gz'], check=True, capture_output=True)
+
+    return path
+
+
+def file_entry(path):
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return {'bytes': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+
+def write_json(path, data):
+    """Writes a JSON file atomically, so that it is never read half written."""
+
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+        json.dump(data, f, indent=2)
+
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+def latest_manifest(root):
+
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            latest = json.load(f)
+        with open(os.path.join(root, latest['version'], MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def prune_exports(root, keep):
+    """Deletes all but the `keep` newest exports."""
+
+    versions = sorted(
+        entry.name for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.startswith('.') and os.path.exists(os.path.join(entry.path, MANIFEST_FILE))
+    )
+
+    for version in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, version))
+
+
+def export_public_dataset(root=None, force=False, keep=DEFAULT_KEEP):
+    """
+    Exports the public dataset under `root`, by default the RWANDA_EXPORT_ROOT setting, unless its fingerprint has
+    not changed since the latest export, and returns the manifest of the latest export and whether it is new.
+    """
+
+    root = root or export_root()
+    if not root:
+        raise ValueError("No export root, set RWANDA_EXPORT_ROOT.")
+
+    os.makedirs(root, exist_ok=True)
+
+    # Written next to the exports and renamed when complete
+    working = None
+    try:
+        with snapshot():
+            data_fingerprint = fingerprint()
+            latest = latest_manifest(root)
+            if not force and latest is not None and latest['fingerprint'] == data_fingerprint:
+                return latest, False
+
+            working = tempfile.mkdtemp(dir=root, prefix='.export-')
+            geojson_path = os.path.join(working, GEOJSON_FILE)
+            count, paths = write_geojson(geojson_path)
+            counts = {
+                'places': count,
+                'names': Name.objects.filter(referent__in=public_places()).count(),
+                **{name: model.objects.filter(place_of_interest__in=public_places()).count() for name, model in MEDIA.items()},
+            }
+
+        created = datetime.now(timezone.utc)
+        version = f"{created:%Y%m%dT%H%M%SZ}-{data_fingerprint[:8]}"
+
+        flatgeobuf_path = write_flatgeobuf(geojson_path, os.path.join(working, FLATGEOBUF_FILE))
+        if flatgeobuf_path:
+            paths.append(flatgeobuf_path)
+
+        manifest = {
+            'version': version,
+            'fingerprint': data_fingerprint,
+            'created': created.isoformat(),
+            'counts': counts,
+            'files': {os.path.basename(path): file_entry(path) for path in paths},
+        }
+        write_json(os.path.join(working, MANIFEST_FILE), manifest)
+
+        # Readable by the web server serving the exports
+        os.chmod(working, 0o755)
+        os.rename(working, os.path.join(root, version))
+    except BaseException:
+        if working is not None:
+            shutil.rmtree(working, ignore_errors=True)
+        raise
+
+    write_json(os.path.join(root, LATEST_FILE), {'version': version, 'files': sorted(manifest['files'])})
+    prune_exports(root, keep)
+
+    return manifest, True
@@ -0,0 +1,327 @@
+import json
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db import models
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from rest_framework import relations, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.serializer_helpers import ReturnDict
+from rest_framework_gis.fields import GeometryField, GeoJsonDict
+from .geometry import SimplifiedGeometryField
+
+# The decimals of the coordinates written by PostGIS, enough to read back the same doubles as GEOS writes
+GEOJSON_PRECISION = 15
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+# The places read from the server-side cursor and serialised at once when streaming
+STREAM_CHUNK_SIZE = 500
+
+# What a stream starts with, separates its features with, writes before and after each feature and ends with,
+# and its content type, by format
+STREAM_FORMATS = {
+    'geojson': ('{"type":"FeatureCollection","features":[', ',', '', '', ']}', 'application/geo+json'),
+    'ndjson': ('', '', '', '\n', '', 'application/x-ndjson'),
+    'geojsonseq': ('', '', '\x1e', '\n', '', 'application/geo+json-seq'),
+}
+
+
+class UnsupportedField(Exception):
+    """A serializer field the fast GeoJSON cannot represent, served by the serializer instead."""
+
+
+def parse_geojson(text):
+
+    if text is None:
+        return None
+
+    # PostGIS writes integral coordinates without a fraction, GEOS with one
+    return GeoJsonDict(json.loads(text, parse_int=float))
+
+
+def related_ordering(source, model):
+    """Orders the objects of a relation as their default manager does, then by primary key."""
+
+    ordering = [f"{'-' if field.startswith('-') else ''}{source}__{field.lstrip('-')}" for field in model._meta.ordering if isinstance(field, str)]
+
+    return ['pk', *ordering, f'{source}__pk']
+
+
+class FastGeoJSON:
+    """
+    Represents places exactly as a GeoFeatureModelSerializer with nested serializers does, without its per object
+    and per field work: the columns of each model are fetched with `values()` for many objects at once, the
+    geometries as GeoJSON from PostGIS, and each related object, e.g. a language shared by many names, is
+    represented once. Raises UnsupportedField for fields it cannot represent the same way.
+    """
+
+    def __init__(self, serializer):
+
+        self.serializer = serializer
+        self.plans = {}
+        self.cache = defaultdict(dict)
+
+        self.plan(serializer)
+
+    def plan(self, serializer):
+        """How to fetch and represent each field of a serializer, planned once per serializer."""
+
+        if id(serializer) in self.plans:
+            return self.plans[id(serializer)]
+
+        model = serializer.Meta.model
+        plan = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise UnsupportedField(name)
+
+            if isinstance(field, serializers.ListSerializer):
+                plan.append((name, 'nested many', field.source, self.plan(field.child)))
+            elif isinstance(field, serializers.BaseSerializer) and not model_field.many_to_many and not model_field.one_to_many:
+                plan.append((name, 'nested', model_field.attname, self.plan(field)))
+            elif isinstance(field, relations.ManyRelatedField) and isinstance(field.child_relation, relations.PrimaryKeyRelatedField) and field.child_relation.pk_field is None:
+                plan.append((name, 'many', field.source, None))
+            elif isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None and model_field.concrete:
+                plan.append((name, 'related', model_field.attname, None))
+            elif isinstance(field, GeometryField) and model_field.concrete:
+                plan.append((name, 'geometry', field.source, field))
+            elif not model_field.is_relation and model_field.concrete and not isinstance(model_field, models.FileField) \
+                    and not isinstance(field, (serializers.BaseSerializer, relations.RelatedField, relations.ManyRelatedField)):
+                plan.append((name, 'value', field.source, field))
+            else:
+                raise UnsupportedField(name)
+
+        self.plans[id(serializer)] = serializer, plan
+
+        return self.plans[id(serializer)]
+
+    def represent(self, serializer, pks, queryset=None):
+        """The representations of the objects with the given primary keys, by primary key."""
+
+        cache = self.cache[id(serializer)]
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in cache]
+
+        if missing:
+            model = serializer.Meta.model
+            if queryset is None:
+                queryset = model._base_manager.all()
+            cache.update(self.fetch(serializer, queryset.filter(pk__in=missing), missing))
+
+        return {pk: cache[pk] for pk in pks if pk in cache}
+
+    def geometry_expression(self, serializer, field, source, queryset):
+
+        precision = GEOJSON_PRECISION
+        expression = source
+
+        if isinstance(field, SimplifiedGeometryField):
+            if serializer.context.get('precision') is not None:
+                precision = serializer.context['precision']
+            if 'simplified_geometry' in queryset.query.annotations:
+                expression = Coalesce('simplified_geometry', source)
+
+        return AsGeoJSON(expression, precision=precision)
+
+    def fetch(self, serializer, queryset, pks):
+
+        serializer, plan = self.plans[id(serializer)]
+        model = serializer.Meta.model
+
+        annotations = {
+            f'fast_geojson_{name}': self.geometry_expression(serializer, field, source, queryset)
+            for name, kind, source, field in plan if kind == 'geometry'
+        }
+        columns = {source for name, kind, source, _ in plan if kind in ('value', 'related', 'nested')}
+        rows = list(queryset.select_related(None).prefetch_related(None).order_by().annotate(**annotations).values('pk', *columns, *annotations))
+
+        # The related objects of each object, for the relations to many
+        related = {}
+        for name, kind, source, nested in plan:
+            if kind not in ('many', 'nested many'):
+                continue
+
+            related_model = model._meta.get_field(source).related_model
+            pairs = model._base_manager.filter(pk__in=pks, **{f'{source}__isnull': False}) \
+                                       .order_by(*related_ordering(source, related_model)) \
+                                       .values_list('pk', f'{source}__pk')
+
+            related[name] = defaultdict(list)
+            for pk, related_pk in pairs:
+                if related_pk not in related[name][pk]:
+                    related[name][pk].append(related_pk)
+
+            if kind == 'nested many':
+                representations = self.represent(nested[0], [related_pk for ids in related[name].values() for related_pk in ids])
+                related[name] = {pk: [representations[related_pk] for related_pk in ids] for pk, ids in related[name].items()}
+
+        # The related objects represented by nested serializers, for the relations to one
+        nested_representations = {
+            name: self.represent(nested[0], [row[source] for row in rows if row[source] is not None])
+            for name, kind, source, nested in plan if kind == 'nested'
+        }
+
+        representations = {}
+        for row in rows:
+            representation = OrderedDict()
+
+            for name, kind, source, field in plan:
+                if kind == 'value':
+                    value = row[source]
+                    representation[name] = None if value is None else field.to_representation(value)
+                elif kind == 'related':
+                    representation[name] = row[source]
+                elif kind == 'nested':
+                    representation[name] = None if row[source] is None else nested_representations[name][row[source]]
+                elif kind == 'geometry':
+                    representation[name] = parse_geojson(row[f'fast_geojson_{name}'])
+                else:
+                    representation[name] = related[name].get(row['pk'], [])
+
+            representations[row['pk']] = representation
+
+        return representations
+
+    def features(self, queryset, pks):
+        """The GeoJSON features of the places with the given primary keys, in their order."""
+
+        meta = self.serializer.Meta
+        representations = self.represent(self.serializer, pks, queryset)
+
+        features = []
+        for pk in pks:
+            # Deleted since the primary keys were read
+            if pk not in representations:
+                continue
+
+            properties = representations[pk].copy()
+            feature = OrderedDict()
+
+            if meta.id_field:
+                feature['id'] = properties.pop(meta.id_field)
+            feature['type'] = 'Feature'
+            feature['geometry'] = properties.pop(meta.geo_field)
+            feature['properties'] = properties
+
+            features.append(feature)
+
+        return features
+
+
+class FastGeoJSONMixin:
+    """
+    Lists the places of a geo viewset with FastGeoJSON, when asked by the `fast` query parameter or by default
+    with the RWANDA_FAST_GEOJSON setting. The response is the same as without.
+    """
+
+    def use_fast_geojson(self):
+
+        fast = self.request.query_params.get('fast')
+        if fast is None:
+            return getattr(settings, 'RWANDA_FAST_GEOJSON', False)
+
+        return fast.lower() in TRUE_VALUES
+
+    def list(self, request, *args, **kwargs):
+
+        if not self.use_fast_geojson():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer([], many=True)
+        try:
+            fast = FastGeoJSON(serializer.child)
+        except UnsupportedField:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Only the primary keys of the page are fetched with the queryset
+        pks = queryset.select_related(None).prefetch_related(None).only('pk')
+        page = self.paginate_queryset(pks)
+        pks = [place.pk for place in (pks if page is None else page)]
+
+        data = ReturnDict(OrderedDict((
+            ('type', 'FeatureCollection'),
+            ('features', fast.features(queryset, pks)),
+        )), serializer=serializer)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
+
+
+def stream_geojson(chunks, stream_format):
+    """Writes chunks of features as they come in a streaming format, each feature a compact JSON document."""
+
+    start, separator, before, after, end, _content_type = STREAM_FORMATS[stream_format]
+    encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+    yield start
+
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+
+        yield ('' if first else separator) + separator.join(before + encoder.encode(feature) + after for feature in chunk)
+        first = False
+
+    yield end
+
+
+class StreamingGeoJSONMixin:
+    """
+    Streams all the places of a geo viewset unpaginated when asked by the `stream` query parameter: `geojson` for a
+    FeatureCollection, `ndjson` for a feature per line, or `geojsonseq` for RFC 8142 GeoJSON text sequences. The
+    places are read with a server-side cursor and serialised in chunks, so the memory stays flat whatever their number.
+    """
+
+    def list(self, request, *args, **kwargs):
+
+        stream_format = request.query_params.get('stream')
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+
+        if stream_format not in STREAM_FORMATS:
+            raise ValidationError({'stream': f"Expected one of {', '.join(STREAM_FORMATS)}."})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        features = stream_geojson(self.stream_features(queryset), stream_format)
+
+        return StreamingHttpResponse(features, content_type=STREAM_FORMATS[stream_format][-1])
+
+    def stream_features(self, queryset):
+        """The features of the places in chunks, read from a server-side cursor."""
+
+        serializer = self.get_serializer([], many=True)
+        try:
+            fast = FastGeoJSON(serializer.child)
+        except UnsupportedField:
+            fast = None
+
+        pks = queryset.values_list('pk', flat=True).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+        while True:
+            chunk = list(islice(pks, STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            if fast is not None:
+                # Only the related objects of a chunk are kept
+                fast.cache.clear()
+                yield fast.features(queryset, chunk)
+            else:
+                places = {place.pk: place for place in queryset.filter(pk__in=chunk)}
+                yield self.get_serializer([places[pk] for pk in chunk if pk in places], many=True).data['features']
@@ -0,0 +1,130 @@
+import math
+from django.contrib.gis.db.models import GeometryField
+from django.db.models import OuterRef, Subquery
+from rest_framework.exceptions import ValidationError
+from rest_framework_gis import fields
+from .models import SimplifiedGeometry, SimplifyPreserveTopology
+
+MAX_ZOOM = 22
+MAX_TOLERANCE = 1.0
+MAX_PRECISION = 15
+
+
+def parse_number(params, name, convert, minimum, maximum):
+
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+
+    try:
+        number = convert(value)
+    except ValueError:
+        raise ValidationError({name: f"Expected a number, got {value!r}."})
+
+    if not minimum <= number <= maximum:
+        raise ValidationError({name: f"Expected a number between {minimum} and {maximum}."})
+
+    return number
+
+
+def geometry_options(params):
+    """
+    The simplification and precision of the geometries asked for by the `zoom`, `tolerance` and `precision` query
+    parameters. A zoom level picks the precomputed geometries of its band, and a tolerance in degrees simplifies them
+    on the fly. The coordinates are rounded to `precision` decimals, by default the precision of the simplification.
+    """
+
+    zoom = parse_number(params, 'zoom', int, 0, MAX_ZOOM)
+    tolerance = parse_number(params, 'tolerance', float, 0, MAX_TOLERANCE)
+    precision = parse_number(params, 'precision', int, 0, MAX_PRECISION)
+
+    band = default_precision = None
+    if tolerance:
+        default_precision = min(MAX_PRECISION, -math.floor(math.log10(tolerance)))
+    elif zoom is not None:
+        band, default_precision = SimplifiedGeometry.band_for(zoom)
+
+    return {
+        'band': band,
+        'tolerance': tolerance or None,
+        'precision': default_precision if precision is None else precision,
+    }
+
+
+def simplify_geometries(queryset, band=None, tolerance=None, **options):
+    """Annotates the places with their geometry simplified for a band of zoom levels or a tolerance, if any."""
+
+    if tolerance:
+        return queryset.annotate(simplified_geometry=SimplifyPreserveTopology('geometry', tolerance))
+
+    if band is not None:
+        simplified = SimplifiedGeometry.objects.filter(place=OuterRef('pk'), band=band).values('geometry')[:1]
+        return queryset.annotate(simplified_geometry=Subquery(simplified, output_field=GeometryField()))
+
+    return queryset
+
+
+def round_coordinates(coordinates, precision):
+
+    if coordinates and isinstance(coordinates[0], (list, tuple)):
+        return [round_coordinates(position, precision) for position in coordinates]
+
+    return [round(value, precision) for value in coordinates]
+
+
+def round_geometry(geometry, precision):
+    """Rounds the coordinates of a GeoJSON geometry in place."""
+
+    if 'geometries' in geometry:
+        for member in geometry['geometries']:
+            round_geometry(member, precision)
+    else:
+        geometry['coordinates'] = round_coordinates(geometry['coordinates'], precision)
+
+    return geometry
+
+
+class SimplifiedGeometryField(fields.GeometryField):
+    """
+    The geometry of a place, or its simplified geometry if the queryset was annotated with one, with its coordinates
+    rounded to the `precision` of the serializer context.
+    """
+
+    def get_attribute(self, instance):
+
+        simplified = getattr(instance, 'simplified_geometry', None)
+
+        return simplified if simplified is not None else super().get_attribute(instance)
+
+    def to_representation(self, value):
+
+        representation = super().to_representation(value)
+        precision = self.context.get('precision')
+
+        if representation is not None and precision is not None:
+            round_geometry(representation, precision)
+
+        return representation
+
+
+class SimplifiedGeometryMixin:
+    """Serves the geometries of a geo viewset simplified and rounded as asked by the query parameters."""
+
+    def get_geometry_options(self):
+
+        if not hasattr(self, '_geometry_options'):
+            self._geometry_options = geometry_options(self.request.query_params)
+
+        return self._geometry_options
+
+    def filter_queryset(self, queryset):
+
+        return simplify_geometries(super().filter_queryset(queryset), **self.get_geometry_options())
+
+    def get_serializer_context(self):
+
+        context = super().get_serializer_context()
+        if getattr(self, 'request', None) is not None:
+            context['precision'] = self.get_geometry_options()['precision']
+
+        return context
@@ -0,0 +1,364 @@
+import os
+import csv
+import json
+import hashlib
+import tempfile
+import multiprocessing
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+from django.core.files import File
+from django.db import transaction
+from django.db.models import FileField
+from tqdm import tqdm
+from .models import *
+from .cache import bump_data_version
+from .load import batched
+from .search import update_search_vectors
+from .thumbnails import create_thumbnails
+
+try:
+    from PIL import Image as PILImage, ExifTags
+except ImportError:
+    PILImage = None
+
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
+# The errors of a file which cannot be read or converted
+INSPECT_ERRORS = (OSError,) if pyvips is None else (OSError, pyvips.Error)
+
+DEFAULT_BATCH_SIZE = 100
+
+# Files sent to an inspecting process at a time
+INSPECT_CHUNK_SIZE = 8
+
+# Bytes hashed at a time
+READ_SIZE = 1 << 20
+
+# The size of the tiles of the pyramid TIFFs served by IIIF
+TILE_SIZE = 256
+
+# The kind of object created from a file by its extension, when the manifest does not say
+KINDS_BY_EXTENSION = {
+    'image': ('.tif', '.tiff', '.jpg', '.jpeg', '.png'),
+    'document': ('.pdf', '.doc', '.docx', '.odt', '.rtf'),
+    'transcription': ('.txt',),
+}
+
+MODELS = {
+    'image': Image,
+    'document': Document,
+    'transcription': Transcription,
+}
+
+# The many-to-many fields each model can get from the manifest
+RELATED_FIELDS = {
+    'image': ('authors', 'informants'),
+    'document': ('authors', 'informants'),
+    'transcription': ('authors',),
+}
+
+# Separator of the authors and informants in a manifest cell
+LIST_SEPARATOR = ';'
+
+
+def kind_of(path: str) -> Optional[str]:
+
+    extension = os.path.splitext(path)[1].lower()
+
+    return next((kind for kind, extensions in KINDS_BY_EXTENSION.items() if extension in extensions), None)
+
+
+def split_list(value) -> List[str]:
+
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    return [item.strip() for item in (value or '').split(LIST_SEPARATOR) if item.strip()]
+
+
+def read_manifest(path: str) -> Iterator[Dict]:
+    """
+    Yields the files to ingest from a directory, walked recursively, or from a CSV or JSON manifest listing them with
+    a `path`, relative to the manifest, and optionally their `kind`, `place` id, `title`, `description`, `authors`
+    and `informants`, the last two separated by semicolons in CSV.
+    """
+
+    if os.path.isdir(path):
+        for directory, _, filenames in sorted(os.walk(path)):
+            for filename in sorted(filenames):
+                yield {'path': os.path.join(directory, filename)}
+        return
+
+    root = os.path.dirname(os.path.abspath(path))
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = json.load(f) if path.lower().endswith('.json') else csv.DictReader(f)
+
+        for row in rows:
+            yield {**row, 'path': os.path.join(root, row['path'])}
+
+
+def content_hash(path: str) -> str:
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def image_metadata(path: str) -> Dict:
+    """The description and date of a photo from its EXIF tags, if Pillow is installed."""
+
+    if PILImage is None:
+        return {}
+
+    with PILImage.open(path) as image:
+        exif = image.getexif()
+        tags = {ExifTags.TAGS.get(tag, tag): value for tag, value in {**exif, **exif.get_ifd(ExifTags.IFD.Exif)}.items()}
+
+    description = str(tags.get('ImageDescription') or '').strip()
+    date = str(tags.get('DateTimeOriginal') or tags.get('DateTime') or '').strip()
+
+    return {'description': "\n".join(value for value in (description, date and f"Taken {date}") if value)}
+
+
+def convert_image(path: str) -> str:
+    """
+    Converts an image to the tiled pyramid TIFF served by IIIF, in a temporary file whose path is returned, so that
+    the conversion the image model does on save runs in the pool instead.
+    """
+
+    handle, converted = tempfile.mkstemp(suffix='.tif')
+    os.close(handle)
+
+    try:
+        image = pyvips.Image.new_from_file(path, access='sequential')
+        image.tiffsave(converted, tile=True, pyramid=True, compression='jpeg', Q=90, tile_width=TILE_SIZE, tile_height=TILE_SIZE)
+    except Exception:
+        os.remove(converted)
+        raise
+
+    return converted
+
+
+def inspect_file(entry: Dict) -> Dict:
+    """
+    Hashes a file, extracts its metadata and, with pyvips, converts an image for IIIF, or records why it cannot be
+    ingested. Runs in the pool.
+    """
+
+    kind = entry.get('kind') or kind_of(entry['path'])
+    if kind not in MODELS:
+        return {**entry, 'error': f"Unknown kind {kind!r}"}
+
+    try:
+        metadata = {'key': content_hash(entry['path']), 'size': os.path.getsize(entry['path'])}
+
+        if kind == 'image':
+            metadata.update(image_metadata(entry['path']))
+            if pyvips is not None:
+                metadata['converted'] = convert_image(entry['path'])
+        elif kind == 'transcription' and entry['path'].lower().endswith('.txt'):
+            with open(entry['path'], encoding='utf-8', errors='replace') as f:
+                metadata['text'] = f.read()
+    except INSPECT_ERRORS as error:
+        return {**entry, 'kind': kind, 'error': str(error)}
+
+    # The manifest takes precedence over the metadata of the file
+    return {**metadata, **{key: value for key, value in entry.items() if value not in (None, '')}, 'kind': kind}
+
+
+def inspect_files(entries: Iterable[Dict], processes: Optional[int] = None) -> Iterator[Dict]:
+    """Inspects the files in a pool of `processes`, by default one per core, yielding them in their original order."""
+
+    if processes == 1:
+        yield from map(inspect_file, entries)
+        return
+
+    # Forked, as spawned workers would import the models again before Django is set up
+    with multiprocessing.get_context('fork').Pool(processes or os.cpu_count()) as pool:
+        yield from pool.imap(inspect_file, entries, chunksize=INSPECT_CHUNK_SIZE)
+
+
+class Related:
+    """The authors and informants named in a manifest, created the first time they are met."""
+
+    def __init__(self):
+
+        self.authors = {}
+        self.informants = {}
+
+    def author(self, name: str) -> Author:
+
+        if name not in self.authors:
+            self.authors[name], _ = Author.objects.get_or_create(name=name)
+
+        return self.authors[name]
+
+    def informant(self, custom_id: str) -> Informant:
+
+        if custom_id not in self.informants:
+            self.informants[custom_id], _ = Informant.objects.get_or_create(custom_id=custom_id)
+
+        return self.informants[custom_id]
+
+    def objects(self, field_name: str, values: List[str]) -> List:
+
+        get = self.author if field_name == 'authors' else self.informant
+
+        return [get(value) for value in values]
+
+
+def build_object(entry: Dict):
+    """The object of a file, not saved yet and without its file."""
+
+    model = MODELS[entry['kind']]
+    filename = os.path.basename(entry['path'])
+
+    values = {
+        'title': entry.get('title') or os.path.splitext(filename)[0],
+        'place_of_interest_id': int(entry['place']) if entry.get('place') else None,
+    }
+    if entry['kind'] == 'image':
+        values['description'] = entry.get('description')
+    else:
+        values['text'] = entry.get('text') or entry.get('description')
+
+    return model(**values)
+
+
+def store_files(entry: Dict, instance):
+    """Stores the file of an object and, for an image converted in the pool, its pyramid TIFF."""
+
+    filename = os.path.basename(entry['path'])
+    field = {'image': 'file', 'document': 'filename', 'transcription': 'document'}[entry['kind']]
+
+    with open(entry['path'], 'rb') as f:
+        getattr(instance, field).save(filename, File(f), save=False)
+
+    if 'converted' in entry:
+        with open(entry['converted'], 'rb') as f:
+            instance.iiif_file.save(f'{os.path.splitext(filename)[0]}.tif', File(f), save=False)
+
+
+def delete_stored_files(instance):
+    """Deletes the files stored for an object which was not written."""
+
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, FileField):
+            field_file = getattr(instance, field.attname)
+            if field_file:
+                field_file.storage.delete(field_file.name)
+
+
+def write_batch(batch: List[Dict], related: Related, stats: Counter) -> set:
+    """
+    Writes a batch of inspected files with their hashes in one transaction, so that an interrupted ingest resumes
+    after the last batch written. The objects are inserted in bulk, but for the images not converted in the pool,
+    which are saved one by one as saving converts them to tiled TIFF for IIIF. The files stored for a batch rolled
+    back are deleted. Returns the places of the objects created.
+    """
+
+    try:
+        return write_new_files(batch, related, stats)
+    finally:
+        for entry in batch:
+            if 'converted' in entry:
+                os.remove(entry['converted'])
+
+
+def write_new_files(batch: List[Dict], related: Related, stats: Counter) -> set:
+
+    ingested = set(IngestedFile.objects.filter(key__in=[entry['key'] for entry in batch]).values_list('key', flat=True))
+
+    new = []
+    for entry in batch:
+        # Already ingested, or a copy of a file of the batch
+        if entry['key'] in ingested:
+            stats['skipped'] += 1
+            continue
+        ingested.add(entry['key'])
+        new.append(entry)
+
+    objects = []
+    converted = []
+    try:
+        with transaction.atomic():
+            for entry in new:
+                objects.append((entry, build_object(entry)))
+                store_files(*objects[-1])
+
+            for kind, model in MODELS.items():
+                saved = [instance for entry, instance in objects if entry['kind'] == kind and kind == 'image' and 'converted' not in entry]
+                inserted = [instance for entry, instance in objects if entry['kind'] == kind and (kind != 'image' or 'converted' in entry)]
+
+                for instance in saved:
+                    instance.save()
+
+                # Bulk inserts send no signals, and their changes and search vectors are written here
+                model.objects.bulk_create(inserted)
+                ChangeLog.log(model, [instance.pk for instance in inserted])
+                if kind == 'image':
+                    converted += inserted
+                else:
+                    update_search_vectors([model], [instance.pk for instance in inserted])
+
+                for field_name in RELATED_FIELDS[kind]:
+                    field = model._meta.get_field(field_name)
+                    through = field.remote_field.through
+                    through.objects.bulk_create([
+                        through(**{field.m2m_field_name(): instance, field.m2m_reverse_field_name(): related_object})
+                        for entry, instance in objects if entry['kind'] == kind
+                        for related_object in related.objects(field_name, split_list(entry.get(field_name)))
+                    ], ignore_conflicts=True)
+
+                stats[kind] += len(saved) + len(inserted)
+
+            IngestedFile.objects.bulk_create([
+                IngestedFile(key=entry['key'], path=entry['path'], size=entry['size'], model=entry['kind'], object_id=instance.pk)
+                for entry, instance in objects
+            ])
+    except BaseException:
+        # No row refers to the files of the objects rolled back
+        for _, instance in objects:
+            delete_stored_files(instance)
+        raise
+
+    # Made by the signal of the images saved one by one
+    for image in converted:
+        create_thumbnails(image)
+
+    return {instance.place_of_interest_id for _, instance in objects if instance.place_of_interest_id}
+
+
+def ingest_media(path: str, batch_size: int = DEFAULT_BATCH_SIZE, processes: Optional[int] = None) -> Dict:
+    """
+    Ingests the images, documents and transcriptions of a directory or manifest. The files are hashed, their
+    metadata extracted and the images converted for IIIF by `processes` processes, and written `batch_size` at a time. Files whose content was already
+    ingested are skipped, so an interrupted ingest can be run again.
+    """
+
+    stats = Counter()
+    related = Related()
+    places = set()
+
+    inspected = inspect_files(read_manifest(path), processes)
+
+    for batch in tqdm(batched(inspected, batch_size), unit="batch", desc="Ingesting"):
+        for entry in batch:
+            if 'error' in entry:
+                stats['failed'] += 1
+                tqdm.write(f"{entry['path']}: {entry['error']}")
+
+        places |= write_batch([entry for entry in batch if 'error' not in entry], related, stats)
+
+    # Bulk inserts do not send the signals keeping the facets and the cached responses up to date
+    PlaceFacet.refresh(places)
+    bump_data_version()
+
+    return dict(stats)
@@ -1,133 +1,625 @@
 #%%
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional
 from .models import *
+from .cache import bump_data_version_on_commit
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import GEOSGeometry
 from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
 from typing import Union
 #%%
 import os
+import re
+import gzip
 import json
+import time
+import hashlib
+import multiprocessing
+from collections import defaultdict
+from collections import deque
+from functools import partial
+from itertools import chain, islice
 from tqdm import tqdm
 
 #%%
-@transaction.atomic
-def create_places_of_interest(model: PlaceOfInterest, name_model: Name, data: List, informant: Informant, place_type: PlaceType):
-
-    props_to_keep = (
-        'amenity',
-        'name',
-        'name:fr',
-        'shop',
-        'railway',
-        'tourism',
-        'highway',
-        'office',
-        'type',
-    )
+OSM_COMMENT = "This place was originally automatically uploaded from Open Street Map source data."
+OSM_NAME_NOTE = "Name crowd-sourced from Open Street Map."
+
+# Only keep certain properties
+PROPS_TO_KEEP = (
+    'amenity',
+    'name',
+    'name:fr',
+    'shop',
+    'railway',
+    'tourism',
+    'highway',
+    'office',
+    'type',
+)
+
+# The OSM name properties and the language of each (just English or French)
+OSM_NAME_LANGUAGES = (
+    ('name', 'English'),
+    ('name:fr', 'French'),
+)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Features sent to a parsing process at a time
+PARSE_CHUNK_SIZE = 500
+
+
+# Characters read from a GeoJSON file at a time
+READ_SIZE = 1 << 16
+MAX_HEAD_SIZE = 1 << 24
+
+# Extensions of newline-delimited GeoJSON, one feature per line
+GEOJSON_SEQ_EXTENSIONS = ('.geojsonl', '.geojsonseq', '.geojsons', '.ndjson', '.jsonl')
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def open_geojson(path):
+    """Opens a GeoJSON file for reading as text, decompressing it if it is gzipped."""
+
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == b'\x1f\x8b'
+
+    return gzip.open(path, 'rt', encoding='utf-8') if gzipped else open(path, 'r', encoding='utf-8')
+
+
+class FeatureCollectionScanner:
+    """
+    Incrementally decodes a FeatureCollection from chunks of text, so that only the
+    feature being decoded is held in memory rather than the whole collection.
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self.chunks = chunks
+        self.buffer = ''
+        self.pos = 0
+
+    def fill(self, size: int = 0) -> bool:
+        """Reads chunks until at least `size` characters are buffered past the position. Returns False at the end of the input."""
 
-    places = []
-    for place in (progress := tqdm(data['features'])):
-        
-        # Only keep certain properties
-        props = {k: v for k, v in place['properties'].items() if k in props_to_keep}
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
 
-        description = "\n".join([prop for key, prop in props.items() if (prop and key not in ('name', 'name:fr'))])
+        read = False
+        while not read or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return read
+            self.buffer += chunk
+            read = True
 
-        # If it is a street route, ignore it
-        if props.get('type', None):
-            if props['type'] == 'route':
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or an empty string at the end of the input."""
+
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid GeoJSON: expected one of {characters!r} but found {character!r}")
+        self.pos += 1
+
+        return character
+
+    def value(self):
+        """Decodes the next JSON value, reading more of the input as long as it is incomplete."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Double the buffer so that large values are not decoded again for every chunk
+                if not self.fill(2 * (len(self.buffer) - self.pos)):
+                    raise
+                continue
+
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.fill(len(self.buffer) - self.pos + 1):
                 continue
 
-        # Create the geometries from geojson
-        place_str = json.dumps(place['geometry'])
-        geometry    = GEOSGeometry(place_str)
+            self.pos = end
+            return value
+
+    def features(self) -> Iterator[Dict]:
+
+        self.expect('{')
+        if self.peek() == '}':
+            return
+
+        while True:
+            key = self.value()
+            self.expect(':')
+
+            if key == 'features':
+                self.expect('[')
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.value()
+                        if self.expect(',]') == ']':
+                            break
+            else:
+                # Skip the other members, e.g. the type or crs
+                self.value()
+
+            if self.expect(',}') == '}':
+                break
+
+
+def parse_feature_line(line: str) -> Optional[Dict]:
+
+    # GeoJSON text sequences prefix each feature with a record separator
+    line = line.strip().lstrip('\x1e')
+
+    return json.loads(line) if line else None
+
+
+def iter_feature_lines(chunks: Iterator[str]) -> Iterator[Dict]:
+
+    pending = ''
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split('\n')
+        for line in lines:
+            if feature := parse_feature_line(line):
+                yield feature
+
+    if feature := parse_feature_line(pending):
+        yield feature
+
+
+def is_feature_line(head: str) -> bool:
+    """Whether the text starts with a whole feature on its own line, i.e. is newline-delimited GeoJSON."""
+
+    line, newline, _ = head.lstrip().partition('\n')
+    if not newline:
+        return False
+
+    try:
+        return json.loads(line.lstrip('\x1e')).get('type') == 'Feature'
+    except (ValueError, AttributeError):
+        return False
+
+
+def iter_features(path) -> Iterator[Dict]:
+    """
+    Streams the features of a GeoJSON FeatureCollection, or of newline-delimited GeoJSON
+    (GeoJSONSeq), optionally gzipped, without loading the whole file.
+    """
+
+    extension = os.path.splitext(path[:-3] if path.endswith('.gz') else path)[1].lower()
+
+    with open_geojson(path) as f:
+        # Read at least the first line, within reason, to tell the two formats apart
+        head = f.read(READ_SIZE)
+        while '\n' not in head.lstrip() and len(head) < MAX_HEAD_SIZE and (chunk := f.read(READ_SIZE)):
+            head += chunk
+
+        chunks = chain([head], iter(lambda: f.read(READ_SIZE), ''))
+
+        if extension in GEOJSON_SEQ_EXTENSIONS or head.lstrip().startswith('\x1e') or is_feature_line(head):
+            yield from iter_feature_lines(chunks)
+        else:
+            yield from FeatureCollectionScanner(chunks).features()
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yields lists of at most `size` items from the iterable."""
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def repair_geometry(geometry: GEOSGeometry) -> GEOSGeometry:
+    """Returns a valid version of the geometry, e.g. without self-intersecting rings."""
+
+    if geometry.valid:
+        return geometry
+
+    if hasattr(geometry, 'make_valid'):
+        return geometry.make_valid()
+
+    # Older versions of GEOS, buffering lines would turn them into empty polygons
+    return geometry.buffer(0) if geometry.dims == 2 else geometry
+
+
+def parse_feature(feature: Dict, validate: bool = False) -> Optional[Dict]:
+    """
+    Extracts the geometry, description and names of an OSM feature, or None if it should be skipped.
+    With `validate`, invalid geometries are repaired.
+    """
+
+    props = {k: v for k, v in feature['properties'].items() if k in PROPS_TO_KEEP}
+
+    # If it is a street route, ignore it
+    if props.get('type', None) == 'route':
+        return None
+
+    description = "\n".join([prop for key, prop in props.items() if (prop and key not in ('name', 'name:fr'))])
+
+    # Create the geometries from geojson
+    geometry = GEOSGeometry(json.dumps(feature['geometry']))
+    if validate:
+        geometry = repair_geometry(geometry)
+
+    # The OSM element, e.g. "way/123", which keys the place in incremental imports
+    osm_id = feature.get('id') or feature['properties'].get('@id') or feature['properties'].get('id')
+
+    return {
+        'osm_id': str(osm_id) if osm_id else None,
+        'geometry': geometry,
+        'description': description,
+        'names': [(props[key], language) for key, language in OSM_NAME_LANGUAGES if props.get(key)],
+    }
+
+
+def parse_chunk(chunk: List, validate: bool = False) -> List[Dict]:
+
+    return [parsed for parsed in (parse_feature(feature, validate) for feature in chunk) if parsed]
 
-        # Create the place
-        place_of_interest, _ = model.objects.get_or_create(
-            geometry=geometry, 
-            comment="This place was originally automatically uploaded from Open Street Map source data.",
-            description=description,
-            type=place_type,
-            )
 
-        # Fetch the names, if any
-        osm_name_english = props.get('name', None)
-        osm_name_french  = props.get('name:fr', None)
-        
-        progress.set_description(f"Processing {osm_name_english}/{osm_name_french}")
+def parse_features(features: Iterable, processes: Optional[int] = None, validate: bool = False, chunk_size: int = PARSE_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Parses features in a pool of `processes` (by default one per core, at most one per chunk), `chunk_size`
+    features at a time, yielding them in their original order. Skipped features, e.g. street routes, never leave
+    the pool. Only a few chunks per process are in flight at any time, so the features are still streamed. A
+    single chunk is parsed in this process, as forking a pool would take longer than parsing it.
+    """
 
-        # Create name objects (just English or French)
-        # The English name
-        if osm_name_english:
-            name_english = name_model.objects.create(
-                text=osm_name_english, 
-                note="Name crowd-sourced from Open Street Map.",
-                referent=place_of_interest
-                )
+    parse = partial(parse_chunk, validate=validate)
+    chunks = iter(batched(features, chunk_size))
 
-            name_english.informants.add(informant)
-            name_english.languages.add(Language.objects.get(name='English'))
-            name_english.save()
+    # The chunks read ahead to size the pool, up to one per process
+    head = list(islice(chunks, processes or os.cpu_count()))
+    chunks = chain(head, chunks)
 
-        # The French name
-        if osm_name_french:
-            name_french = name_model.objects.create(
-                text=osm_name_french,
-                note="Name crowd-sourced from Open Street Map.",
-                referent=place_of_interest
-                )
+    if processes == 1 or len(head) <= 1:
+        for chunk in chunks:
+            yield from parse(chunk)
+        return
 
-            name_french.informants.add(informant)
-            name_french.languages.add(Language.objects.get(name='French'))
-            name_french.save()
-        
-        places.append(place_of_interest)
+    processes = len(head)
+    # Forked, as spawned workers would import the models again before Django is set up
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        pending = deque()
+        max_pending = 2 * processes
 
-    # place_of_interest.objects.bulk_create(places)
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse, (chunk,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
 
-    return places
+        while pending:
+            yield from pending.popleft().get()
 
 
+def through_rows(name_model: Name, field_name: str, pairs: Iterable) -> List:
+    """Builds the through table rows of the many-to-many field `field_name` from (name, related object) pairs."""
 
+    field = name_model._meta.get_field(field_name)
+    through = field.remote_field.through
+
+    return [through(**{field.m2m_field_name(): name, field.m2m_reverse_field_name(): related}) for name, related in pairs]
+
+
+def write_places_of_interest(model: PlaceOfInterest, name_model: Name, batch: List, informant: Informant, languages: Dict, place_type: PlaceType, place_ids: Dict) -> int:
+    """
+    Writes a batch of parsed features with a single bulk insert per table.
+    Features with the same OSM ID are merged into one place, as are features without one with the same geometry and
+    description, as get_or_create did. The OSM ID is the identity of the incremental imports, which would not find
+    the places of features merged under another ID. `place_ids` keeps track of the places already written by earlier
+    batches. If it is None, nothing is merged.
+    """
+
+    new_places = {}
+    referents = []
+    for feature in batch:
+        if place_ids is None or feature['osm_id']:
+            key = feature['osm_id']
+        else:
+            key = hashlib.blake2b(feature['geometry'].ewkb + feature['description'].encode(), digest_size=16).digest()
+
+        if place_ids and key in place_ids:
+            referent = place_ids[key]
+        else:
+            referent = new_places.get(key)
+            if referent is None:
+                referent = new_places[key] = model(
+                    osm_id=feature['osm_id'],
+                    geometry=feature['geometry'],
+                    comment=OSM_COMMENT,
+                    description=feature['description'],
+                    type=place_type,
+                    )
+
+        referents.append((referent, feature['names']))
+
+    model.objects.bulk_create(new_places.values())
+    if place_ids is not None:
+        place_ids.update((key, place.id) for key, place in new_places.items())
+
+    create_names(name_model, [
+        (referent if isinstance(referent, int) else referent.id, text, language)
+        for referent, feature_names in referents
+        for text, language in feature_names
+        ], informant, languages)
+
+    refresh_places({referent if isinstance(referent, int) else referent.id for referent, _ in referents})
+
+    return len(new_places)
+
+
+def refresh_places(ids):
+    """Recomputes the data derived from places, which bulk inserts and updates do not keep up to date."""
+
+    PlaceOfInterest.update_spatial_fields(ids)
+    PlaceOfInterest.update_display_names(ids)
+    PlaceFacet.refresh(ids)
+    SimplifiedGeometry.refresh(ids)
+    bump_data_version_on_commit()
+
+
+def create_names(name_model: Name, names: List, informant: Informant, languages: Dict):
+    """Bulk creates OSM names from (referent id, text, language name) tuples."""
+
+    names = [(name_model(text=text, search_text=normalize_search_text(text), note=OSM_NAME_NOTE, referent_id=referent_id), languages[language]) for referent_id, text, language in names]
+
+    name_model.objects.bulk_create([name for name, _ in names])
+    ChangeLog.log(name_model, [name.pk for name, _ in names])
+
+    name_model.languages.through.objects.bulk_create(through_rows(name_model, 'languages', names))
+    name_model.informants.through.objects.bulk_create(through_rows(name_model, 'informants', [(name, informant) for name, _ in names]))
+
+
+def create_places_of_interest(model: PlaceOfInterest, name_model: Name, data: Union[Dict, Iterable], informant: Informant, place_type: PlaceType, batch_size: int = DEFAULT_BATCH_SIZE, processes: Optional[int] = None, validate: bool = False) -> int:
+    """
+    Imports OSM features as places of interest with English and French names, `batch_size` features at a time.
+    `data` is either a GeoJSON feature collection or an iterable of features, which are parsed by `processes` processes,
+    see parse_features. Returns the number of places created.
+    """
+
+    # Resolve the languages once for the whole import
+    languages = {language: Language.objects.get(name=language) for _, language in OSM_NAME_LANGUAGES}
+
+    features = data['features'] if isinstance(data, dict) else data
+
+    place_ids = {}
+    created = 0
+    parsed = parse_features(features, processes, validate)
+
+    start = time.perf_counter()
+    for batch in (progress := tqdm(batched(parsed, batch_size), unit="batch", desc=f"Importing {place_type}")):
+
+        with transaction.atomic():
+            created += write_places_of_interest(model, name_model, batch, informant, languages, place_type, place_ids)
+
+        elapsed, start = time.perf_counter() - start, time.perf_counter()
+        progress.set_postfix(places=created, rate=f"{len(batch) / elapsed:.0f} features/s")
+
+    return created
+
+
+def sync_batch(model: PlaceOfInterest, name_model: Name, batch: List, informant: Informant, languages: Dict, place_type: PlaceType, stats: Dict):
+    """
+    Applies a batch of parsed features to the places with the same OSM ID.
+    Only the OSM names of a place are touched, and places marked as corrected are left as they are.
+    """
+
+    existing = model.objects.filter(osm_id__in=[feature['osm_id'] for feature in batch]).only('id', 'osm_id', 'corrected', 'geometry', 'description', 'type', 'updated_at')
+    existing = {place.osm_id: place for place in existing}
+
+    # The text and languages of the current OSM names of each place, a name without a language having none
+    languages_of = defaultdict(set)
+    referents = {}
+    rows = name_model.objects.filter(referent__in=[place.id for place in existing.values()], note=OSM_NAME_NOTE).values_list('referent_id', 'id', 'text', 'languages__name')
+    for referent_id, name_id, text, language in rows:
+        referents[name_id] = (referent_id, text)
+        if language is not None:
+            languages_of[name_id].add(language)
+
+    # The names of each place by (text, languages), the copies of a name being stale
+    osm_names = defaultdict(dict)
+    duplicates = defaultdict(list)
+    for name_id, (referent_id, text) in sorted(referents.items()):
+        key = (text, frozenset(languages_of[name_id]))
+        if key in osm_names[referent_id]:
+            duplicates[referent_id].append(name_id)
+        else:
+            osm_names[referent_id][key] = name_id
+
+    inserted = []
+    updated = []
+    stale_names = []
+    new_names = []
+    for feature in batch:
+        place = existing.get(feature['osm_id'])
+
+        if place is None:
+            inserted.append(feature)
+            continue
+
+        if place.corrected:
+            stats['corrected'] += 1
+            continue
+
+        changed = False
+        if place.geometry is None or place.geometry.ewkb != feature['geometry'].ewkb or place.description != feature['description'] or place.type_id != place_type.id:
+            place.geometry = feature['geometry']
+            place.description = feature['description']
+            place.type = place_type
+            # Bulk updates skip auto_now, which the change feed and the export fingerprint rely on
+            place.updated_at = timezone.now()
+            updated.append(place)
+            changed = True
+
+        current = osm_names[place.id]
+        wanted = {(text, frozenset([language])): language for text, language in feature['names']}
+        for key, name_id in current.items():
+            if key not in wanted:
+                stale_names.append(name_id)
+                changed = True
+        for key, language in wanted.items():
+            if key not in current:
+                new_names.append((place.id, key[0], language))
+                changed = True
+        if duplicates[place.id]:
+            stale_names += duplicates[place.id]
+            changed = True
+
+        stats['updated' if changed else 'unchanged'] += 1
+
+    stats['inserted'] += write_places_of_interest(model, name_model, inserted, informant, languages, place_type, None)
+
+    model.objects.bulk_update(updated, ['geometry', 'description', 'type', 'updated_at'])
+    renamed = set(name_model.objects.filter(id__in=stale_names).values_list('referent_id', flat=True))
+    # Their places are refreshed once below rather than by the signals of each name
+    with ChangeLog.in_bulk():
+        ChangeLog.log(name_model, stale_names, deleted=True)
+        name_model.objects.filter(id__in=stale_names).delete()
+    create_names(name_model, new_names, informant, languages)
+    refresh_places(renamed.union(place.id for place in updated).union(referent_id for referent_id, _, _ in new_names))
+
+
+def deletable_places(model: PlaceOfInterest, name_model: Name):
+    """
+    Returns the places an incremental import may delete: those that were not corrected,
+    are no one's parent and only have OSM names and no images, texts, documents or transcriptions.
+    """
+
+    related = (
+        name_model.objects.exclude(note=OSM_NAME_NOTE).filter(referent=OuterRef('pk')),
+        Image.objects.filter(place_of_interest=OuterRef('pk')),
+        Text.objects.filter(place_of_interest=OuterRef('pk')),
+        Document.objects.filter(place_of_interest=OuterRef('pk')),
+        Transcription.objects.filter(place_of_interest=OuterRef('pk')),
+        model.objects.filter(parent_place=OuterRef('pk')),
+    )
+
+    queryset = model.objects.filter(corrected=False)
+    for subquery in related:
+        queryset = queryset.exclude(Exists(subquery))
+
+    return queryset
+
+
+def sync_places_of_interest(model: PlaceOfInterest, name_model: Name, data: Union[Dict, Iterable], informant: Informant, place_type: PlaceType, batch_size: int = DEFAULT_BATCH_SIZE, processes: Optional[int] = None, validate: bool = False) -> Dict:
+    """
+    Incrementally imports OSM features of a place type, keyed by their OSM ID:
+    new features are inserted, changed ones updated and places whose feature disappeared are deleted.
+    Each batch is committed on its own. Returns the number of inserted, updated, unchanged, deleted and corrected (left as is) places,
+    and of the features skipped for lacking an OSM ID.
+    """
+
+    languages = {language: Language.objects.get(name=language) for _, language in OSM_NAME_LANGUAGES}
+
+    features = data['features'] if isinstance(data, dict) else data
+
+    stats = dict.fromkeys(('inserted', 'updated', 'unchanged', 'deleted', 'corrected', 'skipped'), 0)
+    seen = set()
+    start = time.perf_counter()
+    for batch in (progress := tqdm(batched(parse_features(features, processes, validate), batch_size), unit="batch", desc=f"Syncing {place_type}")):
+
+        # Without an OSM ID a feature cannot be matched to its place, and is reported rather than inserted again on every import
+        parsed = {feature['osm_id']: feature for feature in batch if feature['osm_id']}
+        stats['skipped'] += sum(1 for feature in batch if not feature['osm_id'])
+
+        with transaction.atomic():
+            sync_batch(model, name_model, list(parsed.values()), informant, languages, place_type, stats)
+        seen.update(parsed)
+
+        elapsed, start = time.perf_counter() - start, time.perf_counter()
+        progress.set_postfix(**stats, rate=f"{len(batch) / elapsed:.0f} features/s")
+
+    # Delete the places whose features are no longer in the data
+    stale = set(model.objects.filter(type=place_type, osm_id__isnull=False).values_list('osm_id', flat=True)).difference(seen)
+    for osm_ids in batched(stale, batch_size):
+        with transaction.atomic():
+            ids = list(deletable_places(model, name_model).filter(osm_id__in=osm_ids).values_list('id', flat=True))
+            with ChangeLog.in_bulk():
+                ChangeLog.log(name_model, name_model.objects.filter(referent_id__in=ids).values_list('id', flat=True), deleted=True)
+                ChangeLog.log(model, ids, deleted=True)
+                model.objects.filter(id__in=ids).delete()
+        stats['deleted'] += len(ids)
+
+    return stats
 
 
-@transaction.atomic
 def features(
     building_path,
-    street_path
+    street_path,
+    batch_size=DEFAULT_BATCH_SIZE,
+    incremental=False,
+    processes=None,
+    validate=False,
     ):
+    """
+    Loads the OSM buildings and streets. By default everything is deleted and loaded again,
+    with `incremental` only the places that changed since the last import are written.
+    Geometries are parsed by `processes` processes and, with `validate`, repaired if invalid.
+    """
+
+    options = {'batch_size': batch_size, 'processes': processes, 'validate': validate}
+
+    if incremental:
+        return load_features(building_path, street_path, sync_places_of_interest, **options)
+
+    with transaction.atomic():
 
-    # Delete everything
-    Informant.objects.all().delete()
-    Author.objects.all().delete()
-    PlaceOfInterest.objects.all().delete()
-    Name.objects.all().delete()
-    Language.objects.all().delete()
-    # Period.objects.all().delete()
-    # Image.objects.all().delete()
-    # Text.objects.all().delete()
+        # Delete everything, with the tombstones of the deleted places, their names and the media deleted with them
+        # written in bulk rather than by the signals
+        with ChangeLog.in_bulk():
+            for changed_model in ChangeLog.MODELS:
+                rows = changed_model.objects.all()
+                if changed_model not in (PlaceOfInterest, Name):
+                    rows = rows.filter(place_of_interest__isnull=False)
+                ChangeLog.log(changed_model, rows.values_list('pk', flat=True).iterator(), deleted=True)
 
+            Informant.objects.all().delete()
+            Author.objects.all().delete()
+            PlaceOfInterest.objects.all().delete()
+            Name.objects.all().delete()
+            Language.objects.all().delete()
+        # Period.objects.all().delete()
+        # Image.objects.all().delete()
+        # Text.objects.all().delete()
 
-    informant, _ = Informant.objects.get_or_create(custom_id="OSM", note="The OSM informant representents the crowd of informants contributing to the Open Street Map.")
+        return load_features(building_path, street_path, create_places_of_interest, **options)
+
+
+def load_features(building_path, street_path, loader, **options):
+
+    informant, _ = Informant.objects.get_or_create(custom_id="OSM", defaults={'note': "The OSM informant representents the crowd of informants contributing to the Open Street Map."})
 
     # Create the different languages
     for name, abbreviation in (('English', 'en'), ('French', 'fr'), ('Kinyarwanda', 'rw'), ('Kiswahili', 'sw')):
         language, _ = Language.objects.get_or_create(name=name, abbreviation=abbreviation)
-        
-
-    # Read the data
-    with open(building_path, 'r') as f:
-        buildings_osm = json.load(f)
 
-    with open(street_path, 'r') as f:
-        streets_osm = json.load(f)
 
-    # Build the data
-    for osm, place_type_str in ((buildings_osm, "building"), (streets_osm, "street")):
+    # Build the data, streaming the features of each file
+    results = {}
+    for path, place_type_str in ((building_path, "building"), (street_path, "street")):
         place_type, _ = PlaceType.objects.get_or_create(text=place_type_str)
-        places = create_places_of_interest(PlaceOfInterest, Name, osm, informant, place_type)
-    
+        results[place_type_str] = loader(PlaceOfInterest, Name, iter_features(path), informant, place_type, **options)
+
+    return results
+
+
+
 
-    
-    
\ No newline at end of file
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from ... import load
+
+
+class Command(BaseCommand):
+    help = "Loads the Open Street Map buildings and streets as places of interest."
+
+    def add_arguments(self, parser):
+        parser.add_argument('building_path', help="GeoJSON file with the OSM buildings.")
+        parser.add_argument('street_path', help="GeoJSON file with the OSM streets.")
+        parser.add_argument('--incremental', action='store_true', help="Only write the places that changed since the last import instead of reloading everything.")
+        parser.add_argument('--batch-size', type=int, default=load.DEFAULT_BATCH_SIZE, help="Number of features written per batch.")
+        parser.add_argument('--processes', type=int, help="Number of processes parsing the geometries, by default one per core.")
+        parser.add_argument('--validate', action='store_true', help="Repair invalid geometries.")
+
+    def handle(self, *args, **options):
+        results = load.features(
+            options['building_path'],
+            options['street_path'],
+            batch_size=options['batch_size'],
+            incremental=options['incremental'],
+            processes=options['processes'],
+            validate=options['validate'],
+            )
+
+        for place_type, result in results.items():
+            self.stdout.write(self.style.SUCCESS(f"{place_type}: {result}"))
@@ -0,0 +1,34 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from ...benchmarks import BENCHMARKS, run
+
+
+class Command(BaseCommand):
+    help = "Runs a benchmark of the rwanda app and prints its report as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+        parser.add_argument('--scale', type=int, help="Size of the synthetic data, its unit depends on the benchmark.")
+        parser.add_argument('--repeat', type=int, help="Number of times each measurement is repeated.")
+        parser.add_argument('--output', help="Also write the report to this file.")
+        parser.add_argument('--baseline', help="Report of an earlier run to compare with, failing on regressions. Only for the routes benchmark.")
+        parser.add_argument('--latency-tolerance', type=float, help="How much slower than the baseline a route may get, as a ratio of its p95.")
+
+    def handle(self, *args, **options):
+        report = run(
+            options['benchmark'],
+            scale=options['scale'],
+            repeat=options['repeat'],
+            baseline=options['baseline'],
+            latency_tolerance=options['latency_tolerance'],
+            )
+
+        text = json.dumps(report, indent=2, default=str)
+        self.stdout.write(text)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text)
+
+        if report.get('regressions'):
+            raise CommandError(f"{len(report['regressions'])} regressions against {options['baseline']}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ...models import PlaceOfInterest
+
+
+def geometry_index(table):
+    """The spatial index of all the geometries of the table, not one of the partial indexes by geometry family."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef ILIKE %s AND indexdef NOT ILIKE %s",
+            [table, '%USING gist (geometry)%', '% WHERE %'],
+        )
+        row = cursor.fetchone()
+
+    return row[0] if row else None
+
+
+class Command(BaseCommand):
+    help = "Orders the places of interest on disk by their spatial index, so that the places of an area are read from few pages, then analyzes them."
+
+    def handle(self, *args, **options):
+        table = PlaceOfInterest._meta.db_table
+        index = geometry_index(table)
+        if index is None:
+            raise CommandError(f"No spatial index on {table}.geometry")
+
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f"CLUSTER {quote(table)} USING {quote(index)}")
+            cursor.execute(f"ANALYZE {quote(table)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Clustered {table} on {index}"))
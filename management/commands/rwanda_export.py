@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from ... import export
+
+
+class Command(BaseCommand):
+    help = "Exports the public map dataset as static compressed GeoJSON and FlatGeobuf files, if it changed since the latest export."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help="Directory of the exports, by default the RWANDA_EXPORT_ROOT setting.")
+        parser.add_argument('--force', action='store_true', help="Export even if the data did not change.")
+        parser.add_argument('--keep', type=int, default=export.DEFAULT_KEEP, help="Number of exports kept.")
+
+    def handle(self, *args, **options):
+        try:
+            manifest, exported = export.export_public_dataset(options['root'], force=options['force'], keep=options['keep'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        if exported:
+            self.stdout.write(self.style.SUCCESS(f"Exported {manifest['version']}: {manifest['counts']}"))
+        else:
+            self.stdout.write(f"Unchanged since {manifest['version']}")
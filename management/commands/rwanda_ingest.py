@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from ... import ingest
+
+
+class Command(BaseCommand):
+    help = "Ingests the images, documents and transcriptions of a directory or of a CSV or JSON manifest linking them to places, authors and informants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Directory of the files, or CSV or JSON manifest listing them.")
+        parser.add_argument('--batch-size', type=int, default=ingest.DEFAULT_BATCH_SIZE, help="Number of files written per batch.")
+        parser.add_argument('--processes', type=int, help="Number of processes hashing the files, extracting their metadata and converting the images, by default one per core.")
+
+    def handle(self, *args, **options):
+        try:
+            stats = ingest.ingest_media(options['path'], batch_size=options['batch_size'], processes=options['processes'])
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{key}: {value}" for key, value in sorted(stats.items())) or "Nothing to ingest"))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from ...models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = "Deletes the logged changes older than the retention period, the RWANDA_CHANGE_RETENTION_DAYS setting, by default 90 days. The change feed refuses the cursors of the pruned changes, whose clients must read the data again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Number of days the changes are kept, instead of the setting.")
+
+    def handle(self, *args, **options):
+        retention = None if options['days'] is None else timedelta(days=options['days'])
+        pruned = ChangeLog.prune(retention)
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} changes"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from ...models import PlaceOfInterest, PlaceFacet, SimplifiedGeometry
+from ...cache import bump_data_version
+from ...search import update_search_texts, update_search_vectors
+
+REFRESHES = {
+    'display-names': PlaceOfInterest.update_display_names,
+    'facets': PlaceFacet.refresh,
+    'geometries': SimplifiedGeometry.refresh,
+    'search-text': update_search_texts,
+    'search-vectors': update_search_vectors,
+    'spatial-fields': PlaceOfInterest.update_spatial_fields,
+}
+
+
+class Command(BaseCommand):
+    help = "Recomputes the data derived from the places of interest, their names and their content, e.g. after an import."
+
+    def add_arguments(self, parser):
+        parser.add_argument('refresh', nargs='*', choices=sorted(REFRESHES), help="What to recompute, by default everything.")
+
+    def handle(self, *args, **options):
+        for name in options['refresh'] or REFRESHES:
+            REFRESHES[name]()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {name}"))
+
+        bump_data_version()
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from ...models import Image
+from ... import thumbnails
+
+
+class Command(BaseCommand):
+    help = "Recreates the outdated thumbnails of the images, or prunes the least recently used ones to fit the RWANDA_THUMBNAIL_BUDGET setting. The missing thumbnails, e.g. pruned, are made again when they are next asked for."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help="Prune the thumbnails instead of creating them.")
+        parser.add_argument('--all', action='store_true', help="Also create the missing thumbnails of every image, then prune them to the budget.")
+        parser.add_argument('--budget', type=int, help="Total size of the thumbnail files kept, in bytes.")
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            pruned = thumbnails.prune_thumbnails(options['budget'])
+            self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} thumbnails"))
+            return
+
+        if thumbnails.PILImage is None:
+            self.stderr.write("Pillow is not installed, no thumbnails can be created")
+            return
+
+        images = Image.objects.prefetch_related('thumbnails').order_by('pk')
+        if not options['all']:
+            # Only the thumbnails made from an earlier file, which would otherwise be served until asked for
+            images = images.filter(thumbnails__isnull=False).distinct()
+
+        created = 0
+        for image in images.iterator(chunk_size=100):
+            current = {thumbnail.height: thumbnail.source for thumbnail in image.thumbnails.all()}
+            if options['all'] or any(source != image.file.name for source in current.values()):
+                thumbnails.create_thumbnails(image)
+                created += 1
+
+        pruned = thumbnails.prune_thumbnails(options['budget']) if options['all'] else 0
+        self.stdout.write(self.style.SUCCESS(f"Created the thumbnails of {created} images, pruned {pruned} thumbnails"))
@@ -1,41 +1,130 @@
 from tabnanny import verbose
+import threading
+import unicodedata
+from contextlib import contextmanager
+from collections import defaultdict
+from itertools import islice
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.gis.db import models
+from django.contrib.gis.db.models.functions import GeoFunc, NumPoints, PointOnSurface
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Replace
+from django.utils import timezone
 import diana.abstract.models as abstract
 import diana.abstract.mixins as mixins
 from django.utils.translation import gettext_lazy as _
 from diana.storages import OriginalFileStorage
 from diana.abstract.models import get_original_path
 
+# Whether the changes are logged in bulk in this thread, see ChangeLog.in_bulk
+_change_log = threading.local()
+
 AGE_CHOICES = (
     ('O', 'Old'),
     ('Y', 'Young'),
 )
 
+
+def normalize_search_text(text):
+    """Lower cases a text and strips its accents and diacritics for searching, e.g. "Église" becomes "eglise"."""
+
+    if text is None:
+        return None
+
+    return "".join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c)).casefold()
+
+
+def trigram_index(model_name):
+    """A trigram index on the search text, used by `search_text__contains` and trigram similarity lookups."""
+
+    return GinIndex(fields=['search_text'], opclasses=['gin_trgm_ops'], name=f'rwanda_{model_name}_search_trgm')
+
+
+def search_vector_index(model_name):
+    """A full-text index on the search vector of the title and text of a text, document or transcription."""
+
+    return GinIndex(fields=['search_vector'], name=f'rwanda_{model_name}_search_vector')
+
+
+def updated_index(model_name):
+    """An index of the last updates, scanned in order by the keyset pagination on `keyset=updated` from a cursor."""
+
+    return models.Index(fields=['updated_at', 'id'], name=f'rwanda_{model_name}_updated')
+
+
+def search_vector_field():
+
+    return SearchVectorField(null=True, blank=True, editable=False, verbose_name=_("search vector"), help_text=_("The stemmed words of the title and text, for full-text search."))
+
+
+class SimplifyPreserveTopology(GeoFunc):
+    """Simplifies a geometry within a tolerance in its units, without making it invalid."""
+
+    function = 'ST_SimplifyPreserveTopology'
+
+
+class GeometryTypeName(GeoFunc):
+    """The type of a geometry as PostGIS names it, e.g. ST_LineString."""
+
+    function = 'ST_GeometryType'
+    output_field = models.CharField()
+
+
+# The geometry types of the places by family, each with a spatial index of its own
+GEOMETRY_FAMILIES = {
+    'point': ['Point', 'MultiPoint'],
+    'line': ['LineString', 'MultiLineString'],
+    'polygon': ['Polygon', 'MultiPolygon'],
+}
+
+
+def geometry_index(family):
+    """A spatial index of the geometries of a family only, used when the places are filtered on it."""
+
+    return GistIndex(fields=['geometry'], condition=models.Q(geometry_type__in=GEOMETRY_FAMILIES[family]), name=f'rwanda_place_{family}_geometry')
+
+
 class Informant(abstract.AbstractBaseModel, mixins.GenderedMixin):
 
     custom_id = models.CharField(max_length=256, unique=True, blank=True, null=True, verbose_name=_("custom ID"), help_text=_("An ID of the informant provided by the researcher."))
     age = models.CharField(max_length=1, choices=AGE_CHOICES ,blank=True, null=True, verbose_name=_("age"), help_text=_("The approximate age of the informant."))
     note = models.TextField(null=True, blank=True, verbose_name=_("note"), help_text=_("Researcher's note on informant."))
+    search_text = models.TextField(null=True, blank=True, editable=False, verbose_name=_("search text"), help_text=_("The custom ID without case and accents, for searching."))
 
     def __str__(self) -> str:
         return self.custom_id
 
+    class Meta(abstract.AbstractBaseModel.Meta):
+        indexes = [trigram_index('informant')]
+
 class Period(abstract.AbstractTagModel):
 
     start_year = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name=_("start year"), help_text=_("An approximate start year, if applicable."))
     end_year = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name=_("end year"), help_text=_("An approximate end year, if applicable."))
+    search_text = models.TextField(null=True, blank=True, editable=False, verbose_name=_("search text"), help_text=_("The text without case and accents, for searching."))
 
     def __str__(self) -> str:
         return self.text
 
+    class Meta(abstract.AbstractTagModel.Meta):
+        indexes = [trigram_index('period')]
+
 class PlaceType(abstract.AbstractTagModel):
 
+    search_text = models.TextField(null=True, blank=True, editable=False, verbose_name=_("search text"), help_text=_("The text without case and accents, for searching."))
+
     def __str__(self) -> str:
         return self.text
 
     class Meta:
         verbose_name = _("place type")
         verbose_name_plural = _("place types")
+        indexes = [trigram_index('placetype')]
 
 class Language(abstract.AbstractBaseModel):
 
@@ -49,6 +138,116 @@ class Language(abstract.AbstractBaseModel):
     def __str__(self) -> str:
         return self.name
 
+# The deepest hierarchy of places followed, which also stops the recursive queries on cycles of parents
+MAX_HIERARCHY_DEPTH = 64
+
+DESCENDANTS_SQL = """
+    WITH RECURSIVE descendants(id, depth) AS (
+        SELECT id, 1 FROM {table} WHERE parent_place_id = %s
+        UNION ALL
+        SELECT child.id, descendants.depth + 1 FROM {table} child
+        JOIN descendants ON child.parent_place_id = descendants.id
+        WHERE descendants.depth < %s
+    )
+    SELECT id FROM descendants
+"""
+
+ANCESTORS_SQL = """
+    WITH RECURSIVE ancestors(id, parent_place_id, depth) AS (
+        SELECT id, parent_place_id, 0 FROM {table} WHERE id = %s
+        UNION ALL
+        SELECT parent.id, parent.parent_place_id, ancestors.depth + 1 FROM {table} parent
+        JOIN ancestors ON parent.id = ancestors.parent_place_id
+        WHERE ancestors.depth < %s
+    )
+    SELECT id FROM ancestors WHERE depth > 0
+"""
+
+
+class PlaceOfInterestQuerySet(models.QuerySet):
+
+    def descendants_of(self, place_id):
+        """Places below the place in the hierarchy of parent places, found by one recursive query on the parent index."""
+
+        sql = DESCENDANTS_SQL.format(table=self.model._meta.db_table)
+
+        return self.filter(pk__in=RawSQL(sql, [place_id, MAX_HIERARCHY_DEPTH]))
+
+    def ancestors_of(self, place_id):
+        """Places above the place in the hierarchy of parent places, found by one recursive query on the primary key."""
+
+        sql = ANCESTORS_SQL.format(table=self.model._meta.db_table)
+
+        return self.filter(pk__in=RawSQL(sql, [place_id, MAX_HIERARCHY_DEPTH]))
+
+    def named(self):
+        """Places with at least one name, without joining their names."""
+
+        return self.filter(models.Exists(Name.objects.filter(referent=models.OuterRef('pk'))))
+
+    def of_geometry_family(self, family):
+        """Places with a geometry of the family, e.g. point, using the spatial index of the family."""
+
+        return self.filter(geometry_type__in=GEOMETRY_FAMILIES[family])
+
+    def having(self, *sources, **lookups):
+        """
+        Places with at least one object of any of the given models, e.g. Image or Text,
+        optionally matching the lookups. Evaluated as EXISTS subqueries by the database.
+        """
+
+        condition = models.Q()
+        for source in sources:
+            condition |= models.Q(models.Exists(source.objects.filter(place_of_interest=models.OuterRef('pk'), **lookups)))
+
+        return self.filter(condition)
+
+    def with_names(self, *conditions, **lookups):
+        """Places with at least one name matching the conditions and lookups."""
+
+        return self.filter(models.Exists(Name.objects.filter(*conditions, referent=models.OuterRef('pk'), **lookups)))
+
+    def with_language(self, language):
+        """Places with a name in the language with the given name or abbreviation."""
+
+        return self.with_names(models.Q(languages__name__exact=language) | models.Q(languages__abbreviation__exact=language))
+
+    def faceted(self, language=None, place_type=None, period=None, informant=None, source=None):
+        """
+        Filters places on their precomputed facets, see PlaceFacet. The criteria are first resolved to ids in the
+        small language, type, period and informant tables. The places without facets, e.g. inserted in bulk before
+        `manage.py rwanda_refresh facets`, are matched on their names, texts and media instead, as before the facets.
+        """
+
+        facets = PlaceFacet.objects.all()
+        missing = self.model._default_manager.filter(facet__isnull=True)
+
+        if language:
+            ids = list(Language.objects.filter(models.Q(name__exact=language) | models.Q(abbreviation__exact=language)).values_list('id', flat=True))
+            facets = facets.filter(language_ids__overlap=ids)
+            missing = missing.with_names(languages__in=ids)
+        if place_type:
+            ids = list(PlaceType.objects.filter(search_text__contains=normalize_search_text(place_type)).values_list('id', flat=True))
+            facets = facets.filter(type__in=ids)
+            missing = missing.filter(type__in=ids)
+        if period:
+            ids = list(Period.objects.filter(search_text__contains=normalize_search_text(period)).values_list('id', flat=True))
+            facets = facets.filter(period_ids__overlap=ids)
+            missing = missing.with_names(period__in=ids)
+        if informant:
+            ids = list(Informant.objects.filter(search_text__contains=normalize_search_text(informant)).values_list('id', flat=True))
+            facets = facets.filter(informant_ids__overlap=ids)
+            missing = missing.having(Text, informants__in=ids)
+        if source in PlaceFacet.SOURCES:
+            facets = facets.filter(**{PlaceFacet.SOURCES[source]: True})
+            missing = missing.having(PlaceFacet.SOURCE_MODELS[source])
+
+        if not (language or place_type or period or informant or source in PlaceFacet.SOURCES):
+            return self
+
+        return self.filter(models.Q(pk__in=facets.values('place_id')) | models.Q(pk__in=missing.values('pk')))
+
+
 class PlaceOfInterest(abstract.AbstractBaseModel):
     
     corrected  = models.BooleanField(default=False, verbose_name=_("corrected"))
@@ -61,16 +260,66 @@ class PlaceOfInterest(abstract.AbstractBaseModel):
     is_existing = models.BooleanField(default=False, verbose_name=_("is existing"))
     is_private = models.BooleanField(default=False, verbose_name=_("is private"))
     parent_place = models.ForeignKey('self', on_delete=models.PROTECT, help_text=_("The parent of place"), blank=True, null=True)
-                             
+    osm_id = models.CharField(max_length=64, unique=True, blank=True, null=True, verbose_name=_("OSM ID"), help_text=_("The identifier of the Open Street Map feature the place was imported from."))
+    display_name = models.TextField(blank=True, null=True, editable=False, verbose_name=_("display name"), help_text=_("The names of the place, kept up to date when they change."))
+    geometry_type = models.CharField(max_length=32, blank=True, null=True, editable=False, db_index=True, verbose_name=_("geometry type"), help_text=_("The type of the geometry, e.g. Point or LineString."))
+    point = models.PointField(blank=True, null=True, editable=False, verbose_name=_("representative point"), help_text=_("A point on the geometry, for showing the place as a point."))
+
+    objects = PlaceOfInterestQuerySet.as_manager()
+
     def __str__(self) -> str:
 
-        ns = ", ".join([f"{n.text}" for n in self.names.all()]).rstrip()
+        return f"{self.display_name}" if self.display_name else f"{self.id}"
+
+    @staticmethod
+    def build_display_name(texts) -> str:
+
+        return ", ".join([f"{text}" for text in texts]).rstrip()
+
+    @classmethod
+    def update_display_names(cls, ids=None, batch_size=1000):
+        """Recomputes the display names of the places with the given ids, or of all places."""
+
+        places = cls.objects.all() if ids is None else cls.objects.filter(pk__in=ids)
+        pks = list(places.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+
+            texts = defaultdict(list)
+            for referent_id, text in Name.objects.filter(referent_id__in=batch).order_by('id').values_list('referent_id', 'text'):
+                texts[referent_id].append(text)
 
-        return f"{ns}" if ns else f"{self.id}"
+            # Bulk updates skip auto_now, which the export fingerprint relies on
+            now = timezone.now()
+            cls.objects.bulk_update([cls(pk=pk, display_name=cls.build_display_name(texts[pk]) or None, updated_at=now) for pk in batch], ['display_name', 'updated_at'])
+            ChangeLog.log(cls, batch)
+
+    def set_spatial_fields(self):
+        """Derives the geometry type and the representative point from the geometry."""
+
+        if self.geometry is None or self.geometry.empty:
+            self.geometry_type = self.point = None
+        else:
+            self.geometry_type = self.geometry.geom_type
+            self.point = self.geometry.point_on_surface
+
+    @classmethod
+    def update_spatial_fields(cls, ids=None):
+        """Recomputes the geometry types and representative points of the places with the given ids, or of all places, in the database."""
+
+        places = cls.objects.all() if ids is None else cls.objects.filter(pk__in=ids)
+
+        places.update(
+            geometry_type=Replace(GeometryTypeName('geometry'), models.Value('ST_'), models.Value('')),
+            point=PointOnSurface('geometry'),
+            updated_at=timezone.now(),
+        )
 
     class Meta:
         verbose_name = _("place of interest")
         verbose_name_plural = _("places of interest")
+        indexes = [*(geometry_index(family) for family in GEOMETRY_FAMILIES), updated_index('placeofinterest')]
 
 
 class Name(abstract.AbstractBaseModel):
@@ -81,10 +330,12 @@ class Name(abstract.AbstractBaseModel):
     informants = models.ManyToManyField(Informant, blank=True, verbose_name=_("informants"), help_text=_("List of informants attesting to the name."), related_name="%(class)s_names")
     note = models.TextField(null=True, blank=True, verbose_name=_("note"), help_text=_("Researcher's note on the name."))
     referent = models.ForeignKey(PlaceOfInterest, on_delete=models.CASCADE, verbose_name=_("referent"), help_text=_("The street with this name."), related_name="names")
+    search_text = models.TextField(null=True, blank=True, editable=False, verbose_name=_("search text"), help_text=_("The text without case and accents, for searching."))
 
     class Meta:
         verbose_name = _("name")
         verbose_name_plural = _("names")
+        indexes = [trigram_index('name'), updated_index('name')]
 
     def __str__(self) -> str:
 
@@ -108,6 +359,9 @@ class Image(abstract.AbstractTIFFImageModel):
     def __str__(self) -> str:
         return f"{self.title}"
 
+    class Meta(abstract.AbstractTIFFImageModel.Meta):
+        indexes = [updated_index('image')]
+
 
 class Text(abstract.AbstractBaseModel):
 
@@ -116,10 +370,14 @@ class Text(abstract.AbstractBaseModel):
     text = models.TextField(null=True, blank=True, verbose_name=_("text"))
     authors = models.ManyToManyField(Author, blank=True, related_name="texts")
     informants = models.ManyToManyField(Informant, blank=True, related_name="texts", verbose_name=_("informants"), help_text=_("List of informants attesting to the name."))
+    search_vector = search_vector_field()
 
     def __str__(self) -> str:
         return f"{self.title}"
 
+    class Meta(abstract.AbstractBaseModel.Meta):
+        indexes = [search_vector_index('text'), updated_index('text')]
+
 
 class Document(abstract.AbstractBaseModel):
 
@@ -129,10 +387,14 @@ class Document(abstract.AbstractBaseModel):
     text = models.TextField(null=True, blank=True, verbose_name=_("document text"))
     authors = models.ManyToManyField(Author, blank=True, related_name="document")
     informants = models.ManyToManyField(Informant, blank=True, related_name="document", verbose_name=_("document informants"), help_text=_("List of informants attesting to the document."))
+    search_vector = search_vector_field()
 
     def __str__(self) -> str:
         return f"{self.title}"
 
+    class Meta(abstract.AbstractBaseModel.Meta):
+        indexes = [search_vector_index('document'), updated_index('document')]
+
 
 class Transcription(abstract.AbstractBaseModel):
 
@@ -142,6 +404,7 @@ class Transcription(abstract.AbstractBaseModel):
     authors = models.ManyToManyField(Author, blank=True, related_name="transcriptions")
     age = models.CharField(max_length=1, choices=AGE_CHOICES ,blank=True, null=True, verbose_name=_("age"), help_text=_("The approximate age of the informant."))
     document = models.FileField(null=True, blank=True, storage=OriginalFileStorage, upload_to=get_original_path, verbose_name=_("document"))
+    search_vector = search_vector_field()
 
     def __str__(self) -> str:
         if self.title:
@@ -150,4 +413,271 @@ class Transcription(abstract.AbstractBaseModel):
             return f"{self.id}"
     class Meta:
         verbose_name = _("Transcription")
-        verbose_name_plural = _("Transcriptions")
\ No newline at end of file
+        verbose_name_plural = _("Transcriptions")
+        indexes = [search_vector_index('transcription'), updated_index('transcription')]
+
+
+class PlaceFacet(models.Model):
+    """
+    The facets of a place used by the advanced search, precomputed from its names, texts and media.
+    Kept up to date by signals, and recomputed with `manage.py rwanda_refresh facets`.
+    """
+
+    # The source parameter of the advanced search and the flag of each
+    SOURCES = {
+        'image': 'has_image',
+        'text': 'has_text',
+        'document': 'has_document',
+    }
+
+    # The model of each source, for the places without facets
+    SOURCE_MODELS = {
+        'image': Image,
+        'text': Text,
+        'document': Document,
+    }
+
+    place = models.OneToOneField(PlaceOfInterest, primary_key=True, on_delete=models.CASCADE, related_name="facet")
+    type = models.ForeignKey(PlaceType, on_delete=models.CASCADE, related_name="+")
+    language_ids = ArrayField(models.BigIntegerField(), default=list, help_text=_("The languages of the names of the place."))
+    period_ids = ArrayField(models.BigIntegerField(), default=list, help_text=_("The periods of the names of the place."))
+    informant_ids = ArrayField(models.BigIntegerField(), default=list, help_text=_("The informants of the texts about the place."))
+    has_image = models.BooleanField(default=False)
+    has_text = models.BooleanField(default=False)
+    has_document = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['language_ids'], name='rwanda_facet_languages'),
+            GinIndex(fields=['period_ids'], name='rwanda_facet_periods'),
+            GinIndex(fields=['informant_ids'], name='rwanda_facet_informants'),
+            models.Index(fields=['place'], condition=models.Q(has_image=True), name='rwanda_facet_has_image'),
+            models.Index(fields=['place'], condition=models.Q(has_text=True), name='rwanda_facet_has_text'),
+            models.Index(fields=['place'], condition=models.Q(has_document=True), name='rwanda_facet_has_document'),
+        ]
+
+    @classmethod
+    def refresh(cls, ids=None, batch_size=1000):
+        """Recomputes the facets of the places with the given ids, or of all places."""
+
+        places = PlaceOfInterest.objects.all() if ids is None else PlaceOfInterest.objects.filter(pk__in=ids)
+        pks = list(places.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+
+            languages = defaultdict(set)
+            for place_id, language_id in Name.languages.through.objects.filter(name__referent_id__in=batch).values_list('name__referent_id', 'language_id'):
+                languages[place_id].add(language_id)
+
+            periods = defaultdict(set)
+            for place_id, period_id in Name.objects.filter(referent_id__in=batch, period__isnull=False).values_list('referent_id', 'period_id'):
+                periods[place_id].add(period_id)
+
+            informants = defaultdict(set)
+            for place_id, informant_id in Text.informants.through.objects.filter(text__place_of_interest_id__in=batch).values_list('text__place_of_interest_id', 'informant_id'):
+                informants[place_id].add(informant_id)
+
+            sources = {
+                flag: set(model.objects.filter(place_of_interest_id__in=batch).values_list('place_of_interest_id', flat=True).distinct())
+                for flag, model in (('has_image', Image), ('has_text', Text), ('has_document', Document))
+            }
+
+            facets = [
+                cls(
+                    place_id=place_id,
+                    type_id=type_id,
+                    language_ids=sorted(languages[place_id]),
+                    period_ids=sorted(periods[place_id]),
+                    informant_ids=sorted(informants[place_id]),
+                    **{flag: place_id in place_ids for flag, place_ids in sources.items()},
+                )
+                for place_id, type_id in PlaceOfInterest.objects.filter(pk__in=batch).values_list('pk', 'type_id')
+            ]
+
+            with transaction.atomic():
+                cls.objects.filter(place_id__in=batch).delete()
+                cls.objects.bulk_create(facets)
+
+
+class SimplifiedGeometry(models.Model):
+    """
+    The geometry of a place simplified for a band of zoom levels, served instead of the full geometry when zoomed out.
+    Only the geometries that simplification shortens are kept. Kept up to date by signals, and recomputed with
+    `manage.py rwanda_refresh geometries`.
+    """
+
+    # The highest zoom level of each band, the simplification tolerance in degrees, about half a pixel at that zoom,
+    # and the decimals of the coordinates worth keeping
+    BANDS = (
+        (8, 0.003, 3),
+        (11, 0.0003, 4),
+        (14, 0.00004, 5),
+    )
+
+    # The decimals of the coordinates worth keeping above the bands, about ten centimetres
+    FULL_PRECISION = 6
+
+    place = models.ForeignKey(PlaceOfInterest, on_delete=models.CASCADE, related_name="simplified_geometries")
+    band = models.PositiveSmallIntegerField(help_text=_("The highest zoom level the geometry is simplified for."))
+    geometry = models.GeometryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['place', 'band'], name='rwanda_simplified_geometry_band'),
+        ]
+
+    @classmethod
+    def band_for(cls, zoom):
+        """The band of a zoom level and its coordinate precision, with no band above the bands."""
+
+        for band, _tolerance, precision in cls.BANDS:
+            if zoom <= band:
+                return band, precision
+
+        return None, cls.FULL_PRECISION
+
+    @classmethod
+    def refresh(cls, ids=None, batch_size=1000):
+        """Recomputes the simplified geometries of the places with the given ids, or of all places."""
+
+        places = PlaceOfInterest.objects.all() if ids is None else PlaceOfInterest.objects.filter(pk__in=ids)
+        pks = list(places.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+
+            geometries = []
+            for band, tolerance, _precision in cls.BANDS:
+                simplified = PlaceOfInterest.objects.filter(pk__in=batch, geometry__isnull=False).annotate(
+                    points=NumPoints('geometry'),
+                    simplified=SimplifyPreserveTopology('geometry', tolerance),
+                ).values_list('pk', 'points', 'simplified')
+
+                geometries += [
+                    cls(place_id=place_id, band=band, geometry=geometry)
+                    for place_id, points, geometry in simplified
+                    if geometry is not None and points is not None and geometry.num_coords < points
+                ]
+
+            with transaction.atomic():
+                cls.objects.filter(place_id__in=batch).delete()
+                cls.objects.bulk_create(geometries)
+
+
+class Thumbnail(models.Model):
+    """
+    A small WebP or JPEG derivative of an image shown in listings and previews instead of its original file.
+    Its file is named after the hash of the content of the original, so images with the same content share it.
+    Created on upload or when first shown, and pruned least recently used first with `manage.py rwanda_thumbnails --prune`.
+    """
+
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name="thumbnails")
+    height = models.PositiveSmallIntegerField(help_text=_("The height of the thumbnail in pixels."))
+    source = models.CharField(max_length=1024, help_text=_("The name of the original file the thumbnail was made from."))
+    key = models.CharField(max_length=64, db_index=True, help_text=_("The hash of the content of the original file."))
+    name = models.CharField(max_length=255, help_text=_("The name of the thumbnail file in the storage."))
+    size = models.PositiveIntegerField(default=0, help_text=_("The size of the thumbnail file in bytes."))
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'height'], name='rwanda_thumbnail_height'),
+        ]
+
+
+class IngestedFile(models.Model):
+    """
+    A file ingested by `manage.py rwanda_ingest`, by the hash of its content, so that ingesting the same files again,
+    e.g. after an interrupted run, skips them.
+    """
+
+    key = models.CharField(max_length=64, unique=True, help_text=_("The hash of the content of the file."))
+    path = models.CharField(max_length=1024, help_text=_("The path the file was ingested from."))
+    size = models.PositiveBigIntegerField(default=0, help_text=_("The size of the file in bytes."))
+    model = models.CharField(max_length=64, help_text=_("The model of the object created from the file."))
+    object_id = models.PositiveBigIntegerField(null=True, help_text=_("The id of the object created from the file."))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class ChangeLog(models.Model):
+    """
+    A change of a place, name or media object, created, updated or deleted, listed by the change feed in the order
+    the transactions writing them committed. Written by the signals of single saves and deletes, and in bulk by the
+    loaders, which turn the signals off with `ChangeLog.in_bulk()`.
+    """
+
+    model = models.CharField(max_length=64, help_text=_("The model of the changed object."))
+    object_id = models.PositiveBigIntegerField(help_text=_("The id of the changed object."))
+    deleted = models.BooleanField(default=False, help_text=_("Whether the object was deleted."))
+    transaction_id = models.BigIntegerField(help_text=_("The id of the transaction writing the change."))
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    # The models whose changes are logged
+    MODELS = (PlaceOfInterest, Name, Image, Text, Document, Transcription)
+
+    # How long the changes are kept by default, see prune()
+    DEFAULT_RETENTION_DAYS = 90
+
+    class Meta:
+        indexes = [models.Index(fields=['transaction_id', 'id'], name='rwanda_changelog_order')]
+
+    @staticmethod
+    def current_transaction_id():
+
+        return RawSQL('txid_current()', [])
+
+    @classmethod
+    def log(cls, model, pks, deleted=False, batch_size=1000):
+        """Logs the changes of the objects of a model with the given ids, `batch_size` ids at a time."""
+
+        pks = iter(pks)
+        while batch := list(islice(pks, batch_size)):
+            cls.objects.bulk_create([
+                cls(model=model._meta.model_name, object_id=pk, deleted=deleted, transaction_id=cls.current_transaction_id())
+                for pk in batch
+            ])
+
+    @classmethod
+    def retention(cls):
+        """How long the changes are kept, the RWANDA_CHANGE_RETENTION_DAYS setting, by default 90 days."""
+
+        return timedelta(days=getattr(settings, 'RWANDA_CHANGE_RETENTION_DAYS', cls.DEFAULT_RETENTION_DAYS))
+
+    @classmethod
+    def prune(cls, retention=None):
+        """
+        Deletes the changes older than the retention period, and returns their number. The last change is always kept,
+        so that the change feed can tell the cursors of the pruned changes, which are refused, from a new log.
+        """
+
+        cutoff = timezone.now() - (cls.retention() if retention is None else retention)
+        last = cls.objects.order_by('transaction_id', 'id').values_list('pk', flat=True).last()
+
+        return cls.objects.filter(changed_at__lt=cutoff).exclude(pk=last).delete()[0]
+
+    @classmethod
+    def oldest_position(cls):
+        """The (transaction id, id) of the oldest change kept, or None if none was logged."""
+
+        return cls.objects.order_by('transaction_id', 'id').values_list('transaction_id', 'id').first()
+
+    @classmethod
+    @contextmanager
+    def in_bulk(cls):
+        """
+        Within, the single saves and deletes are neither logged nor refresh the display names and facets of their
+        places by the signals, as the code does both in bulk.
+        """
+
+        previous = getattr(_change_log, 'bulk', False)
+        _change_log.bulk = True
+        try:
+            yield
+        finally:
+            _change_log.bulk = previous
+
+    @classmethod
+    def is_in_bulk(cls):
+
+        return getattr(_change_log, 'bulk', False)
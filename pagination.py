@@ -0,0 +1,198 @@
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# The keys the pages can be ordered by, with the `keyset` query parameter, each ending with a unique field
+KEYSETS = {
+    'id': ('id',),
+    'updated': ('updated_at', 'id'),
+}
+
+
+def estimated_count(queryset):
+    """The number of rows of a queryset as estimated by the query planner, without counting them."""
+
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def uses_keyset_pagination(request):
+    """Whether a request asks for keyset pagination, with `pagination=cursor` or by following a cursor."""
+
+    return request is not None and (request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params)
+
+
+def keyset_filter(queryset, ordering, position, reverse=False):
+    """
+    The rows after a position, or before it in `reverse`, compared as a row value, e.g. `(updated_at, id) > (%s, %s)`,
+    so that the index on the keys finds them however many rows share the first key.
+    """
+
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    fields = [queryset.model._meta.get_field(name) for name in ordering]
+
+    columns = ', '.join(f'{table}.{connection.ops.quote_name(field.column)}' for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    params = [field.get_db_prep_value(value, connection) for field, value in zip(fields, position)]
+
+    return queryset.filter(RawSQL(f'({columns}) {"<" if reverse else ">"} ({placeholders})', params, output_field=BooleanField()))
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pages on stable keys, by default the primary key, so that every page is found with the index in the same time,
+    however deep, and no row is skipped or repeated when rows are added or removed between pages. The cursors hold
+    every key of the row they start after, and the rows are compared on all of them at once, so that rows sharing
+    their first key, e.g. thousands updated at the same time, are paged through like the others. The total is only
+    counted with `count=exact`, or estimated from the planner statistics with `count=estimate`.
+    """
+
+    page_size = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    keyset_query_param = 'keyset'
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+
+        # The ordering filters of the viewsets would make the keys unstable
+        keyset = request.query_params.get(self.keyset_query_param, 'id')
+        ordering = KEYSETS.get(keyset, KEYSETS['id'])
+
+        # DISTINCT ON the primary key must be ordered by it first
+        if queryset.query.distinct_fields or not all(hasattr(queryset.model, field) for field in ordering):
+            ordering = KEYSETS['id']
+
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+
+        self.count = None
+        count = request.query_params.get(self.count_query_param)
+
+        if count == 'exact':
+            self.count = queryset.order_by().count()
+        elif count == 'estimate':
+            self.count = estimated_count(queryset)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        fields = [queryset.model._meta.get_field(name) for name in self.ordering]
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None or self.cursor.position is None else self.decode_position(fields, self.cursor.position)
+
+        queryset = queryset.order_by(*[f'-{name}' if reverse else name for name in self.ordering])
+        if position is not None:
+            queryset = keyset_filter(queryset, self.ordering, position, reverse)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+
+        self.has_next, self.has_previous = (position is not None, has_following) if reverse else (has_following, position is not None)
+
+        # An empty page is followed and preceded by the rows around its position
+        first = self.encode_position(fields, self.page[0]) if self.page else self.cursor and self.cursor.position
+        last = self.encode_position(fields, self.page[-1]) if self.page else self.cursor and self.cursor.position
+        self.previous_position, self.next_position = first, last
+
+        # Display page controls in the browsable API if there is more than one page
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def encode_position(self, fields, instance):
+
+        return json.dumps([field.value_to_string(instance) for field in fields])
+
+    def decode_position(self, fields, position):
+
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+
+        if not self.has_next:
+            return None
+
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+
+        if not self.has_previous:
+            return None
+
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def get_paginated_response(self, data):
+
+        response = OrderedDict([('next', self.get_next_link()), ('previous', self.get_previous_link())])
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+
+        return Response(response)
+
+
+class GeoKeysetPagination(KeysetPagination):
+    """Keyset pagination of a GeoJSON FeatureCollection, on the primary key."""
+
+    def get_ordering(self, request, queryset, view):
+
+        return KEYSETS['id']
+
+    def get_paginated_response(self, data):
+
+        response = OrderedDict([('type', 'FeatureCollection'), ('next', self.get_next_link()), ('previous', self.get_previous_link())])
+        if self.count is not None:
+            response['count'] = self.count
+        response['features'] = data['features']
+
+        return Response(response)
+
+
+class KeysetPaginationMixin:
+    """Pages the list of a viewset with keyset pagination instead of its usual pagination when asked for."""
+
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+
+        if not hasattr(self, '_paginator') and uses_keyset_pagination(getattr(self, 'request', None)):
+            self._paginator = self.keyset_pagination_class()
+
+        return super().paginator
@@ -0,0 +1,117 @@
+import json
+import time
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Queries slower than this are explained in the log, unless set with RWANDA_PROFILING_SLOW_QUERY_MS
+DEFAULT_SLOW_QUERY_MS = 100
+
+# The slowest queries explained per request
+MAX_EXPLAINED_QUERIES = 3
+
+
+def is_profiling():
+    """Whether the requests are profiled, with the RWANDA_PROFILING setting."""
+
+    return getattr(settings, 'RWANDA_PROFILING', False)
+
+
+class QueryTimer:
+    """An execute wrapper of the database connection timing its queries."""
+
+    def __init__(self):
+
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.seconds += duration
+            self.queries.append((duration, sql, params, many))
+
+    def slowest(self, threshold_ms):
+
+        slow = [query for query in self.queries if 1000 * query[0] >= threshold_ms and not query[3]]
+
+        return sorted(slow, key=lambda query: query[0], reverse=True)[:MAX_EXPLAINED_QUERIES]
+
+
+def explain(sql, params):
+
+    try:
+        # In a savepoint, as a failed query would break the transaction of the request
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except Exception as error:
+        return f"Not explained: {error}"
+
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def server_timing(timings, count):
+
+    return ", ".join(
+        f'{name};dur={1000 * seconds:.1f}' + (f';desc="{count} queries"' if name == 'sql' else '')
+        for name, seconds in timings.items()
+    )
+
+
+class ProfilingMixin:
+    """
+    Profiles the requests of a view when the RWANDA_PROFILING setting is on: the time spent in SQL and the number of
+    queries, in the view itself, mostly serialising, and in rendering, sent as a `Server-Timing` header and logged as
+    JSON with the plans of the slowest queries. Off, it only reads the setting.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+
+        if not is_profiling():
+            return super().dispatch(request, *args, **kwargs)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(timer):
+            response = super().dispatch(request, *args, **kwargs)
+            handled = time.perf_counter()
+
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+            rendered = time.perf_counter()
+
+        timings = {
+            'sql': timer.seconds,
+            'view': max(0.0, handled - start - timer.seconds),
+            'render': rendered - handled,
+            'total': rendered - start,
+        }
+        response['Server-Timing'] = server_timing(timings, timer.count)
+
+        threshold = getattr(settings, 'RWANDA_PROFILING_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+        slow = [
+            {'ms': round(1000 * duration, 1), 'sql': sql, 'plan': explain(sql, params)}
+            for duration, sql, params, many in timer.slowest(threshold)
+        ]
+
+        logger.info(json.dumps({
+            'view': type(self).__name__,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', ''),
+            'status': response.status_code,
+            'queries': timer.count,
+            **{f'{name}_ms': round(1000 * seconds, 1) for name, seconds in timings.items()},
+            'slow_queries': slow,
+        }, default=str))
+
+        return response
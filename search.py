@@ -0,0 +1,180 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import Exists, F, FloatField, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework.filters import SearchFilter
+from .models import *
+
+# The `%` operator of pg_trgm, which can use the trigram indexes, registered as django.contrib.postgres does
+TextField.register_lookup(TrigramSimilar)
+
+FUZZY_VALUES = ('1', 'true', 'yes')
+
+# The models whose content is searched in full text, by the type of their snippets
+CONTENT_MODELS = {
+    'text': Text,
+    'document': Document,
+    'transcription': Transcription,
+}
+
+# The text search configurations the content is indexed with. PostgreSQL has no stemmer for Kinyarwanda or
+# Kiswahili, whose words are indexed as they are by `simple`
+SEARCH_CONFIGS = ('english', 'french', 'simple')
+
+# The snippets returned per place, from its best matching content
+SNIPPETS_PER_PLACE = 3
+
+HEADLINE_OPTIONS = {'start_sel': '<mark>', 'stop_sel': '</mark>', 'max_words': 35, 'min_words': 15, 'max_fragments': 2}
+
+
+def search_places(queryset, terms, fuzzy=False):
+    """
+    Filters places with a name containing every term, ignoring case and accents,
+    or with `fuzzy` a name similar to every term. The places are annotated with
+    the trigram similarity of their best matching name as `search_rank`.
+    """
+
+    terms = [normalize_search_text(term) for term in terms if term]
+    if not terms:
+        return queryset
+
+    names = Name.objects.filter(referent=OuterRef('pk'))
+    for term in terms:
+        if fuzzy:
+            queryset = queryset.filter(Exists(names.filter(search_text__trigram_similar=term)))
+        else:
+            queryset = queryset.filter(Exists(names.filter(search_text__contains=term)))
+
+    similarity = names.annotate(similarity=TrigramSimilarity('search_text', " ".join(terms))).order_by('-similarity').values('similarity')[:1]
+    queryset = queryset.annotate(search_rank=Subquery(similarity, output_field=FloatField()))
+
+    # DISTINCT ON requires ordering by the distinct fields first
+    if not queryset.query.distinct_fields:
+        queryset = queryset.order_by('-search_rank', 'pk')
+
+    return queryset
+
+
+class NameSearchFilter(SearchFilter):
+    """
+    Searches places by their names with the trigram indexed search text instead of
+    scanning the names, see search_places. Fuzzy matching is turned on with `fuzzy=true`.
+    """
+
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+
+        if not getattr(view, 'search_fields', None):
+            return queryset
+
+        fuzzy = request.query_params.get(self.fuzzy_param, '').lower() in FUZZY_VALUES
+
+        return search_places(queryset, self.get_search_terms(request), fuzzy)
+
+
+def with_name_search(backends):
+    """The filter backends with the search filter replaced by NameSearchFilter."""
+
+    backends = [NameSearchFilter if issubclass(backend, SearchFilter) else backend for backend in backends]
+
+    return backends if NameSearchFilter in backends else [*backends, NameSearchFilter]
+
+
+def update_search_texts(batch_size=1000):
+    """Recomputes the search text of every name, period, place type and informant."""
+
+    for model, field in ((Name, 'text'), (Period, 'text'), (PlaceType, 'text'), (Informant, 'custom_id')):
+        objects = []
+        for pk, text in model.objects.values_list('pk', field).iterator(chunk_size=batch_size):
+            objects.append(model(pk=pk, search_text=normalize_search_text(text)))
+            if len(objects) == batch_size:
+                model.objects.bulk_update(objects, ['search_text'])
+                objects = []
+        model.objects.bulk_update(objects, ['search_text'])
+
+
+def content_vector():
+    """The search vector of the title and text of a text, document or transcription, in every search configuration."""
+
+    vectors = [
+        SearchVector('title', weight='A', config=config) + SearchVector('text', weight='B', config=config)
+        for config in SEARCH_CONFIGS
+    ]
+
+    return reduce(lambda a, b: a + b, vectors)
+
+
+def content_query(text, config=None):
+    """A web search query, e.g. `"exact phrase" -excluded or other`, in one search configuration or in any of them."""
+
+    return reduce(or_, [SearchQuery(text, config=config, search_type='websearch') for config in ([config] if config else SEARCH_CONFIGS)])
+
+
+def update_search_vectors(models=None, ids=None, batch_size=1000):
+    """Recomputes the search vectors of the texts, documents and transcriptions, or of the given models and ids."""
+
+    for model in models or CONTENT_MODELS.values():
+        objects = model.objects.all() if ids is None else model.objects.filter(pk__in=ids)
+        pks = list(objects.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(pks), batch_size):
+            model.objects.filter(pk__in=pks[start:start + batch_size]).update(search_vector=content_vector())
+
+
+def search_content(queryset, query):
+    """
+    Filters places with a text, document or transcription matching a search query, and annotates them with the
+    rank of their best match as `search_rank`, which they are ordered by.
+    """
+
+    ranks = [
+        Coalesce(Subquery(
+            model.objects.filter(place_of_interest=OuterRef('pk'), search_vector=query)
+                         .annotate(rank=SearchRank(F('search_vector'), query))
+                         .order_by('-rank')
+                         .values('rank')[:1],
+            output_field=FloatField(),
+        ), Value(0.0))
+        for model in CONTENT_MODELS.values()
+    ]
+
+    return queryset.having(*CONTENT_MODELS.values(), search_vector=query) \
+                   .annotate(search_rank=Greatest(*ranks)) \
+                   .order_by('-search_rank', 'pk')
+
+
+def content_snippets(place_ids, query, config=None, per_place=SNIPPETS_PER_PLACE):
+    """
+    The best matching texts, documents and transcriptions of the places, with their matching words highlighted, by
+    place. The matches are ranked first, and only the best ones are highlighted, which reads their whole text.
+    """
+
+    matches = defaultdict(list)
+    for kind, model in CONTENT_MODELS.items():
+        ranked = model.objects.filter(place_of_interest_id__in=place_ids, search_vector=query) \
+                              .annotate(rank=SearchRank(F('search_vector'), query)) \
+                              .values_list('place_of_interest_id', 'pk', 'rank')
+        for place_id, pk, rank in ranked:
+            matches[place_id].append((rank, kind, pk))
+
+    best = {place_id: sorted(found, key=lambda match: (-match[0], match[1], match[2]))[:per_place] for place_id, found in matches.items()}
+
+    headlines = {}
+    for kind, model in CONTENT_MODELS.items():
+        pks = [pk for found in best.values() for _, match_kind, pk in found if match_kind == kind]
+        highlighted = model.objects.filter(pk__in=pks).annotate(
+            headline=SearchHeadline(Coalesce('text', 'title'), query, config=config or 'simple', **HEADLINE_OPTIONS),
+        ).values_list('pk', 'title', 'headline')
+        headlines.update({(kind, pk): (title, headline) for pk, title, headline in highlighted})
+
+    return {
+        place_id: [
+            {'type': kind, 'id': pk, 'title': headlines[kind, pk][0], 'rank': round(rank, 6), 'headline': headlines[kind, pk][1]}
+            for rank, kind, pk in found
+        ]
+        for place_id, found in best.items()
+    }
@@ -1,28 +1,96 @@
+from rest_framework import serializers
+from django.db.models import Prefetch
+from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from diana.abstract.serializers import DynamicDepthSerializer
 from diana.utils import get_fields, DEFAULT_FIELDS
 from .models import *
+from .geometry import SimplifiedGeometryField
+from .thumbnails import thumbnail_url
+
+# The columns derived for searching, filtering and drawing places, which are not served
+PLACE_INTERNAL_FIELDS = ['osm_id', 'display_name', 'geometry_type', 'point']
+
+
+class PlaceTypeNestedSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PlaceType
+        fields = ['id']+get_fields(PlaceType, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class PeriodNestedSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Period
+        fields = ['id']+get_fields(Period, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class LanguageNestedSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Language
+        fields = ['id']+get_fields(Language, exclude=DEFAULT_FIELDS)
+
+
+class InformantNestedSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Informant
+        fields = ['id']+get_fields(Informant, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class NameNestedSerializer(serializers.ModelSerializer):
+    languages = LanguageNestedSerializer(many=True)
+    informants = InformantNestedSerializer(many=True)
+    period = PeriodNestedSerializer()
+
+    class Meta:
+        model = Name
+        fields = ['id', 'languages', 'informants', 'period']+get_fields(Name, exclude=DEFAULT_FIELDS+['search_text', 'languages', 'informants', 'period'])
+
+
+class ParentPlaceNestedSerializer(serializers.ModelSerializer):
+    geometry = GeometryField()
+    type = PlaceTypeNestedSerializer()
+
+    class Meta:
+        model = PlaceOfInterest
+        fields = ['id', 'geometry']+get_fields(PlaceOfInterest, exclude=DEFAULT_FIELDS+PLACE_INTERNAL_FIELDS+['geometry'])
+
 
 class PlaceOfInterestSerializer(GeoFeatureModelSerializer):
+    """
+    A place as a GeoJSON feature with its names, type and parent, nested with explicit serializers so that the
+    columns derived for searching and drawing are never served.
+    """
+
+    geometry = SimplifiedGeometryField()
+    names = NameNestedSerializer(many=True)
+    type = PlaceTypeNestedSerializer()
+    parent_place = ParentPlaceNestedSerializer()
 
     class Meta:
         model = PlaceOfInterest
-        fields = ['names', 'id']+get_fields(PlaceOfInterest, exclude=DEFAULT_FIELDS+['geometry']) 
+        fields = ['names', 'id', 'geometry']+get_fields(PlaceOfInterest, exclude=DEFAULT_FIELDS+PLACE_INTERNAL_FIELDS+['geometry'])
         geo_field = 'geometry'
-        depth = 2
 
 class TIFFImageSerializer(DynamicDepthSerializer):
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Image
-        fields = ['id']+get_fields(Image, exclude=DEFAULT_FIELDS)
+        fields = ['id', 'thumbnail']+get_fields(Image, exclude=DEFAULT_FIELDS)
+
+    def get_thumbnail(self, obj):
+        return thumbnail_url(obj, 'list')
 
 
 class DocumentSerializer(DynamicDepthSerializer):
 
     class Meta:
         model = Document
-        fields = ['id']+get_fields(Document, exclude=DEFAULT_FIELDS)
+        fields = ['id']+get_fields(Document, exclude=DEFAULT_FIELDS+['search_vector'])
 
 
 
@@ -30,4 +98,182 @@ class TranscriptionSerializer(DynamicDepthSerializer):
 
     class Meta:
         model = Transcription
-        fields =  ['id']+get_fields(Transcription, exclude=DEFAULT_FIELDS)
\ No newline at end of file
+        fields =  ['id']+get_fields(Transcription, exclude=DEFAULT_FIELDS+['search_vector'])
+
+
+class TextSerializer(DynamicDepthSerializer):
+
+    class Meta:
+        model = Text
+        fields = ['id']+get_fields(Text, exclude=DEFAULT_FIELDS+['search_vector'])
+
+
+class NameSerializer(DynamicDepthSerializer):
+
+    class Meta:
+        model = Name
+        fields = ['id']+get_fields(Name, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class InformantSerializer(DynamicDepthSerializer):
+
+    class Meta:
+        model = Informant
+        fields = ['id']+get_fields(Informant, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class PeriodSerializer(DynamicDepthSerializer):
+
+    class Meta:
+        model = Period
+        fields = ['id']+get_fields(Period, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class PlaceTypeSerializer(DynamicDepthSerializer):
+
+    class Meta:
+        model = PlaceType
+        fields = ['id']+get_fields(PlaceType, exclude=DEFAULT_FIELDS+['search_text'])
+
+
+class DossierLanguageSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Language
+        fields = ['id', 'name', 'abbreviation']
+
+
+class DossierInformantSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Informant
+        fields = ['id', 'custom_id', 'age']
+
+
+class DossierAuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Author
+        fields = ['id', 'name']
+
+
+class DossierPeriodSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Period
+        fields = ['id', 'text', 'start_year', 'end_year']
+
+
+class DossierPlaceSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PlaceOfInterest
+        fields = ['id', 'display_name']
+
+
+class DossierNameSerializer(serializers.ModelSerializer):
+    languages = DossierLanguageSerializer(many=True)
+    informants = DossierInformantSerializer(many=True)
+    period = DossierPeriodSerializer()
+
+    class Meta:
+        model = Name
+        fields = ['id', 'text', 'note', 'languages', 'informants', 'period']
+
+
+class DossierImageSerializer(serializers.ModelSerializer):
+    authors = DossierAuthorSerializer(many=True)
+    informants = DossierInformantSerializer(many=True)
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Image
+        fields = ['id', 'title', 'description', 'file', 'iiif_file', 'thumbnail', 'authors', 'informants']
+
+    def get_thumbnail(self, obj):
+        return thumbnail_url(obj, 'list')
+
+
+class DossierTextSerializer(serializers.ModelSerializer):
+    authors = DossierAuthorSerializer(many=True)
+    informants = DossierInformantSerializer(many=True)
+
+    class Meta:
+        model = Text
+        fields = ['id', 'title', 'text', 'authors', 'informants']
+
+
+class DossierDocumentSerializer(serializers.ModelSerializer):
+    authors = DossierAuthorSerializer(many=True)
+    informants = DossierInformantSerializer(many=True)
+
+    class Meta:
+        model = Document
+        fields = ['id', 'title', 'text', 'filename', 'authors', 'informants']
+
+
+class DossierTranscriptionSerializer(serializers.ModelSerializer):
+    authors = DossierAuthorSerializer(many=True)
+
+    class Meta:
+        model = Transcription
+        fields = ['id', 'title', 'text', 'age', 'document', 'authors']
+
+
+class PlaceDossierSerializer(GeoFeatureModelSerializer):
+    """
+    A place with its names, media, parent and children, serialised with explicit nested serializers so that it is
+    read with a fixed number of queries, see `prefetch`. With `fields` in the context, only those properties are kept.
+    """
+
+    geometry = GeometryField()
+    type = serializers.StringRelatedField()
+    names = DossierNameSerializer(many=True)
+    images = DossierImageSerializer(many=True)
+    texts = DossierTextSerializer(many=True)
+    documents = DossierDocumentSerializer(many=True)
+    transcriptions = DossierTranscriptionSerializer(many=True)
+    parent_place = DossierPlaceSerializer()
+    children = DossierPlaceSerializer(many=True, source='placeofinterest_set')
+
+    # The queries reading the related objects of each property
+    prefetches = {
+        'type': ['type'],
+        'parent_place': ['parent_place'],
+        'names': [Prefetch('names', Name.objects.select_related('period').prefetch_related('languages', 'informants').order_by('id'))],
+        'images': [Prefetch('images', Image.objects.prefetch_related('authors', 'informants', 'thumbnails').order_by('id'))],
+        'texts': [Prefetch('texts', Text.objects.prefetch_related('authors', 'informants').order_by('id'))],
+        'documents': [Prefetch('documents', Document.objects.prefetch_related('authors', 'informants').order_by('id'))],
+        'transcriptions': [Prefetch('transcriptions', Transcription.objects.prefetch_related('authors').order_by('id'))],
+        'children': [Prefetch('placeofinterest_set', PlaceOfInterest.objects.only('id', 'display_name', 'parent_place').order_by('id'))],
+    }
+
+    # Kept whatever the fields asked for
+    required_fields = ('id', 'geometry')
+
+    class Meta:
+        model = PlaceOfInterest
+        fields = ['id', 'geometry', 'display_name', 'description', 'comment', 'type', 'is_iconic', 'is_existing', 'is_private',
+                  'names', 'images', 'texts', 'documents', 'transcriptions', 'parent_place', 'children']
+        geo_field = 'geometry'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields).difference(fields, self.required_fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def optional_fields(cls):
+        return [name for name in cls.Meta.fields if name not in cls.required_fields]
+
+    @classmethod
+    def prefetch(cls, queryset, fields=None):
+        """The queryset reading the related objects of the given properties, or of all of them."""
+
+        related = [lookup for name, lookups in cls.prefetches.items() if fields is None or name in fields for lookup in lookups]
+
+        return queryset.select_related(*[lookup for lookup in related if isinstance(lookup, str)]) \
+                       .prefetch_related(*[lookup for lookup in related if not isinstance(lookup, str)])
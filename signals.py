@@ -0,0 +1,240 @@
+import threading
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import *
+from .cache import bump_data_version_on_commit
+from .search import update_search_vectors
+from .thumbnails import create_thumbnails, delete_unshared_files
+
+_local = threading.local()
+
+# The field linking each model to its place
+PLACE_FIELDS = {
+    Name: 'referent_id',
+    Image: 'place_of_interest_id',
+    Text: 'place_of_interest_id',
+    Document: 'place_of_interest_id',
+}
+
+
+# The field each searchable model normalises into its search text
+SEARCH_TEXT_FIELDS = {
+    Name: 'text',
+    Period: 'text',
+    PlaceType: 'text',
+    Informant: 'custom_id',
+}
+
+
+# The models whose changes change the responses of the API
+CACHED_MODELS = (PlaceOfInterest, Name, Image, Text, Document, Transcription, Period, PlaceType, Informant, Language, Author)
+
+
+def deleted_places():
+    """The ids of the places being deleted in this thread."""
+
+    if not hasattr(_local, 'deleted_places'):
+        _local.deleted_places = set()
+
+    return _local.deleted_places
+
+
+def place_ids(instance):
+    """The place of the instance, and the one it was moved from if any, unless they are being deleted."""
+
+    ids = {getattr(instance, PLACE_FIELDS[type(instance)]), getattr(instance, '_previous_place_id', None)}
+    ids.discard(None)
+
+    return ids.difference(deleted_places())
+
+
+@receiver(pre_delete, sender=PlaceOfInterest)
+def remember_deleted_place(sender, instance, **kwargs):
+
+    # The names and media of a deleted place are deleted first, and must not recreate its facets
+    deleted_places().add(instance.pk)
+
+
+@receiver(post_delete, sender=PlaceOfInterest)
+def forget_deleted_place(sender, instance, **kwargs):
+
+    deleted_places().discard(instance.pk)
+
+
+@receiver(pre_save, sender=Name)
+@receiver(pre_save, sender=Period)
+@receiver(pre_save, sender=PlaceType)
+@receiver(pre_save, sender=Informant)
+def update_search_text(sender, instance, **kwargs):
+
+    instance.search_text = normalize_search_text(getattr(instance, SEARCH_TEXT_FIELDS[sender]))
+
+
+@receiver(pre_save, sender=PlaceOfInterest)
+def update_spatial_fields(sender, instance, **kwargs):
+
+    instance.set_spatial_fields()
+
+
+@receiver(pre_save, sender=PlaceOfInterest)
+def update_display_name(sender, instance, update_fields=None, **kwargs):
+
+    # A full save of an instance loaded before its names changed would write its stale display name back
+    if instance._state.adding or (update_fields is not None and 'display_name' not in update_fields):
+        return
+
+    texts = Name.objects.filter(referent_id=instance.pk).order_by('id').values_list('text', flat=True)
+    instance.display_name = PlaceOfInterest.build_display_name(texts) or None
+
+
+@receiver(pre_save, sender=Name)
+@receiver(pre_save, sender=Image)
+@receiver(pre_save, sender=Text)
+@receiver(pre_save, sender=Document)
+def remember_previous_place(sender, instance, **kwargs):
+
+    # An object moved to another place changes the data derived from both places
+    if not instance._state.adding:
+        instance._previous_place_id = sender.objects.filter(pk=instance.pk).values_list(PLACE_FIELDS[sender], flat=True).first()
+
+
+@receiver(post_save, sender=Name)
+@receiver(post_delete, sender=Name)
+def update_name_place(sender, instance, **kwargs):
+
+    # Refreshed once by the code changing names in bulk
+    if ChangeLog.is_in_bulk():
+        return
+
+    ids = place_ids(instance)
+
+    PlaceOfInterest.update_display_names(ids)
+    PlaceFacet.refresh(ids)
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Text)
+@receiver(post_delete, sender=Text)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def update_source_place(sender, instance, **kwargs):
+
+    if ChangeLog.is_in_bulk():
+        return
+
+    PlaceFacet.refresh(place_ids(instance))
+
+
+@receiver(post_save, sender=PlaceOfInterest)
+def update_place(sender, instance, **kwargs):
+
+    PlaceFacet.refresh([instance.pk])
+    SimplifiedGeometry.refresh([instance.pk])
+
+
+@receiver(post_save, sender=Text)
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=Transcription)
+def update_search_vector(sender, instance, **kwargs):
+
+    # Written with an update, as the vector is computed by the database
+    update_search_vectors([sender], [instance.pk])
+
+
+@receiver(post_save, sender=Image)
+def update_thumbnails(sender, instance, **kwargs):
+
+    create_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Thumbnail)
+def delete_thumbnail_file(sender, instance, **kwargs):
+
+    # Images with the same content share their thumbnail files
+    delete_unshared_files([instance.name])
+
+
+def remember_cleared(sender, instance, action, reverse, model, **kwargs):
+
+    # Cleared from the other side, e.g. the names of a language, the post_clear signal has no set of the objects
+    if action == 'pre_clear' and reverse:
+        target = next(field.attname for field in sender._meta.concrete_fields if field.is_relation and field.related_model is model)
+        source = next(field.attname for field in sender._meta.concrete_fields if field.is_relation and field.related_model is type(instance))
+        cleared = getattr(instance, '_cleared_pks', {})
+        cleared[sender] = set(sender.objects.filter(**{source: instance.pk}).values_list(target, flat=True))
+        instance._cleared_pks = cleared
+
+
+def changed_pks(sender, instance, action, pk_set):
+    """The ids of the objects of the other side of an m2m change, including those cleared."""
+
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_pks', {}).get(sender, set())
+
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Name.languages.through)
+@receiver(m2m_changed, sender=Text.informants.through)
+def update_related_places(sender, instance, action, reverse, model, pk_set, **kwargs):
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        PlaceFacet.refresh(place_ids(instance))
+    elif pk_set := changed_pks(sender, instance, action, pk_set):
+        # Changed from the language or informant side, the set holds names or texts
+        owner = Name if sender is Name.languages.through else Text
+        PlaceFacet.refresh(set(owner.objects.filter(pk__in=pk_set).values_list(PLACE_FIELDS[owner], flat=True)))
+
+
+def invalidate_responses(sender, **kwargs):
+
+    bump_data_version_on_commit()
+
+
+def invalidate_related_responses(sender, instance, action, **kwargs):
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_data_version_on_commit()
+
+
+# Connected to the cached models only, as a listener of every model would keep Django from deleting the rows of
+# the others in bulk
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_responses, sender=model)
+    post_delete.connect(invalidate_responses, sender=model)
+
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(invalidate_related_responses, sender=field.remote_field.through)
+
+
+def log_change(sender, instance, **kwargs):
+
+    # Only post_save tells whether the object was created
+    if not ChangeLog.is_in_bulk():
+        ChangeLog.log(sender, [instance.pk], deleted='created' not in kwargs)
+
+
+def log_related_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+
+    if action not in ('post_add', 'post_remove', 'post_clear') or ChangeLog.is_in_bulk():
+        return
+
+    # Changed from the other side, e.g. the languages of names from a language, the set holds the changed objects
+    if not reverse:
+        ChangeLog.log(type(instance), [instance.pk])
+    elif pk_set := changed_pks(sender, instance, action, pk_set):
+        ChangeLog.log(model, pk_set)
+
+
+# The changes listed by the change feed, see changes.py
+for model in ChangeLog.MODELS:
+    post_save.connect(log_change, sender=model)
+    post_delete.connect(log_change, sender=model)
+
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(remember_cleared, sender=field.remote_field.through)
+        m2m_changed.connect(log_related_change, sender=field.remote_field.through)
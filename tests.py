@@ -1,3 +1,1313 @@
-from django.test import TestCase
+import io
+import gzip
+import os
+import json
+import math
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import GEOSGeometry, LineString, Point, Polygon
+from django.contrib.postgres.search import SearchQuery
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from unittest import mock, skipIf
+from . import cache, changes, export, geojson, ingest, load, models, profiling, search, thumbnails, tiles
+from . import geometry as geometry_module
+from .models import *
+from .benchmarks import advanced_search
+from .benchmarks.seed import seed
 
-# Create your tests here.
+
+class AdminChangelistQueriesTest(TestCase):
+    """The admin changelists run the same number of queries whatever the number of rows."""
+
+    models = (PlaceOfInterest, Image, Text, Language, Author, Informant, Period, PlaceType, Document, Transcription)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.rows = 0
+
+    def create_rows(self, count):
+
+        for i in range(self.rows, self.rows + count):
+            language = Language.objects.create(name=f"Language {i}", abbreviation=f"l{i}")
+            informant = Informant.objects.create(custom_id=f"Informant {i}")
+            period = Period.objects.create(text=f"Period {i}")
+            place_type = PlaceType.objects.create(text=f"Type {i}")
+            author = Author.objects.create(name=f"Author {i}")
+
+            place = PlaceOfInterest.objects.create(type=place_type, geometry=Point(30.06, -1.94))
+            for text in (f"Place {i}", f"Ahantu {i}"):
+                name = Name.objects.create(text=text, period=period, referent=place)
+                name.languages.add(language)
+                name.informants.add(informant)
+
+            # Bulk created to skip the conversion of the image file on save
+            Image.objects.bulk_create([Image(title=f"Image {i}", place_of_interest=place)])
+            Text.objects.create(title=f"Text {i}", place_of_interest=place).authors.add(author)
+            Document.objects.create(title=f"Document {i}", place_of_interest=place).authors.add(author)
+            Transcription.objects.create(title=f"Transcription {i}", place_of_interest=place).authors.add(author)
+
+        self.rows += count
+
+    def count_queries(self, model):
+
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(context.captured_queries)
+
+    def test_changelist_queries_are_constant(self):
+
+        self.create_rows(2)
+        few = {model: self.count_queries(model) for model in self.models}
+
+        self.create_rows(20)
+        for model in self.models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.count_queries(model), few[model])
+
+    def test_display_name_follows_names(self):
+
+        place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"))
+        self.assertEqual(str(place), f"{place.id}")
+
+        name = Name.objects.create(text="KN 5 Rd", referent=place)
+        Name.objects.create(text="Rue KN 5", referent=place)
+        place.refresh_from_db()
+        self.assertEqual(str(place), "KN 5 Rd, Rue KN 5")
+
+        name.delete()
+        place.refresh_from_db()
+        self.assertEqual(str(place), "Rue KN 5")
+
+    def test_saving_a_stale_place_keeps_its_display_name(self):
+
+        place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"))
+        stale = PlaceOfInterest.objects.get(pk=place.pk)
+        Name.objects.create(text="KN 5 Rd", referent=place)
+
+        # As the admin does, with every field of the instance loaded before the name was added
+        stale.description = "A street"
+        stale.save()
+
+        place.refresh_from_db()
+        self.assertEqual(place.display_name, "KN 5 Rd")
+        self.assertEqual(place.description, "A street")
+
+
+class PlaceDossierQueriesTest(TestCase):
+    """The dossier of a place runs the same number of queries whatever the number of its related objects."""
+
+    def create_place(self, count):
+
+        parent = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="district"), corrected=True)
+        place = PlaceOfInterest.objects.create(type=parent.type, parent_place=parent, geometry=Point(30.06, -1.94), corrected=True)
+
+        for i in range(count):
+            language = Language.objects.create(name=f"Language {i}", abbreviation=f"l{i}")
+            informant = Informant.objects.create(custom_id=f"Informant {place.pk}-{i}")
+            author = Author.objects.create(name=f"Author {i}")
+
+            name = Name.objects.create(text=f"Place {i}", period=Period.objects.create(text=f"Period {i}"), referent=place)
+            name.languages.add(language)
+            name.informants.add(informant)
+
+            # Bulk created to skip the conversion of the image file on save
+            image, = Image.objects.bulk_create([Image(title=f"Image {i}", place_of_interest=place)])
+            image.authors.add(author)
+            Text.objects.create(title=f"Text {i}", place_of_interest=place).informants.add(informant)
+            Document.objects.create(title=f"Document {i}", place_of_interest=place).authors.add(author)
+            Transcription.objects.create(title=f"Transcription {i}", place_of_interest=place).authors.add(author)
+            PlaceOfInterest.objects.create(type=parent.type, parent_place=place)
+
+        return place
+
+    def get_dossier(self, place, **params):
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('place dossier', kwargs={'pk': place.pk}), params, HTTP_CACHE_CONTROL='no-cache')
+
+        self.assertEqual(response.status_code, 200)
+
+        return response.json(), len(context.captured_queries)
+
+    def test_dossier_queries_are_constant(self):
+
+        dossier, few = self.get_dossier(self.create_place(1))
+        self.assertEqual(len(dossier['properties']['images']), 1)
+
+        dossier, many = self.get_dossier(self.create_place(10))
+        self.assertEqual(len(dossier['properties']['names']), 10)
+        self.assertEqual(len(dossier['properties']['children']), 10)
+        self.assertEqual(many, few)
+
+    def test_dossier_fields(self):
+
+        place = self.create_place(3)
+        everything, all_queries = self.get_dossier(place)
+        dossier, queries = self.get_dossier(place, fields='names')
+
+        self.assertEqual(set(dossier['properties']), {'names'})
+        self.assertEqual(dossier['properties']['names'], everything['properties']['names'])
+        self.assertLess(queries, all_queries)
+
+        response = self.client.get(reverse('place dossier', kwargs={'pk': place.pk}), {'fields': 'names,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PlaceHierarchyTest(TestCase):
+    """The ancestors and descendants of a place are found by recursive queries, no deeper than the depth cap."""
+
+    @classmethod
+    def setUpTestData(cls):
+        place_type = PlaceType.objects.create(text="area")
+        cls.province = PlaceOfInterest.objects.create(type=place_type, corrected=True)
+        cls.district = PlaceOfInterest.objects.create(type=place_type, parent_place=cls.province, corrected=True)
+        cls.sector = PlaceOfInterest.objects.create(type=place_type, parent_place=cls.district, corrected=True)
+        cls.other = PlaceOfInterest.objects.create(type=place_type, corrected=True)
+
+        for place in (cls.province, cls.district, cls.sector, cls.other):
+            Name.objects.create(text=f"Place {place.pk}", referent=place)
+
+    def ids(self, queryset):
+
+        return set(queryset.values_list('pk', flat=True))
+
+    def test_descendants(self):
+
+        self.assertEqual(self.ids(PlaceOfInterest.objects.descendants_of(self.province.pk)), {self.district.pk, self.sector.pk})
+        self.assertEqual(self.ids(PlaceOfInterest.objects.descendants_of(self.district.pk)), {self.sector.pk})
+        self.assertEqual(self.ids(PlaceOfInterest.objects.descendants_of(self.sector.pk)), set())
+
+    def test_ancestors(self):
+
+        self.assertEqual(self.ids(PlaceOfInterest.objects.ancestors_of(self.sector.pk)), {self.province.pk, self.district.pk})
+        self.assertEqual(self.ids(PlaceOfInterest.objects.ancestors_of(self.district.pk)), {self.province.pk})
+        self.assertEqual(self.ids(PlaceOfInterest.objects.ancestors_of(self.province.pk)), set())
+
+    def test_depth_cap(self):
+
+        with mock.patch.object(models, 'MAX_HIERARCHY_DEPTH', 1):
+            self.assertEqual(self.ids(PlaceOfInterest.objects.descendants_of(self.province.pk)), {self.district.pk})
+            self.assertEqual(self.ids(PlaceOfInterest.objects.ancestors_of(self.sector.pk)), {self.district.pk})
+
+    def test_cycle_stops_at_depth_cap(self):
+
+        PlaceOfInterest.objects.filter(pk=self.province.pk).update(parent_place=self.sector)
+
+        self.assertEqual(self.ids(PlaceOfInterest.objects.descendants_of(self.province.pk)), {self.province.pk, self.district.pk, self.sector.pk})
+
+    def test_filters_and_subtree(self):
+
+        url = reverse('places as geojson-list')
+        response = self.client.get(url, {'descendants_of': self.province.pk}, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({feature['id'] for feature in response.json()['features']}, {self.district.pk, self.sector.pk})
+
+        response = self.client.get(url, {'ancestors_of': self.sector.pk}, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({feature['id'] for feature in response.json()['features']}, {self.province.pk, self.district.pk})
+
+        response = self.client.get(reverse('places as geojson-subtree', kwargs={'pk': self.district.pk}), HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({feature['id'] for feature in response.json()['features']}, {self.district.pk, self.sector.pk})
+
+
+class LoadFeaturesTest(TestCase):
+    """The bulk loader writes the same places and names as the loader saving them one by one did."""
+
+    buildings = [
+        {'type': 'Feature', 'id': 'way/1', 'geometry': {'type': 'Polygon', 'coordinates': [[[30.06, -1.94], [30.07, -1.94], [30.07, -1.95], [30.06, -1.94]]]}, 'properties': {'name': "Market", 'name:fr': "Marché", 'amenity': 'marketplace'}},
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [30.1, -1.9]}, 'properties': {'name': "Kiosk", 'shop': 'kiosk'}},
+        # The same place as the previous feature, in the next batch
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [30.1, -1.9]}, 'properties': {'name': "Kiosk B", 'shop': 'kiosk'}},
+        {'type': 'Feature', 'id': 'way/2', 'geometry': {'type': 'Point', 'coordinates': [30.2, -1.8]}, 'properties': {'amenity': 'bench'}},
+    ]
+    streets = [
+        {'type': 'Feature', 'id': 'way/3', 'geometry': {'type': 'LineString', 'coordinates': [[30.0, -1.9], [30.01, -1.91]]}, 'properties': {'name:fr': "Rue KN 5", 'highway': 'residential'}},
+        {'type': 'Feature', 'id': 'relation/4', 'geometry': {'type': 'LineString', 'coordinates': [[30.0, -1.9], [30.02, -1.92]]}, 'properties': {'name': "Route 1", 'type': 'route'}},
+    ]
+
+    def setUp(self):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.paths = []
+        for filename, features in (('buildings.geojson', self.buildings), ('streets.geojson', self.streets)):
+            path = os.path.join(directory.name, filename)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': features}, f)
+            self.paths.append(path)
+
+    def load_one_by_one(self):
+        """The loader before the bulk one, with a get_or_create per place and a create per name."""
+
+        informant, _ = Informant.objects.get_or_create(custom_id="OSM", note="The OSM informant representents the crowd of informants contributing to the Open Street Map.")
+        for name, abbreviation in (('English', 'en'), ('French', 'fr'), ('Kinyarwanda', 'rw'), ('Kiswahili', 'sw')):
+            Language.objects.get_or_create(name=name, abbreviation=abbreviation)
+
+        for features, place_type_str in ((self.buildings, "building"), (self.streets, "street")):
+            place_type, _ = PlaceType.objects.get_or_create(text=place_type_str)
+
+            for feature in features:
+                props = {k: v for k, v in feature['properties'].items() if k in load.PROPS_TO_KEEP}
+                if props.get('type') == 'route':
+                    continue
+
+                place, _ = PlaceOfInterest.objects.get_or_create(
+                    geometry=GEOSGeometry(json.dumps(feature['geometry'])),
+                    comment=load.OSM_COMMENT,
+                    description="\n".join([prop for key, prop in props.items() if (prop and key not in ('name', 'name:fr'))]),
+                    type=place_type,
+                    )
+
+                for key, language in load.OSM_NAME_LANGUAGES:
+                    if props.get(key):
+                        name = Name.objects.create(text=props[key], note=load.OSM_NAME_NOTE, referent=place)
+                        name.informants.add(informant)
+                        name.languages.add(Language.objects.get(name=language))
+
+    def rows(self):
+
+        return sorted(
+            (place.geometry.ewkt, place.description, place.comment, place.type.text, sorted(
+                (name.text, name.note, sorted(language.name for language in name.languages.all()), sorted((informant.custom_id, informant.note) for informant in name.informants.all()))
+                for name in place.names.all()
+            ))
+            for place in PlaceOfInterest.objects.select_related('type').prefetch_related('names__languages', 'names__informants')
+        )
+
+    def test_same_rows_as_one_by_one(self):
+
+        self.load_one_by_one()
+        expected = self.rows()
+        self.assertEqual(len(expected), 4)
+
+        # Two features per batch, so that the merged features are in different batches
+        load.features(*self.paths, batch_size=2, processes=1)
+
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual(Language.objects.count(), 4)
+        self.assertEqual(Informant.objects.count(), 1)
+
+    def test_streamed_as_loaded(self):
+
+        features = [*self.buildings, *self.streets, {'type': 'Feature', 'geometry': None, 'properties': {'name': "Ikawa \u2615 \"Kigali\"", 'ele': 1567.25e0}}]
+        collection = {'type': 'FeatureCollection', 'name': "places", 'features': features, 'crs': {'type': 'name', 'properties': {'name': 'EPSG:4326'}}}
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        def write(filename, text, compress=False):
+            path = os.path.join(directory.name, filename)
+            with (gzip.open(path, 'wt', encoding='utf-8') if compress else open(path, 'w', encoding='utf-8')) as f:
+                f.write(text)
+            return path
+
+        lines = [json.dumps(feature, ensure_ascii=False) for feature in features]
+        paths = [
+            write('compact.geojson', json.dumps(collection, separators=(',', ':'))),
+            write('indented.geojson', json.dumps(collection, indent=4, ensure_ascii=False)),
+            write('compressed.geojson.gz', json.dumps(collection), compress=True),
+            write('empty.geojson', json.dumps({'type': 'FeatureCollection', 'features': []})),
+            write('lines.ndjson', "\n".join(lines) + "\n"),
+            write('sequence.geojsons', "".join(f"\x1e{line}\n" for line in lines)),
+            write('lines.json', "\n".join(lines)),
+        ]
+
+        # Small reads, so that the values and the lines are split across chunks
+        for read_size in (7, 64, load.READ_SIZE):
+            for path in paths:
+                with self.subTest(path=os.path.basename(path), read_size=read_size), mock.patch.object(load, 'READ_SIZE', read_size):
+                    expected = [] if 'empty' in path else features
+                    self.assertEqual(list(load.iter_features(path)), expected)
+
+    def test_pooled_parsing(self):
+
+        features = [*self.buildings, *self.streets] * 3
+        rows = lambda parsed: [(feature['osm_id'], feature['geometry'].ewkt, feature['description'], feature['names']) for feature in parsed]
+        serial = rows(load.parse_features(features, processes=1, chunk_size=2))
+        self.assertEqual(len(serial), 15)
+
+        self.assertEqual(rows(load.parse_features(features, processes=3, chunk_size=2)), serial)
+
+        # A single chunk is not worth a pool
+        with mock.patch.object(load.multiprocessing, 'get_context') as get_context:
+            self.assertEqual(rows(load.parse_features(features, chunk_size=len(features))), serial)
+        get_context.assert_not_called()
+
+
+class FastGeoJSONTest(TestCase):
+    """The fast GeoJSON of the place endpoints is byte for byte the response of their serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        language = Language.objects.create(name="English", abbreviation="en")
+        informant = Informant.objects.create(custom_id="Informant")
+        period = Period.objects.create(text="Colonial")
+        district = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="district"), geometry=Polygon(((30.0, -2.0), (30.1, -2.0), (30.1, -1.9), (30.0, -2.0))), corrected=True)
+        street = PlaceType.objects.create(text="street")
+
+        for i, geometry in enumerate((Point(30.06, -1.94), Point(30, -2), LineString((30.01, -1.91), (30.0123456789, -1.9)), None)):
+            place = PlaceOfInterest.objects.create(type=street, parent_place=district, geometry=geometry, description=f"Place «{i}»", corrected=True)
+            for text in (f"KN {i} Rd", f"Rue KN {i}"):
+                name = Name.objects.create(text=text, period=period, referent=place)
+                name.languages.add(language)
+                name.informants.add(informant)
+
+            Text.objects.create(title=f"Text {i}", place_of_interest=place)
+            # Bulk created to skip the conversion of the image file on save
+            Image.objects.bulk_create([Image(title=f"Image {i}", place_of_interest=place)])
+
+    def test_same_bytes(self):
+
+        endpoints = (
+            ('places as geojson-list', {}),
+            ('places as geojson-list', {'name': "KN 1"}),
+            ('Featch based on period time-list', {'period_name': "colonial"}),
+            ('Featch based on type-list', {'text': "street"}),
+            ('Featch based on text-list', {}),
+            ('Featch based on images-list', {}),
+            ('Featch if there is image or text for this place-list', {}),
+        )
+
+        for url_name, params in endpoints:
+            with self.subTest(url_name=url_name, params=params):
+                slow = self.client.get(reverse(url_name), {**params, 'fast': 'false'}, HTTP_CACHE_CONTROL='no-cache')
+                fast = self.client.get(reverse(url_name), {**params, 'fast': 'true'}, HTTP_CACHE_CONTROL='no-cache')
+
+                self.assertEqual(slow.status_code, 200)
+                self.assertTrue(slow.json()['features'])
+                self.assertEqual(fast.content, slow.content)
+
+    def test_streams(self):
+
+        def parse(content, stream_format):
+            text = content.decode('utf-8')
+            if stream_format == 'geojson':
+                return json.loads(text)['features']
+            if stream_format == 'geojsonseq':
+                self.assertTrue(all(record.endswith('\n') for record in text.split('\x1e')[1:]))
+                return [json.loads(record) for record in text.split('\x1e')[1:]]
+            return [json.loads(line) for line in text.splitlines()]
+
+        for url_name, params in (('places as geojson-list', {}), ('Featch based on type-list', {'text': "street"})):
+            expected = self.client.get(reverse(url_name), {**params, 'fast': 'false'}, HTTP_CACHE_CONTROL='no-cache').json()['features']
+            self.assertTrue(expected)
+
+            # Chunks smaller than the places
+            for stream_format, chunk_size in ((stream_format, chunk_size) for stream_format in geojson.STREAM_FORMATS for chunk_size in (2, 500)):
+                with self.subTest(url_name=url_name, stream=stream_format, chunk_size=chunk_size), mock.patch.object(geojson, 'STREAM_CHUNK_SIZE', chunk_size):
+                    response = self.client.get(reverse(url_name), {**params, 'stream': stream_format}, HTTP_CACHE_CONTROL='no-cache')
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response['Content-Type'], geojson.STREAM_FORMATS[stream_format][-1])
+                    self.assertEqual(parse(b''.join(response.streaming_content), stream_format), expected)
+
+        response = self.client.get(reverse('places as geojson-list'), {'stream': 'csv'}, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 400)
+
+    def test_internal_fields_are_not_served(self):
+
+        internal = {'search_text', 'search_vector', 'osm_id', 'display_name', 'geometry_type', 'point'}
+
+        for fast in ('false', 'true'):
+            with self.subTest(fast=fast):
+                response = self.client.get(reverse('places as geojson-list'), {'fast': fast, 'name': "KN 1"}, HTTP_CACHE_CONTROL='no-cache')
+                feature, = response.json()['features']
+                properties = feature['properties']
+                name = properties['names'][0]
+
+                self.assertEqual(set(feature), {'id', 'type', 'geometry', 'properties'})
+                self.assertTrue({'names', 'description', 'comment', 'corrected', 'is_iconic', 'type', 'parent_place'} <= set(properties))
+                self.assertTrue({'id', 'text', 'note', 'referent', 'languages', 'informants', 'period'} <= set(name))
+                self.assertTrue({'id', 'geometry', 'description', 'type'} <= set(properties['parent_place']))
+                self.assertEqual(properties['type']['text'], "street")
+                self.assertEqual(name['period']['text'], "Colonial")
+                self.assertEqual(name['languages'][0]['abbreviation'], "en")
+                self.assertEqual(name['informants'][0]['custom_id'], "Informant")
+
+                for keys in (properties, name, name['period'], name['informants'][0], properties['type'], properties['parent_place'], properties['parent_place']['type']):
+                    self.assertFalse(internal & set(keys), keys)
+
+
+class SimplifiedGeometryTest(TestCase):
+    """The geometries served for a zoom level or a tolerance are the full geometries simplified and rounded."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # A street zigzagging by about 10 metres
+        cls.geometry = LineString([(30.0 + 0.0005 * i, -1.94 + 0.0001 * (i % 2)) for i in range(200)], srid=4326)
+        cls.place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"), geometry=cls.geometry, corrected=True)
+        Name.objects.create(text="KN 5 Rd", referent=cls.place)
+
+    def geometry_of(self, **params):
+
+        responses = [
+            self.client.get(reverse('places as geojson-list'), {**params, 'name': "KN 5", 'fast': fast}, HTTP_CACHE_CONTROL='no-cache')
+            for fast in ('false', 'true')
+        ]
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(responses[1].content, responses[0].content)
+
+        feature, = responses[0].json()['features']
+        return feature['geometry']
+
+    def expected(self, tolerance, precision):
+
+        geometry = self.geometry.simplify(tolerance, preserve_topology=True) if tolerance else self.geometry
+        return {'type': 'LineString', 'coordinates': geometry_module.round_coordinates(geometry.coords, precision)}
+
+    def test_full_geometry(self):
+
+        self.assertEqual(self.geometry_of(), json.loads(self.geometry.json))
+
+    def test_zoom_levels(self):
+
+        # Kept for the bands the zigzag is simplified away in only
+        self.assertEqual(set(SimplifiedGeometry.objects.filter(place=self.place).values_list('band', flat=True)), {8, 11})
+
+        for zoom in (0, 8, 9, 11, 12, 14, 15, 22):
+            with self.subTest(zoom=zoom):
+                band, precision = SimplifiedGeometry.band_for(zoom)
+                tolerance = {band: tolerance for band, tolerance, _precision in SimplifiedGeometry.BANDS}.get(band)
+                self.assertEqual(self.geometry_of(zoom=zoom), self.expected(tolerance, precision))
+
+        self.assertEqual(len(self.geometry_of(zoom=8)['coordinates']), 2)
+        self.assertEqual(len(self.geometry_of(zoom=14)['coordinates']), 200)
+
+    def test_tolerance(self):
+
+        self.assertEqual(self.geometry_of(tolerance=0.001), self.expected(0.001, 3))
+        self.assertEqual(self.geometry_of(tolerance=0.001, precision=5), self.expected(0.001, 5))
+
+
+class ProfilingTest(TestCase):
+    """The profiled responses are the same, with the time spent in SQL, the view and rendering in a Server-Timing header."""
+
+    @classmethod
+    def setUpTestData(cls):
+        place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"), geometry=Point(30.06, -1.94), corrected=True)
+        Name.objects.create(text="KN 5 Rd", referent=place)
+
+    def get(self):
+
+        return self.client.get(reverse('places as geojson-list'), HTTP_CACHE_CONTROL='no-cache')
+
+    def test_off(self):
+
+        self.assertNotIn('Server-Timing', self.get())
+
+    def test_same_response(self):
+
+        expected = self.get()
+
+        # No query is slow enough to be explained, so all the queries are those of the request
+        with override_settings(RWANDA_PROFILING=True, RWANDA_PROFILING_SLOW_QUERY_MS=10 ** 6), self.assertLogs(profiling.logger, 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+
+        timings = {timing.split(';')[0]: timing for timing in response['Server-Timing'].split(', ')}
+        self.assertEqual(list(timings), ['sql', 'view', 'render', 'total'])
+        self.assertIn(f'desc="{len(queries)} queries"', timings['sql'])
+
+        log = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((log['status'], log['queries'], log['slow_queries']), (200, len(queries), []))
+
+    def test_slow_queries_explained(self):
+
+        with override_settings(RWANDA_PROFILING=True, RWANDA_PROFILING_SLOW_QUERY_MS=0), self.assertLogs(profiling.logger, 'INFO') as logs:
+            self.assertEqual(self.get().status_code, 200)
+
+        log = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(len(log['slow_queries']), min(profiling.MAX_EXPLAINED_QUERIES, log['queries']))
+        for query in log['slow_queries']:
+            self.assertIn('Plan', query['plan'][0])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rwanda-tests'}}, RWANDA_CACHE_ALIAS='default')
+class CachedResponseTest(TestCase):
+    """The responses are cached for anonymous users until a change of the data they are made of."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"), geometry=Point(30.06, -1.94), corrected=True)
+        cls.user = get_user_model().objects.create_user('cartographer', 'cartographer@example.com', 'password')
+
+    def setUp(self):
+
+        cache.get_cache().clear()
+        self.url = reverse('place dossier', kwargs={'pk': self.place.pk})
+
+    def get(self, **headers):
+
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+
+        return response
+
+    def test_changes_invalidate(self):
+
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            name = Name.objects.create(text="KN 5 Rd", referent=self.place)
+
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn("KN 5 Rd", response.content.decode())
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            name.delete()
+
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotIn("KN 5 Rd", response.content.decode())
+
+    def test_uncommitted_changes_keep_the_cache(self):
+
+        self.get()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Name.objects.create(text="KN 5 Rd", referent=self.place)
+            Name.objects.create(text="Rue KN 5", referent=self.place)
+
+        self.assertEqual(callbacks, [cache.bump_data_version])
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+
+    def test_logged_in_responses_are_not_shared(self):
+
+        self.client.force_login(self.user)
+        html = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertEqual(html.status_code, 200)
+        self.assertNotIn('X-Cache', html)
+        self.assertNotIn('X-Cache', self.get())
+        self.client.logout()
+
+        response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+        self.assertNotIn('cartographer', response.content.decode())
+
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+
+class ChangeFeedTest(TestCase):
+    """
+    The change feed pages through the changes in the order their transactions committed. The changes of the test,
+    all written by its one transaction, are given the ids of the transactions they stand for.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.place_type = PlaceType.objects.create(text="street")
+
+    def setUp(self):
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+            self.transaction_id = cursor.fetchone()[0]
+
+        # Every transaction is over but the ones told otherwise
+        self.settled = self.transaction_id + 1
+        patcher = mock.patch.object(changes, 'settled_transaction_id', lambda: self.settled)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @contextmanager
+    def in_transaction(self, transaction_id):
+
+        yield
+        ChangeLog.objects.filter(transaction_id=self.transaction_id).update(transaction_id=transaction_id)
+
+    def create_place(self):
+
+        return PlaceOfInterest.objects.create(type=self.place_type, geometry=Point(30.06, -1.94), corrected=True)
+
+    def read_feed(self, cursor=None, limit=100):
+        """The objects upserted and deleted since a cursor, page by page, and the cursor after the last page."""
+
+        upserted, deleted = {}, set()
+        while True:
+            page = changes.changes_since(cursor, limit=limit)
+            self.assertLessEqual(sum(map(len, page['changes'].values())) + len(page['deleted']), limit)
+
+            for name, objects in page['changes'].items():
+                for data in objects:
+                    upserted[name, data['id']] = data
+                    deleted.discard((name, data['id']))
+            for tombstone in page['deleted']:
+                upserted.pop((tombstone['model'], tombstone['id']), None)
+                deleted.add((tombstone['model'], tombstone['id']))
+
+            cursor = page['cursor']
+            if not page['more']:
+                return upserted, deleted, cursor
+
+    def test_pages(self):
+
+        with self.in_transaction(1):
+            kept, removed = self.create_place(), self.create_place()
+            name = Name.objects.create(text="KN 5 Rd", referent=kept)
+
+        with self.in_transaction(2):
+            kept.description = "Market"
+            kept.save()
+            removed_pk = removed.pk
+            removed.delete()
+            Name.objects.create(text="Rue KN 5", referent=kept).delete()
+
+        self.settled = 3
+        everything = self.read_feed()
+
+        for limit in (1, 2, 3):
+            with self.subTest(limit=limit):
+                upserted, deleted, cursor = self.read_feed(limit=limit)
+
+                self.assertEqual(set(upserted), {('placeofinterest', kept.pk), ('name', name.pk)})
+                self.assertEqual(upserted['placeofinterest', kept.pk]['description'], "Market")
+                self.assertNotIn('search_text', upserted['name', name.pk])
+                self.assertIn(('placeofinterest', removed_pk), deleted)
+                self.assertEqual((upserted, deleted), everything[:2])
+                self.assertEqual(cursor, everything[2])
+
+        # Nothing since the last cursor, which is given back
+        self.assertEqual(self.read_feed(cursor), ({}, set(), cursor))
+
+        with self.in_transaction(3):
+            name.delete()
+
+        self.settled = 4
+        self.assertEqual(self.read_feed(cursor), ({}, {('name', name.pk)}, self.read_feed()[2]))
+
+    def test_cursor_taken_while_a_transaction_runs(self):
+
+        with self.in_transaction(1):
+            first = self.create_place()
+        with self.in_transaction(2):
+            running = self.create_place()
+        with self.in_transaction(3):
+            later = self.create_place()
+
+        # Transaction 2 is still running, so the changes of transaction 3, committed, are held back with its own
+        self.settled = 2
+        upserted, deleted, cursor = self.read_feed()
+        self.assertEqual(set(upserted), {('placeofinterest', first.pk)})
+
+        self.settled = 4
+        upserted, deleted, cursor = self.read_feed(cursor)
+        self.assertEqual(set(upserted), {('placeofinterest', running.pk), ('placeofinterest', later.pk)})
+
+        self.assertEqual(self.read_feed(cursor)[:2], ({}, set()))
+
+    def test_invalid_cursor(self):
+
+        response = self.client.get(reverse('changes'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cleared_from_the_other_side(self):
+
+        place = self.create_place()
+        language = Language.objects.create(name="Kinyarwanda", abbreviation="rw")
+        with self.in_transaction(1):
+            names = [Name.objects.create(text=text, referent=place) for text in ("Umuhanda", "Isoko")]
+            language.name_names.add(*names)
+
+        self.settled = 2
+        cursor = self.read_feed()[2]
+
+        with self.in_transaction(2):
+            language.name_names.clear()
+
+        self.settled = 3
+        upserted, deleted, cursor = self.read_feed(cursor)
+        self.assertEqual(set(upserted), {('name', name.pk) for name in names})
+        self.assertEqual(upserted['name', names[0].pk]['languages'], [])
+        self.assertFalse(PlaceFacet.objects.get(place=place).language_ids)
+
+    def test_pruned(self):
+
+        with self.in_transaction(1):
+            self.create_place()
+        with self.in_transaction(2):
+            self.create_place()
+        with self.in_transaction(3):
+            self.create_place()
+
+        self.settled = 4
+        cursor = changes.changes_since(limit=1)['cursor']
+        last = self.read_feed()[2]
+
+        expired = timezone.now() - ChangeLog.retention() - timedelta(days=1)
+        ChangeLog.objects.filter(transaction_id__in=[1, 2]).update(changed_at=expired)
+        self.assertEqual(ChangeLog.prune(), 2)
+
+        # The change of transaction 2 was pruned after the cursor
+        with self.assertRaises(ValidationError):
+            changes.changes_since(cursor)
+        self.assertEqual(self.read_feed(last)[:2], ({}, set()))
+
+        # The last change is kept however old, and the pruned cursors are still refused
+        ChangeLog.objects.update(changed_at=expired)
+        self.assertEqual(ChangeLog.prune(), 0)
+        with self.assertRaises(ValidationError):
+            changes.changes_since(cursor)
+
+
+class IngestMediaTest(TestCase):
+    """The ingest reads manifests, skips the files already ingested and resumes after an interrupted batch."""
+
+    def setUp(self):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.addCleanup(self.delete_stored_files)
+
+    def delete_stored_files(self):
+
+        for instance in (*Transcription.objects.all(), *Document.objects.all()):
+            ingest.delete_stored_files(instance)
+
+    def write(self, filename, content):
+
+        path = os.path.join(self.directory, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        return path
+
+    def test_manifests(self):
+
+        place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"))
+        self.write('files/a.txt', "Umudugudu")
+        self.write('files/b.pdf', "")
+
+        csv_path = self.write('manifest.csv', f"path,kind,place,title,authors\nfiles/a.txt,,{place.pk},Interview,Author A; Author B\nfiles/b.pdf,document,,,\n")
+        json_path = self.write('manifest.json', json.dumps([{'path': 'files/a.txt', 'authors': ["Author A", "Author B"]}]))
+
+        rows = list(ingest.read_manifest(csv_path))
+        self.assertEqual([row['path'] for row in rows], [os.path.join(self.directory, 'files', 'a.txt'), os.path.join(self.directory, 'files', 'b.pdf')])
+        self.assertEqual(rows[0]['place'], str(place.pk))
+        self.assertEqual(ingest.split_list(rows[0]['authors']), ["Author A", "Author B"])
+        self.assertEqual(ingest.split_list(rows[1]['authors']), [])
+
+        rows = list(ingest.read_manifest(json_path))
+        self.assertEqual(rows[0]['path'], os.path.join(self.directory, 'files', 'a.txt'))
+        self.assertEqual(ingest.split_list(rows[0]['authors']), ["Author A", "Author B"])
+
+        self.assertEqual(sorted(row['path'] for row in ingest.read_manifest(os.path.join(self.directory, 'files'))), [rows[0]['path'], os.path.join(self.directory, 'files', 'b.pdf')])
+
+        stats = ingest.ingest_media(csv_path, processes=1)
+        self.assertEqual(+Counter(stats), {'transcription': 1, 'document': 1})
+
+        transcription = Transcription.objects.get()
+        self.assertEqual((transcription.title, transcription.text, transcription.place_of_interest), ("Interview", "Umudugudu", place))
+        self.assertEqual(sorted(transcription.authors.values_list('name', flat=True)), ["Author A", "Author B"])
+
+    def test_duplicates_and_resume(self):
+
+        for filename, content in (('a.txt', "Kigali"), ('b.txt', "Kigali"), ('c.txt', "Huye"), ('d.txt', "Musanze")):
+            self.write(filename, content)
+
+        def fail_on_huye(models, pks):
+            if models == [Transcription] and Transcription.objects.filter(pk__in=pks, text="Huye").exists():
+                raise RuntimeError
+
+        def delete_stored_files(instance):
+            stored.append(instance.document.name)
+            delete(instance)
+
+        # The batch of c.txt fails and is rolled back, with the file it stored
+        stored = []
+        delete = ingest.delete_stored_files
+        with mock.patch.object(ingest, 'update_search_vectors', fail_on_huye), mock.patch.object(ingest, 'delete_stored_files', delete_stored_files):
+            with self.assertRaises(RuntimeError):
+                ingest.ingest_media(self.directory, batch_size=1, processes=1)
+
+        self.assertEqual(Transcription.objects.count(), 1)
+        self.assertEqual(IngestedFile.objects.count(), 1)
+        self.assertEqual(len(stored), 1)
+        self.assertFalse(Transcription.document.field.storage.exists(stored[0]))
+
+        # b.txt is a copy of a.txt, which was written
+        stats = ingest.ingest_media(self.directory, batch_size=1, processes=1)
+        self.assertEqual(+Counter(stats), {'transcription': 2, 'skipped': 2})
+        self.assertEqual(sorted(Transcription.objects.values_list('text', flat=True)), ["Huye", "Kigali", "Musanze"])
+
+        stats = ingest.ingest_media(self.directory, batch_size=2, processes=1)
+        self.assertEqual(+Counter(stats), {'skipped': 4})
+        self.assertEqual(IngestedFile.objects.count(), 3)
+
+
+class KeysetPaginationTest(TestCase):
+    """Keyset pages on (updated_at, id) skip and repeat no row, however many rows were updated at the same time."""
+
+    def setUp(self):
+
+        self.place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="street"))
+        Name.objects.bulk_create([Name(text=f"Name {i}", referent=self.place) for i in range(25)])
+
+        # Updated at once, as by a bulk update
+        Name.objects.update(updated_at=timezone.now())
+        self.ids = list(Name.objects.order_by('id').values_list('id', flat=True))
+
+    def get(self, url, params=None):
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def first_page(self):
+
+        return self.get(reverse('name-list'), {'pagination': 'cursor', 'keyset': 'updated', 'page_size': 4})
+
+    def test_ties(self):
+
+        pages = [self.first_page()]
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+
+        self.assertEqual([name['id'] for page in pages for name in page['results']], self.ids)
+        self.assertEqual(len(pages), 7)
+        self.assertIsNone(pages[0]['previous'])
+
+        # And back from the last page
+        backwards = [pages[-1]]
+        while backwards[-1]['previous']:
+            backwards.append(self.get(backwards[-1]['previous']))
+
+        self.assertEqual([name['id'] for page in reversed(backwards) for name in page['results']], self.ids)
+
+    def test_edits_between_pages(self):
+
+        page = self.first_page()
+        seen = [name['id'] for name in page['results']]
+
+        deleted = Name.objects.get(pk=seen[0])
+        deleted.delete()
+        edited = Name.objects.get(pk=self.ids[10])
+        edited.note = "Edited"
+        edited.save()
+        added = Name.objects.create(text="New name", referent=self.place)
+
+        while page['next']:
+            page = self.get(page['next'])
+            seen += [name['id'] for name in page['results']]
+
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), set(self.ids) | {added.pk})
+        # Moved to the end by its update, after the rows updated before it
+        self.assertEqual(seen[-2:], [edited.pk, added.pk])
+
+    def test_invalid_cursor(self):
+
+        response = self.client.get(reverse('name-list'), {'cursor': 'garbage', 'keyset': 'updated'})
+        self.assertEqual(response.status_code, 404)
+
+
+@skipIf(thumbnails.PILImage is None, "Pillow is not installed")
+class ThumbnailTest(TestCase):
+    """The thumbnails pruned are made again in the background when asked for, and unreadable images make none."""
+
+    def setUp(self):
+
+        output = io.BytesIO()
+        thumbnails.PILImage.new('RGB', (800, 600), (200, 120, 40)).save(output, 'PNG')
+
+        # Bulk created to skip the conversion of the image file on save
+        self.image, = Image.objects.bulk_create([Image(title="Photo")])
+        self.image.file.save('photo.png', ContentFile(output.getvalue()), save=False)
+        Image.objects.filter(pk=self.image.pk).update(file=self.image.file.name)
+
+        self.addCleanup(self.image.file.delete, save=False)
+        self.addCleanup(lambda: Thumbnail.objects.all().delete())
+
+        # Run at once rather than in the thread, which would not see the data of the test
+        patcher = mock.patch.object(thumbnails, 'run_in_background', lambda function, *args: function(*args))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pruned_thumbnails_are_made_again(self):
+
+        thumbnails.create_thumbnails(self.image)
+        self.assertEqual(Thumbnail.objects.filter(image=self.image).count(), len(thumbnails.THUMBNAIL_HEIGHTS))
+        url = thumbnails.thumbnail_url(self.image)
+        self.assertIsNotNone(url)
+
+        self.assertEqual(thumbnails.prune_thumbnails(budget=0), len(thumbnails.THUMBNAIL_HEIGHTS))
+        self.assertFalse(Thumbnail.objects.exists())
+
+        # Missing for the request finding it pruned, made for the next
+        self.assertIsNone(thumbnails.thumbnail_url(self.image))
+        self.assertEqual(thumbnails.thumbnail_url(self.image), url)
+
+        thumbnail = Thumbnail.objects.get()
+        self.assertEqual(thumbnail.height, thumbnails.THUMBNAIL_HEIGHTS['list'])
+        self.assertTrue(default_storage.exists(thumbnail.name))
+        self.assertLessEqual(thumbnails.PILImage.open(default_storage.open(thumbnail.name)).height, thumbnail.height)
+
+    def test_decompression_bomb(self):
+
+        with mock.patch.object(thumbnails.PILImage, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertIsNone(thumbnails.create_thumbnail(self.image, thumbnails.THUMBNAIL_HEIGHTS['list']))
+            self.assertIsNone(thumbnails.thumbnail_url(self.image))
+
+        self.assertFalse(Thumbnail.objects.exists())
+
+
+class SyncFeaturesTest(TestCase):
+    """The incremental import updates the places whose feature changed, by OSM ID, and leaves the corrected ones."""
+
+    def feature(self, osm_id, x, **properties):
+
+        return {'type': 'Feature', 'id': osm_id, 'geometry': {'type': 'Point', 'coordinates': [x, -1.9]}, 'properties': properties}
+
+    def load(self, buildings, incremental=True):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        paths = []
+        for filename, features in (('buildings.geojson', buildings), ('streets.geojson', [self.feature('way/10', 30.5, name="KN 5 Rd")])):
+            paths.append(os.path.join(directory.name, filename))
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+        return load.features(*paths, incremental=incremental, processes=1)
+
+    def place(self, osm_id):
+
+        return PlaceOfInterest.objects.get(osm_id=osm_id)
+
+    def names(self, osm_id):
+
+        return dict(Name.objects.filter(referent__osm_id=osm_id).values_list('text', 'id'))
+
+    def test_sync(self):
+
+        self.load([
+            self.feature('way/1', 30.1, name="Market", **{'name:fr': "Marché"}),
+            self.feature('way/2', 30.2, name="Kiosk"),
+            self.feature('way/3', 30.3, name="Bench"),
+            self.feature('way/4', 30.4, name="School"),
+        ], incremental=False)
+
+        PlaceOfInterest.objects.filter(osm_id='way/4').update(corrected=True, description="Checked on site")
+        market_names = self.names('way/1')
+        bench = self.place('way/3')
+        kiosk = self.place('way/2')
+
+        buildings = [
+            self.feature('way/1', 30.1, name="Market", **{'name:fr': "Le Marché"}),
+            self.feature('way/2', 30.25, name="Kiosk"),
+            self.feature('way/4', 30.45, name="Primary school"),
+            self.feature('way/5', 30.5, name="Clinic"),
+            self.feature(None, 30.6, name="Unknown"),
+        ]
+
+        with mock.patch.object(PlaceOfInterest, 'update_display_names', side_effect=PlaceOfInterest.update_display_names) as update_display_names:
+            stats = self.load(buildings)
+
+        self.assertEqual(stats['building'], {'inserted': 1, 'updated': 2, 'unchanged': 0, 'deleted': 1, 'corrected': 1, 'skipped': 1})
+        self.assertEqual(stats['street']['unchanged'], 1)
+
+        # Once for the places inserted and once for those updated, in each file, rather than once per name
+        self.assertEqual(update_display_names.call_count, 4)
+
+        self.assertEqual(self.names('way/1'), {"Market": market_names["Market"], "Le Marché": mock.ANY})
+        self.assertEqual(set(self.place('way/1').display_name.split(", ")), {"Market", "Le Marché"})
+        self.assertEqual(self.place('way/2').geometry.x, 30.25)
+        self.assertGreater(self.place('way/2').updated_at, kiosk.updated_at)
+
+        school = self.place('way/4')
+        self.assertEqual((school.geometry.x, school.description), (30.4, "Checked on site"))
+        self.assertEqual(list(self.names('way/4')), ["School"])
+
+        self.assertFalse(PlaceOfInterest.objects.filter(pk=bench.pk).exists())
+        self.assertTrue(ChangeLog.objects.filter(model='placeofinterest', object_id=bench.pk, deleted=True).exists())
+        self.assertEqual(list(self.names('way/5')), ["Clinic"])
+
+        # Nothing changed since, no name is written again
+        names = dict(Name.objects.values_list('id', 'text'))
+        stats = self.load(buildings)
+        self.assertEqual(stats['building'], {'inserted': 0, 'updated': 0, 'unchanged': 3, 'deleted': 0, 'corrected': 1, 'skipped': 1})
+        self.assertEqual(dict(Name.objects.values_list('id', 'text')), names)
+
+    def test_names_are_matched_on_all_their_languages(self):
+
+        self.load([self.feature('way/1', 30.1, name="Market")], incremental=False)
+
+        # An OSM name given a second language, and a copy of it without any
+        market = Name.objects.get(text="Market")
+        market.languages.add(Language.objects.get(name="French"))
+        Name.objects.create(text="Market", note=load.OSM_NAME_NOTE, referent=market.referent)
+
+        stats = self.load([self.feature('way/1', 30.1, name="Market")])
+        self.assertEqual(stats['building']['updated'], 1)
+
+        name, = Name.objects.filter(referent__osm_id='way/1')
+        self.assertEqual(list(name.languages.values_list('name', flat=True)), ["English"])
+
+        stats = self.load([self.feature('way/1', 30.1, name="Market")])
+        self.assertEqual(stats['building']['unchanged'], 1)
+        self.assertEqual(Name.objects.get(referent__osm_id='way/1').pk, name.pk)
+
+
+class FacetedSearchTest(TestCase):
+    """The advanced search on the facets finds the same places as the subqueries it replaced, facets or not."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(places=300, random_seed=1)
+
+    def assertSamePlaces(self):
+
+        found = 0
+        for query in advanced_search.QUERIES:
+            with self.subTest(query=query):
+                legacy = set(advanced_search.legacy_queryset(**query).values_list('id', flat=True))
+                found += len(legacy)
+                self.assertEqual(set(PlaceOfInterest.objects.faceted(**query).values_list('id', flat=True)), legacy)
+        self.assertTrue(found)
+
+    def test_same_places(self):
+
+        self.assertSamePlaces()
+
+    def test_places_without_facets(self):
+
+        # Inserted in bulk and never refreshed
+        PlaceFacet.objects.filter(place_id__in=PlaceOfInterest.objects.order_by('id').values('id')[:150]).delete()
+
+        self.assertSamePlaces()
+        self.assertEqual(PlaceOfInterest.objects.faceted().count(), PlaceOfInterest.objects.count())
+
+
+class ExportTest(TestCase):
+    """The export writes the public places with a manifest describing them, and is skipped while nothing changed."""
+
+    def setUp(self):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+        self.place = PlaceOfInterest.objects.create(type=PlaceType.objects.create(text="market"), corrected=True, geometry=Point(30.06, -1.94, srid=4326))
+        Name.objects.create(text="Kimironko Market", referent=self.place)
+        Image.objects.bulk_create([Image(title="Stalls", place_of_interest=self.place)])
+        # Not public
+        PlaceOfInterest.objects.create(type=self.place.type, geometry=Point(30.07, -1.95, srid=4326))
+
+    def test_manifest(self):
+
+        manifest, exported = export.export_public_dataset(self.root)
+
+        self.assertTrue(exported)
+        self.assertEqual(manifest['counts'], {'places': 1, 'names': 1, 'images': 1, 'texts': 0, 'documents': 0, 'transcriptions': 0})
+        self.assertEqual(manifest['fingerprint'], export.fingerprint())
+
+        directory = os.path.join(self.root, manifest['version'])
+        with open(os.path.join(directory, export.MANIFEST_FILE)) as f:
+            self.assertEqual(json.load(f), manifest)
+        with open(os.path.join(self.root, export.LATEST_FILE)) as f:
+            self.assertEqual(json.load(f), {'version': manifest['version'], 'files': sorted(manifest['files'])})
+
+        for filename, entry in manifest['files'].items():
+            with self.subTest(filename=filename):
+                self.assertEqual(export.file_entry(os.path.join(directory, filename)), entry)
+
+        with gzip.open(os.path.join(directory, f'{export.GEOJSON_FILE}.gz'), 'rt', encoding='utf-8') as f:
+            features = json.load(f)['features']
+        self.assertEqual([feature['id'] for feature in features], [self.place.pk])
+        self.assertEqual(features[0]['properties']['name'], "Kimironko Market")
+        self.assertEqual(features[0]['properties']['images'], 1)
+
+    def test_skipped_while_unchanged(self):
+
+        manifest, exported = export.export_public_dataset(self.root)
+        self.assertTrue(exported)
+
+        self.assertEqual(export.export_public_dataset(self.root), (manifest, False))
+
+        Name.objects.create(text="Isoko rya Kimironko", referent=self.place)
+        changed, exported = export.export_public_dataset(self.root)
+
+        self.assertTrue(exported)
+        self.assertNotEqual(changed['version'], manifest['version'])
+        self.assertEqual(changed['counts']['names'], 2)
+        self.assertEqual(sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir()), sorted([manifest['version'], changed['version']]))
+
+
+class PlaceClusterTest(TestCase):
+    """The places are clustered up to the cluster zoom, and listed one by one above it in a box of the viewport only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        place_type = PlaceType.objects.create(text="market")
+        cls.inside = PlaceOfInterest.objects.create(type=place_type, corrected=True, geometry=Point(30.0600, -1.9400, srid=4326))
+        cls.near = PlaceOfInterest.objects.create(type=place_type, corrected=True, geometry=Point(30.0601, -1.9401, srid=4326))
+        cls.outside = PlaceOfInterest.objects.create(type=place_type, corrected=True, geometry=Point(30.2, -1.8, srid=4326))
+
+    def get(self, **params):
+
+        return self.client.get(reverse('place clusters'), params, HTTP_CACHE_CONTROL='no-cache')
+
+    def test_clusters(self):
+
+        response = self.get(zoom=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(feature['properties']['count'] for feature in response.json()['features']), [1, 2])
+
+    def test_places_in_a_box(self):
+
+        response = self.get(zoom=17, in_bbox='30.059,-1.941,30.061,-1.939')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(feature['id'] for feature in response.json()['features']), [self.inside.pk, self.near.pk])
+
+    def test_box_required(self):
+
+        for params in ({'zoom': 17}, {'zoom': 17, 'in_bbox': '29,-3,31,-1'}, {'zoom': 22, 'in_bbox': '30.059,-1.941,30.061,-1.939'}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('in_bbox', response.json())
+
+
+class PlaceTileTest(TestCase):
+    """The tiles hold the places within them and their buffer, as the places near their edge are drawn across it."""
+
+    zoom = 14
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.place_type = PlaceType.objects.create(text="market")
+
+        # The tile east of the one holding Kigali, and the longitude of its western edge
+        n = 2 ** cls.zoom
+        cls.x = int((30.06 + 180) / 360 * n) + 1
+        cls.y = int((1 - math.asinh(math.tan(math.radians(-1.94))) / math.pi) / 2 * n)
+        cls.edge = cls.x / n * 360 - 180
+        cls.buffer = 360 / n * tiles.TILE_BUFFER / tiles.TILE_EXTENT
+
+    def render(self, longitude):
+
+        PlaceOfInterest.objects.create(type=self.place_type, corrected=True, geometry=Point(longitude, -1.94, srid=4326))
+
+        response = self.client.get(reverse('place tiles', kwargs={'z': self.zoom, 'x': self.x, 'y': self.y}), HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 200)
+
+        return response.content
+
+    def test_within_the_buffer(self):
+
+        self.assertTrue(self.render(self.edge - self.buffer / 2))
+
+    def test_outside_the_buffer(self):
+
+        self.assertEqual(self.render(self.edge - self.buffer * 2), b'')
+
+
+class ContentSearchTest(TestCase):
+    """The content search finds the places whose texts, documents or transcriptions match, best first, with snippets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        place_type = PlaceType.objects.create(text="market")
+        cls.text_place, cls.document_place, cls.transcription_place, cls.other_place = [
+            PlaceOfInterest.objects.create(type=place_type, corrected=True) for _ in range(4)
+        ]
+
+        # Bulk created to skip the conversion of the files on save, and indexed below
+        Text.objects.bulk_create([Text(title="Interview", text="Every month the neighbours meet for umuganda, the community work.", place_of_interest=cls.text_place)])
+        Document.objects.bulk_create([Document(title="Archive record", text="Les marchés de Kigali sont ouverts le samedi.", place_of_interest=cls.document_place)])
+        Transcription.objects.bulk_create([Transcription(title="Umuganda", text="Recorded in the sector office.", place_of_interest=cls.transcription_place)])
+        Text.objects.bulk_create([Text(title="Recipe", text="Beans and plantains.", place_of_interest=cls.other_place)])
+        search.update_search_vectors()
+
+    def search(self, **params):
+
+        response = self.client.get(reverse('content search'), params, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def matching_places(self, text, config):
+        """The places with content matching the query, with a lookup per model instead of the ranked subqueries."""
+
+        query = SearchQuery(text, config=config, search_type='websearch')
+
+        return {place_id for model in search.CONTENT_MODELS.values() for place_id in model.objects.filter(search_vector=query).values_list('place_of_interest_id', flat=True)}
+
+    def test_same_places_as_the_lookups(self):
+
+        for text, config in (("umuganda", None), ('"community work"', None), ("umuganda -work", None), ("marché", 'french'), ("nothing", None)):
+            with self.subTest(text=text, config=config):
+                results = self.search(q=text, **({'language': config} if config else {}))['results']
+                configs = [config] if config else search.SEARCH_CONFIGS
+                expected = set().union(*(self.matching_places(text, each) for each in configs))
+
+                self.assertEqual({result['id'] for result in results}, expected)
+                self.assertEqual([result['rank'] for result in results], sorted((result['rank'] for result in results), reverse=True))
+
+        self.assertEqual({result['id'] for result in self.search(q="umuganda")['results']}, {self.text_place.pk, self.transcription_place.pk})
+
+    def test_ranked_like_search_content(self):
+
+        query = search.content_query("umuganda")
+        expected = list(search.search_content(PlaceOfInterest.objects.all(), query).values_list('pk', flat=True))
+
+        self.assertEqual([result['id'] for result in self.search(q="umuganda")['results']], expected)
+        # The title weighs more than the text
+        self.assertEqual(expected[0], self.transcription_place.pk)
+
+    def test_snippets(self):
+
+        result, = self.search(q='"community work"')['results']
+
+        snippet, = result['snippets']
+        self.assertEqual((snippet['type'], snippet['title']), ('text', "Interview"))
+        self.assertIn("<mark>community</mark> <mark>work</mark>", snippet['headline'])
+        self.assertEqual(snippet['rank'], result['rank'])
+
+    def test_pages(self):
+
+        first = self.search(q="umuganda", page_size=1)
+        second = self.search(q="umuganda", page_size=1, page=2)
+
+        self.assertIsNotNone(first['next'])
+        self.assertIsNone(second['next'])
+        self.assertEqual([result['id'] for result in first['results'] + second['results']], [result['id'] for result in self.search(q="umuganda")['results']])
+
+    def test_invalid(self):
+
+        for params in ({}, {'q': "umuganda", 'language': 'klingon'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('content search'), params, HTTP_CACHE_CONTROL='no-cache')
+                self.assertEqual(response.status_code, 400)
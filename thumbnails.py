@@ -0,0 +1,207 @@
+import io
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+from .models import Image, Thumbnail
+
+try:
+    from PIL import Image as PILImage, features
+except ImportError:
+    PILImage = None
+
+# The heights of the thumbnails by use
+THUMBNAIL_HEIGHTS = {
+    'list': 100,
+    'preview': 300,
+}
+
+THUMBNAIL_DIRECTORY = 'rwanda/thumbnails'
+
+# The widest thumbnail, as a multiple of its height, e.g. for panoramas
+MAX_ASPECT_RATIO = 4
+
+# The last use of a thumbnail is only written again after this, to keep the listings from writing
+TOUCH_INTERVAL = timedelta(days=1)
+
+# The total size of the thumbnail files kept by pruning, unless set with RWANDA_THUMBNAIL_BUDGET
+DEFAULT_BUDGET = 1 << 30
+
+# The thread making the missing thumbnails found by the requests, and the (image, height) it was asked for
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def thumbnail_format():
+    """The format of the thumbnails and its extension: WebP if Pillow supports it, else JPEG."""
+
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def content_hash(field_file):
+
+    digest = hashlib.sha256()
+    with field_file.open('rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def render_thumbnail(field_file, height, image_format):
+    """The bytes of a thumbnail of an image file, of the given height or less, e.g. from the first page of a TIFF."""
+
+    with field_file.open('rb') as f, PILImage.open(f) as original:
+        original.draft('RGB', (MAX_ASPECT_RATIO * height, height))
+        original.thumbnail((MAX_ASPECT_RATIO * height, height))
+
+        output = io.BytesIO()
+        original.convert('RGB').save(output, image_format, quality=80)
+
+    return output.getvalue()
+
+
+def create_thumbnail(image, height):
+    """Creates, or recreates after a new upload, the thumbnail of an image, or returns None if its file cannot be read."""
+
+    if PILImage is None or not image.file:
+        return None
+
+    image_format, extension = thumbnail_format()
+
+    try:
+        key = content_hash(image.file)
+        name = f'{THUMBNAIL_DIRECTORY}/{key[:2]}/{key}-{height}.{extension}'
+
+        # Made already for an image with the same content
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(render_thumbnail(image.file, height, image_format)))
+    except (OSError, ValueError, PILImage.DecompressionBombError):
+        return None
+
+    previous = Thumbnail.objects.filter(image=image, height=height).values_list('name', flat=True).first()
+
+    thumbnail, _created = Thumbnail.objects.update_or_create(
+        image=image,
+        height=height,
+        defaults={'source': image.file.name, 'key': key, 'name': name, 'size': default_storage.size(name), 'last_used': timezone.now()},
+    )
+
+    # The file of the previous upload, which no row would refer to and pruning would never find
+    if previous is not None and previous != name:
+        delete_unshared_files([previous])
+
+    return thumbnail
+
+
+def create_thumbnails(image):
+    """Creates the thumbnails of an image whose file is new or changed."""
+
+    current = {thumbnail.height: thumbnail for thumbnail in image.thumbnails.all()}
+
+    for height in THUMBNAIL_HEIGHTS.values():
+        thumbnail = current.get(height)
+        if thumbnail is None or thumbnail.source != image.file.name:
+            create_thumbnail(image, height)
+
+
+def run_in_background(function, *args):
+    """Runs a function in the thumbnail thread, after the request asking for it is answered."""
+
+    global _executor
+
+    def run():
+        try:
+            function(*args)
+        finally:
+            # Django only closes the connections of the threads answering requests
+            connections.close_all()
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rwanda-thumbnails')
+
+    _executor.submit(run)
+
+
+def recreate_thumbnail(pk, height):
+
+    try:
+        image = Image.objects.filter(pk=pk).first()
+        if image is not None:
+            create_thumbnail(image, height)
+    finally:
+        with _lock:
+            _pending.discard((pk, height))
+
+
+def schedule_thumbnail(image, height):
+    """Makes a missing or outdated thumbnail in the background, once however many requests find it missing."""
+
+    if PILImage is None or not image.file:
+        return
+
+    with _lock:
+        if (image.pk, height) in _pending:
+            return
+        _pending.add((image.pk, height))
+
+    run_in_background(recreate_thumbnail, image.pk, height)
+
+
+def thumbnail_url(image, use='list'):
+    """
+    The URL of the thumbnail of an image, or None if it is missing or outdated, e.g. pruned. Uses the prefetched
+    thumbnails of the image, if any. A missing thumbnail is made again in the background, never while answering
+    the request.
+    """
+
+    height = THUMBNAIL_HEIGHTS[use]
+    thumbnail = next((thumbnail for thumbnail in image.thumbnails.all() if thumbnail.height == height), None)
+
+    if thumbnail is None or thumbnail.source != image.file.name:
+        schedule_thumbnail(image, height)
+        return None
+
+    if timezone.now() - thumbnail.last_used > TOUCH_INTERVAL:
+        Thumbnail.objects.filter(pk=thumbnail.pk).update(last_used=timezone.now())
+
+    return default_storage.url(thumbnail.name)
+
+
+def delete_unshared_files(names):
+    """Deletes the thumbnail files no thumbnail refers to anymore."""
+
+    shared = set(Thumbnail.objects.filter(name__in=names).values_list('name', flat=True))
+
+    for name in set(names).difference(shared):
+        default_storage.delete(name)
+
+
+def prune_thumbnails(budget=None):
+    """
+    Deletes the least recently used thumbnails until their files fit in the budget in bytes, and returns their number.
+    A pruned thumbnail is made again the next time it is asked for.
+    """
+
+    budget = getattr(settings, 'RWANDA_THUMBNAIL_BUDGET', DEFAULT_BUDGET) if budget is None else budget
+    total = Thumbnail.objects.aggregate(total=Sum('size'))['total'] or 0
+
+    pruned = []
+    for pk, size in Thumbnail.objects.order_by('last_used').values_list('pk', 'size').iterator():
+        if total <= budget:
+            break
+        pruned.append(pk)
+        total -= size
+
+    # Their files are deleted with them, when no other thumbnail shares them
+    Thumbnail.objects.filter(pk__in=pruned).delete()
+
+    return len(pruned)
@@ -0,0 +1,75 @@
+from django.db import connection
+from rest_framework.renderers import BaseRenderer
+
+CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+# Width of the world in Web Mercator metres
+WEB_MERCATOR_WIDTH = 40075016.68557849
+
+
+class VectorTileRenderer(BaseRenderer):
+    media_type = CONTENT_TYPE
+    format = 'pbf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors have no tile to render, only their status
+        return data if isinstance(data, bytes) else b''
+
+
+def is_valid_tile(z, x, y):
+
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def simplification_tolerance(z):
+    """Half of a tile unit in metres at the zoom level, vertices closer than this end up on the same point."""
+
+    return WEB_MERCATOR_WIDTH / (2 ** z * TILE_EXTENT) / 2
+
+
+def tile_buffer(z):
+    """The width in metres of the buffer around a tile at the zoom level, whose geometries are kept in the tile."""
+
+    return WEB_MERCATOR_WIDTH / 2 ** z * TILE_BUFFER / TILE_EXTENT
+
+
+def render_tile(queryset, z, x, y, layer='places'):
+    """
+    Renders the places of the queryset within tile z/x/y and its buffer as a Mapbox vector tile with PostGIS,
+    simplifying their geometries for the zoom level and only keeping a few attributes.
+    """
+
+    model = queryset.model
+    srid = model._meta.get_field('geometry').srid
+    type_table = model._meta.get_field('type').related_model._meta.db_table
+    ids, params = queryset.values('pk').query.sql_with_params()
+
+    sql = f"""
+        WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom)
+        SELECT ST_AsMVT(tile, %s, {TILE_EXTENT}, 'geom') FROM (
+            SELECT
+                ST_AsMVTGeom(ST_SimplifyPreserveTopology(ST_Transform(place.geometry, 3857), %s), bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                place.id,
+                place.display_name AS name,
+                place_type.text AS type,
+                place.corrected,
+                place.is_iconic
+            FROM {model._meta.db_table} place
+            JOIN {type_table} place_type ON place_type.id = place.type_id
+            CROSS JOIN bounds
+            WHERE place.geometry && ST_Transform(ST_Expand(bounds.geom, %s), {srid}) AND place.id IN ({ids})
+        ) AS tile
+        WHERE tile.geom IS NOT NULL
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y, layer, simplification_tolerance(z), tile_buffer(z), *params])
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile else b''
@@ -12,6 +12,12 @@ router.register(rf'{endpoint}/geojson/place', views.PlaceOfInterestGeoViewSet, b
 router.register(rf'{endpoint}/image', views.IIIFImageViewSet, basename='image')
 router.register(rf'{endpoint}/document', views.DocumentViewSet, basename='document')
 router.register(rf'{endpoint}/transcription', views.TranscriptionViewSet, basename='transcription')
+# Without their internal search columns
+router.register(rf'{endpoint}/text', views.TextViewSet, basename='text')
+router.register(rf'{endpoint}/name', views.NameViewSet, basename='name')
+router.register(rf'{endpoint}/informant', views.InformantViewSet, basename='informant')
+router.register(rf'{endpoint}/period', views.PeriodViewSet, basename='period')
+router.register(rf'{endpoint}/placetype', views.PlaceTypeViewSet, basename='placetype')
 # Search options
 router.register(rf'{endpoint}/search/period', views.SearchPlacePeriodViewSet, basename='Featch based on period time')
 router.register(rf'{endpoint}/search/type', views.SearchPlaceTypeViewSet, basename='Featch based on type')
@@ -26,13 +32,21 @@ router.register(rf'{endpoint}/advance/search', views.AdvanceSearcViewSet, basena
 
 urlpatterns = [
     path('', include(router.urls)),
+    path(f'{endpoint}/tiles/place/<int:z>/<int:x>/<int:y>.pbf', views.PlaceOfInterestTileView.as_view(), name='place tiles'),
+    path(f'{endpoint}/dossier/place/<int:pk>', views.PlaceDossierView.as_view(), name='place dossier'),
+    path(f'{endpoint}/clusters/place', views.PlaceClusterView.as_view(), name='place clusters'),
+    path(f'{endpoint}/search/content', views.ContentSearchView.as_view(), name='content search'),
+    path(f'{endpoint}/changes', views.ChangesView.as_view(), name='changes'),
+    path(f'{endpoint}/cache/stats', views.CacheStatsView.as_view(), name='cache stats'),
 
     # Automatically generated views
     *utils.get_model_urls('rwanda', endpoint, 
         exclude=['placeofinterest', 'image', 'document',
             'image_authors', 'image_informants', 
             'name_languages', 'name_informants', 
-            'text_authors', 'text_informants', 'transcription']),
+            'text_authors', 'text_informants', 'transcription',
+            'text', 'name', 'informant', 'period', 'placetype',
+            'placefacet', 'simplifiedgeometry', 'thumbnail', 'ingestedfile', 'changelog']),
     *documentation
 
 ]
\ No newline at end of file
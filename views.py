@@ -1,20 +1,71 @@
-from rest_framework import viewsets
-from . import models, serializers
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpResponse
+from rest_framework import generics, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+from rest_framework_gis.filters import InBBoxFilter
+from . import cache, changes, clusters, models, serializers, tiles
+from .geojson import FastGeoJSONMixin, StreamingGeoJSONMixin
+from .geometry import MAX_ZOOM, SimplifiedGeometryMixin, parse_number
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, GeoKeysetPagination, KeysetPaginationMixin
+from .profiling import ProfilingMixin
+from .search import FUZZY_VALUES, SEARCH_CONFIGS, NameSearchFilter, content_query, content_snippets, search_content, search_places, with_name_search
 from diana.abstract.views import DynamicDepthViewSet, GeoViewSet
 from diana.abstract.models import get_fields, DEFAULT_FIELDS
 
 from django_filters import rest_framework as filters
 
+# The `search` parameter of the place viewsets matches names with the trigram index
+PLACE_FILTER_BACKENDS = with_name_search(GeoViewSet.filter_backends)
+
+
+class PlaceGeoViewSet(ProfilingMixin, cache.CachedResponseMixin, StreamingGeoJSONMixin, FastGeoJSONMixin, SimplifiedGeometryMixin, KeysetPaginationMixin, GeoViewSet):
+    """
+    The base of the viewsets listing places as GeoJSON, with profiling, cached responses, simplified geometries,
+    the fast GeoJSON, streaming and keyset pagination.
+    """
+
+    keyset_pagination_class = GeoKeysetPagination
+
 
 class PlaceFilter(filters.FilterSet):
-    has_no_name = filters.BooleanFilter(field_name='names', lookup_expr='isnull')
+    has_no_name = filters.BooleanFilter(method='filter_has_no_name', label="Has no name")
+    geometry_type = filters.ChoiceFilter(method='filter_geometry_type', choices=[(family, family) for family in models.GEOMETRY_FAMILIES], label="Type of geometry")
+    name = filters.CharFilter(method='filter_name', label="Name, ignoring case and accents")
+    fuzzy = filters.BooleanFilter(method='filter_fuzzy', label="Match the name approximately")
+    ancestors_of = filters.NumberFilter(method='filter_ancestors_of', label="Ancestors of the place with this id")
+    descendants_of = filters.NumberFilter(method='filter_descendants_of', label="Descendants of the place with this id")
 
     class Meta:
         model = models.PlaceOfInterest
-        fields = ['id', 'corrected', 'type', 'parent_place', 'is_iconic', 'names', 'has_no_name']
+        fields = ['id', 'corrected', 'type', 'parent_place', 'is_iconic', 'names', 'has_no_name', 'name', 'fuzzy', 'geometry_type', 'ancestors_of', 'descendants_of']
+
+    def filter_has_no_name(self, queryset, name, value):
+        names = Exists(models.Name.objects.filter(referent=OuterRef('pk')))
+        return queryset.exclude(names) if value else queryset.filter(names)
+
+    def filter_geometry_type(self, queryset, name, value):
+        return queryset.of_geometry_family(value)
+
+    def filter_name(self, queryset, name, value):
+        fuzzy = str(self.data.get('fuzzy', '')).lower() in FUZZY_VALUES
+        return search_places(queryset, value.split(), fuzzy)
 
-class PlaceOfInterestGeoViewSet(GeoViewSet):
+    def filter_fuzzy(self, queryset, name, value):
+        # Only changes how the name filter matches
+        return queryset
+
+    def filter_ancestors_of(self, queryset, name, value):
+        return queryset.ancestors_of(int(value))
+
+    def filter_descendants_of(self, queryset, name, value):
+        return queryset.descendants_of(int(value))
+
+
+class PlaceOfInterestGeoViewSet(PlaceGeoViewSet):
     """
     retrieve:
     Returns a single place as a GeoJSON feature
@@ -24,19 +75,210 @@ class PlaceOfInterestGeoViewSet(GeoViewSet):
 
     count:
     Returns a count of the existing places after the application of any filter.
+
+    subtree:
+    Returns a place and all the places below it in the hierarchy of parent places as a GeoJSON feature collection.
     """
     
     serializer_class = serializers.PlaceOfInterestSerializer
-    queryset = models.PlaceOfInterest.objects.filter(corrected=True,
-                                                     names__isnull=False).select_related('type', 'parent_place') \
-                                         .prefetch_related('names').distinct('id')
+    # EXISTS rather than a join to the names and DISTINCT ON, so that the bbox filter can use the spatial index
+    queryset = models.PlaceOfInterest.objects.filter(corrected=True).named().select_related('type', 'parent_place') \
+                                         .prefetch_related('names').order_by('id')
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
+    @action(detail=True)
+    def subtree(self, request, pk=None):
+        """Returns the place and all the places below it in the hierarchy of parent places."""
+
+        place = self.get_object()
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.filter(Q(pk=place.pk) | Q(pk__in=models.PlaceOfInterest.objects.descendants_of(place.pk).values('pk')))
+
+        return Response(self.get_serializer(queryset, many=True).data)
 
-class IIIFImageViewSet(DynamicDepthViewSet):
+
+class PlaceDossierView(ProfilingMixin, cache.CachedResponseMixin, generics.RetrieveAPIView):
+    """
+    get:
+    Returns a place as a GeoJSON feature with its names, images, texts, documents, transcriptions, parent and
+    children, in a fixed number of queries. Only the comma-separated properties of `fields` are returned if given,
+    e.g. `fields=names,images`.
+    """
+
+    serializer_class = serializers.PlaceDossierSerializer
+
+    def get_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = set(fields).difference(self.serializer_class.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields {', '.join(sorted(unknown))}, expected some of {', '.join(self.serializer_class.optional_fields())}."})
+
+        return fields
+
+    def get_queryset(self):
+        queryset = models.PlaceOfInterest.objects.filter(corrected=True)
+
+        return self.serializer_class.prefetch(queryset, self.get_fields())
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fields': self.get_fields()}
+
+
+class PlaceOfInterestTileView(ProfilingMixin, cache.CachedResponseMixin, generics.GenericAPIView):
+    """
+    get:
+    Returns the places within a tile as a Mapbox vector tile, with the same filters as the places as GeoJSON.
+    """
+
+    queryset = models.PlaceOfInterest.objects.filter(corrected=True).named()
+    filterset_class = PlaceFilter
+    filter_backends = [filters.DjangoFilterBackend, NameSearchFilter]
+    search_fields = ['names__text']
+    renderer_classes = [tiles.VectorTileRenderer]
+
+    def get(self, request, z, x, y):
+        if not tiles.is_valid_tile(z, x, y):
+            raise NotFound("No such tile.")
+
+        tile = tiles.render_tile(self.filter_queryset(self.get_queryset()), z, x, y)
+
+        return HttpResponse(tile, content_type=tiles.CONTENT_TYPE)
+
+
+class PlaceClusterView(ProfilingMixin, cache.CachedResponseMixin, generics.GenericAPIView):
+    """
+    get:
+    Returns the places within the `in_bbox` box as GeoJSON clusters with their number of places, on a grid fitting
+    the `zoom` level, with the filters of the places as GeoJSON and of the advanced search. Above zoom 15 the
+    places are returned one by one, and `in_bbox` is required and at most 8 tiles of the zoom level wide and tall.
+    """
+
+    serializer_class = serializers.PlaceOfInterestSerializer
+    filterset_class = PlaceFilter
+    filter_backends = [filters.DjangoFilterBackend, NameSearchFilter, InBBoxFilter]
+    search_fields = ['names__text']
+    bbox_filter_field = 'point'
+
+    # The criteria of the advanced search
+    facets = ('language', 'place_type', 'period', 'informant', 'source')
+
+    def get_queryset(self):
+        queryset = models.PlaceOfInterest.objects.filter(corrected=True).named()
+
+        return queryset.faceted(**{facet: self.request.query_params.get(facet) for facet in self.facets})
+
+    def get(self, request):
+        zoom = parse_number(request.query_params, 'zoom', int, 0, MAX_ZOOM)
+        if zoom is None:
+            raise ValidationError({'zoom': "A zoom level is required."})
+
+        if zoom > clusters.MAX_CLUSTER_ZOOM:
+            # Listed one by one, the places of a box of the size of the viewport only
+            bbox = InBBoxFilter().get_filter_bbox(request)
+            if bbox is None:
+                raise ValidationError({'in_bbox': f"A box is required above zoom {clusters.MAX_CLUSTER_ZOOM}."})
+
+            xmin, ymin, xmax, ymax = bbox.extent
+            if max(xmax - xmin, ymax - ymin) > clusters.max_box_size(zoom):
+                raise ValidationError({'in_bbox': f"The box is too large for zoom {zoom}, at most {clusters.max_box_size(zoom):g} degrees wide and tall."})
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if zoom <= clusters.MAX_CLUSTER_ZOOM:
+            features = clusters.cluster_places(queryset, zoom)
+        else:
+            places = queryset.select_related('type', 'parent_place').prefetch_related('names').order_by('id')
+            features = self.get_serializer(places, many=True).data['features']
+
+        return Response({'type': 'FeatureCollection', 'features': features})
+
+
+class ContentSearchView(ProfilingMixin, cache.CachedResponseMixin, APIView):
+    """
+    get:
+    Returns the places whose texts, documents or transcriptions match the full-text search `q`, e.g.
+    `"exact phrase" -excluded`, best first, with their best matches and the matching words highlighted. The words
+    are matched in English, French and as they are, or only in the `language` configuration. The places are paged
+    with `page` and `page_size`, without counting them.
+    """
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': "A search text is required."})
+
+        config = request.query_params.get('language') or None
+        if config is not None and config not in SEARCH_CONFIGS:
+            raise ValidationError({'language': f"Expected one of {', '.join(SEARCH_CONFIGS)}."})
+
+        page = parse_number(request.query_params, 'page', int, 1, 1 << 31) or 1
+        page_size = parse_number(request.query_params, 'page_size', int, 1, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+
+        query = content_query(text, config)
+        start = (page - 1) * page_size
+
+        # One more place than the page tells whether there is a next page
+        places = list(search_content(models.PlaceOfInterest.objects.all(), query)
+                      .values_list('pk', 'display_name', 'search_rank')[start:start + page_size + 1])
+        has_next = len(places) > page_size
+        places = places[:page_size]
+
+        snippets = content_snippets([pk for pk, _, _ in places], query, config)
+
+        url = request.build_absolute_uri()
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if has_next else None,
+            'previous': (replace_query_param(url, 'page', page - 1) if page > 2 else remove_query_param(url, 'page')) if page > 1 else None,
+            'results': [
+                {'id': pk, 'name': name, 'rank': round(rank, 6), 'snippets': snippets.get(pk, [])}
+                for pk, name, rank in places
+            ],
+        })
+
+
+class ChangesView(ProfilingMixin, APIView):
+    """
+    get:
+    Returns the places, names, images, texts, documents and transcriptions created or updated, and the ids of those
+    deleted, since the `since` cursor of an earlier response, or all of them without it, in the order they were
+    committed. At most `limit` changes are returned, and `more` tells whether more are waiting for the returned
+    cursor. The models can be restricted with the comma-separated `models`, e.g. `models=placeofinterest,name`,
+    keeping the same models for a cursor. The changes of a transaction are only returned once every transaction
+    started before it ended. The changes are kept for the RWANDA_CHANGE_RETENTION_DAYS setting, 90 days by default,
+    and an older cursor is refused.
+    """
+
+    def get(self, request):
+        names = [name.strip() for name in request.query_params.get('models', '').split(',') if name.strip()]
+        unknown = set(names).difference(changes.CHANGE_MODELS)
+        if unknown:
+            raise ValidationError({'models': f"Unknown models {', '.join(sorted(unknown))}, expected some of {', '.join(changes.CHANGE_MODELS)}."})
+
+        limit = parse_number(request.query_params, 'limit', int, 1, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+
+        return Response(changes.changes_since(request.query_params.get('since'), names or None, limit))
+
+
+class CacheStatsView(APIView):
+    """
+    get:
+    Returns the data version and the hits and misses of the cached responses.
+    """
+
+    def get(self, request):
+
+        return Response(cache.stats())
+
+
+class IIIFImageViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
     """
     retrieve:
     Returns a single image instance.
@@ -48,12 +290,12 @@ class IIIFImageViewSet(DynamicDepthViewSet):
     Returns a count of the existing images after the application of any filter.
     """
     
-    queryset = models.Image.objects.all()
+    queryset = models.Image.objects.prefetch_related('thumbnails')
     serializer_class = serializers.TIFFImageSerializer
     filterset_fields = get_fields(models.Image, exclude=DEFAULT_FIELDS + ['iiif_file', 'file'])
 
 
-class DocumentViewSet(DynamicDepthViewSet):
+class DocumentViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
     """
     retrieve:
     Returns a single image instance.
@@ -67,10 +309,10 @@ class DocumentViewSet(DynamicDepthViewSet):
     
     queryset = models.Document.objects.all()
     serializer_class = serializers.DocumentSerializer
-    filterset_fields = get_fields(models.Document, exclude=DEFAULT_FIELDS + ['filename'])
+    filterset_fields = get_fields(models.Document, exclude=DEFAULT_FIELDS + ['filename', 'search_vector'])
 
 
-class SearchPlacePeriodViewSet(GeoViewSet):
+class SearchPlacePeriodViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place by given period name.
@@ -80,18 +322,18 @@ class SearchPlacePeriodViewSet(GeoViewSet):
     """
     def get_queryset(self):
         period_name = self.request.GET["period_name"]
-        periods = models.Name.objects.filter(period__text__icontains=period_name)
-        queryset = models.PlaceOfInterest.objects.all().filter(id__in=list(periods.values_list('referent', flat=True)))
+        queryset = models.PlaceOfInterest.objects.with_names(period__search_text__contains=models.normalize_search_text(period_name))
 
         return queryset
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceTypeViewSet(GeoViewSet):
+class SearchPlaceTypeViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place by given type text.
@@ -102,17 +344,18 @@ class SearchPlaceTypeViewSet(GeoViewSet):
 
     def get_queryset(self):
         type_text = self.request.GET["text"]
-        queryset = models.PlaceOfInterest.objects.filter(type__text__icontains=type_text)
+        queryset = models.PlaceOfInterest.objects.filter(type__search_text__contains=models.normalize_search_text(type_text))
         return queryset
     
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceViewSet(GeoViewSet):
+class SearchPlaceViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place that has been selected at least for one image.
@@ -120,19 +363,16 @@ class SearchPlaceViewSet(GeoViewSet):
     count:
     Returns a count of the existing places after the application of any filter.
     """
-    images = models.Image.objects.all()
-    informant = models.Text.objects.all()
-    queryset = models.PlaceOfInterest.objects.filter(Q(id__in=list(images.values_list('place_of_interest', flat=True))) 
-                                                     | Q(id__in=list(informant.values_list('place_of_interest', flat=True)))
-                                                     )
+    queryset = models.PlaceOfInterest.objects.having(models.Image, models.Text)
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceInformantViewSet(GeoViewSet):
+class SearchPlaceInformantViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place there is any informant for them.
@@ -143,18 +383,18 @@ class SearchPlaceInformantViewSet(GeoViewSet):
 
     def get_queryset(self):
         info = self.request.GET["text"]
-        informant = models.Text.objects.filter(informants__custom_id__icontains=info)
-        queryset = models.PlaceOfInterest.objects.all().filter(id__in=list(informant.values_list('place_of_interest', flat=True)))
+        queryset = models.PlaceOfInterest.objects.having(models.Text, informants__search_text__contains=models.normalize_search_text(info))
         return queryset
       
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceTextViewSet(GeoViewSet):
+class SearchPlaceTextViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place that has been selected at least for one image.
@@ -162,16 +402,16 @@ class SearchPlaceTextViewSet(GeoViewSet):
     count:
     Returns a count of the existing places after the application of any filter.
     """
-    informant = models.Text.objects.all()
-    queryset = models.PlaceOfInterest.objects.filter(id__in=list(informant.values_list('place_of_interest', flat=True)))
+    queryset = models.PlaceOfInterest.objects.having(models.Text)
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceImageViewSet(GeoViewSet):
+class SearchPlaceImageViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place that has been selected at least for one image.
@@ -179,16 +419,16 @@ class SearchPlaceImageViewSet(GeoViewSet):
     count:
     Returns a count of the existing places after the application of any filter.
     """
-    images = models.Image.objects.all()
-    queryset = models.PlaceOfInterest.objects.filter(id__in=list(images.values_list('place_of_interest', flat=True)))
+    queryset = models.PlaceOfInterest.objects.having(models.Image)
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceDocumentViewSet(GeoViewSet):
+class SearchPlaceDocumentViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place that has been selected at least for one image.
@@ -196,16 +436,16 @@ class SearchPlaceDocumentViewSet(GeoViewSet):
     count:
     Returns a count of the existing places after the application of any filter.
     """
-    documents = models.Document.objects.all()
-    queryset = models.PlaceOfInterest.objects.filter(id__in=list(documents.values_list('place_of_interest', flat=True)))
+    queryset = models.PlaceOfInterest.objects.having(models.Document)
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
-class SearchPlaceLanguageViewSet(GeoViewSet):
+class SearchPlaceLanguageViewSet(PlaceGeoViewSet):
     """
     list:
     Returns a list of place that has been selected at least for one image.
@@ -217,78 +457,40 @@ class SearchPlaceLanguageViewSet(GeoViewSet):
 
     def get_queryset(self):
         text = self.request.GET["q"]
-        name = models.Name.objects.filter(Q(languages__name__exact=text) | Q(languages__abbreviation__exact=text))
-        queryset = models.PlaceOfInterest.objects.filter(id__in=list(name.values_list('referent', flat=True))) 
+        queryset = models.PlaceOfInterest.objects.with_language(text)
         return queryset
                                             
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
-class AdvanceSearcViewSet(GeoViewSet):
+class AdvanceSearcViewSet(PlaceGeoViewSet):
     serializer_class = serializers.PlaceOfInterestSerializer
     filterset_class = PlaceFilter
+    filter_backends = PLACE_FILTER_BACKENDS
     search_fields = ['names__text']
 
-    def dispatch(self, request, *args, **kwargs):
-        model_name = request.GET.get('source')
-        self.model_type = None
-        if model_name == 'image':
-            self.model_type = models.Image
-        elif model_name == 'document':
-            self.model_type = models.Document
-        elif model_name == 'text':
-            self.model_type = models.Text
-
-        return super(AdvanceSearcViewSet, self).dispatch(request, *args, **kwargs)
-
     def get_queryset(self):
-        queryset = models.PlaceOfInterest.objects.all()
-        model_type = self.request.query_params.get('source')
-        language = self.request.query_params.get('language')
-        street_type = self.request.query_params.get('place_type')
-        time = self.request.query_params.get('period')
-        informant = self.request.query_params.get('informant')
-
-        if model_type:
-            sources = self.model_type.objects.all()
-            if language:
-                name_filter = Q(languages__name__exact=language) | Q(languages__abbreviation__exact=language)
-                queryset = queryset.filter(id__in=models.Name.objects.filter(name_filter).values_list('referent', flat=True))
-            if street_type:
-                queryset = queryset.filter(type__text__icontains=street_type)
-            if time:
-                period_filter = Q(period__text__icontains=time)
-                queryset = queryset.filter(id__in=models.Name.objects.filter(period_filter).values_list('referent', flat=True))
-            if informant:
-                informant_filter = Q(informants__custom_id__icontains=informant)
-                queryset = queryset.filter(id__in=models.Text.objects.filter(informant_filter).values_list('place_of_interest', flat=True))
-                
-            queryset = queryset.filter(id__in=list(sources.values_list('place_of_interest', flat=True)))
-        else:
-            if language:
-                name_filter = Q(languages__name__exact=language) | Q(languages__abbreviation__exact=language)
-                queryset = queryset.filter(id__in=models.Name.objects.filter(name_filter).values_list('referent', flat=True))
-            if street_type:
-                queryset = queryset.filter(type__text__icontains=street_type)
-            if time:
-                period_filter = Q(period__text__icontains=time)
-                queryset = queryset.filter(id__in=models.Name.objects.filter(period_filter).values_list('referent', flat=True))
-            if informant:
-                informant_filter = Q(informants__custom_id__icontains=informant)
-                queryset = queryset.filter(id__in=models.Text.objects.filter(informant_filter).values_list('place_of_interest', flat=True))
+        # Answered from the precomputed facets of the places
+        queryset = models.PlaceOfInterest.objects.faceted(
+            language=self.request.query_params.get('language'),
+            place_type=self.request.query_params.get('place_type'),
+            period=self.request.query_params.get('period'),
+            informant=self.request.query_params.get('informant'),
+            source=self.request.query_params.get('source'),
+        )
 
-
-        return queryset.distinct()
+        return queryset
 
     bbox_filter_field = 'geometry'
     bbox_filter_include_overlapping = True
 
 
 
-class TranscriptionViewSet(DynamicDepthViewSet):
+class TranscriptionViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
     """
     retrieve:
     Returns a single transcription instance.
@@ -301,4 +503,84 @@ class TranscriptionViewSet(DynamicDepthViewSet):
     """
     queryset = models.Transcription.objects.all()
     serializer_class = serializers.TranscriptionSerializer
-    filterset_fields = get_fields(models.Transcription, exclude=DEFAULT_FIELDS + ['document'])
+    filterset_fields = get_fields(models.Transcription, exclude=DEFAULT_FIELDS + ['document', 'search_vector'])
+
+
+class TextViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
+    """
+    retrieve:
+    Returns a single text instance.
+
+    list:
+    Returns a list of all the existing texts in the database, paginated.
+
+    count:
+    Returns a count of the existing texts after the application of any filter.
+    """
+    queryset = models.Text.objects.all()
+    serializer_class = serializers.TextSerializer
+    filterset_fields = get_fields(models.Text, exclude=DEFAULT_FIELDS + ['search_vector'])
+
+
+class NameViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
+    """
+    retrieve:
+    Returns a single name instance.
+
+    list:
+    Returns a list of all the existing names in the database, paginated.
+
+    count:
+    Returns a count of the existing names after the application of any filter.
+    """
+    queryset = models.Name.objects.all()
+    serializer_class = serializers.NameSerializer
+    filterset_fields = get_fields(models.Name, exclude=DEFAULT_FIELDS + ['search_text'])
+
+
+class InformantViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
+    """
+    retrieve:
+    Returns a single informant instance.
+
+    list:
+    Returns a list of all the existing informants in the database, paginated.
+
+    count:
+    Returns a count of the existing informants after the application of any filter.
+    """
+    queryset = models.Informant.objects.all()
+    serializer_class = serializers.InformantSerializer
+    filterset_fields = get_fields(models.Informant, exclude=DEFAULT_FIELDS + ['search_text'])
+
+
+class PeriodViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
+    """
+    retrieve:
+    Returns a single period instance.
+
+    list:
+    Returns a list of all the existing periods in the database, paginated.
+
+    count:
+    Returns a count of the existing periods after the application of any filter.
+    """
+    queryset = models.Period.objects.all()
+    serializer_class = serializers.PeriodSerializer
+    filterset_fields = get_fields(models.Period, exclude=DEFAULT_FIELDS + ['search_text'])
+
+
+class PlaceTypeViewSet(ProfilingMixin, KeysetPaginationMixin, DynamicDepthViewSet):
+    """
+    retrieve:
+    Returns a single place type instance.
+
+    list:
+    Returns a list of all the existing place types in the database, paginated.
+
+    count:
+    Returns a count of the existing place types after the application of any filter.
+    """
+    queryset = models.PlaceType.objects.all()
+    serializer_class = serializers.PlaceTypeSerializer
+    filterset_fields = get_fields(models.PlaceType, exclude=DEFAULT_FIELDS + ['search_text'])